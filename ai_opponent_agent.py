@@ -1,27 +1,253 @@
+import asyncio
+import json
 import random
 import chess_llm_functions as llm_api
+import llm_runtime
+import prompt_payloads
+from chess_engine import find_best_move
+from move_sanitizer import sanitize_move
+import move_selectors
 
+# --- Local Engine Settings ---
+USE_LOCAL_ENGINE_FOR_BEST = True # "best" moves come from the local search, not the LLM
+ENGINE_TIME_BUDGET = 1.5 # Seconds for a "best" move search
+ENGINE_FALLBACK_TIME_BUDGET = 0.3 # Seconds when rescuing a failed LLM tool
 
-def get_ai_move(enhanced_moves_json, tactical_threats_json, legal_moves_list_simple, user_skill_level):
+# --- Local Personality Settings ---
+USE_LOCAL_SELECTORS = True # "human" and "blunder" moves come from move_selectors, not the LLM
+USE_LLM_FOR_LOCAL_REASONING = False # Ask Flash to phrase the locally chosen move's reasoning
+# Strength (0..1) of each local personality per skill level; None uses move_selectors defaults
+SELECTOR_STRENGTH = {
+    "beginner": {"human": 0.7, "blunder": 0.8},
+    "intermediate": {"human": 0.85, "blunder": 0.8},
+    "advanced": {"human": 0.95, "blunder": 0.8},
+}
+
+# --- Local Router Settings ---
+USE_LOCAL_ROUTER = True # Pick the personality from ROUTER_PROBABILITIES instead of the LLM router
+ROUTER_SEED = None # Set an int for a reproducible sequence of personalities
+# Chance of each personality per skill level and board situation
+# ("danger" = one of our pieces worth 3+ is attacked, else the game phase)
+ROUTER_PROBABILITIES = {
+    "beginner": {
+        "opening":    {"blunder": 0.60, "human": 0.40, "best": 0.00},
+        "middlegame": {"blunder": 0.55, "human": 0.45, "best": 0.00},
+        "endgame":    {"blunder": 0.50, "human": 0.50, "best": 0.00},
+        "danger":     {"blunder": 0.40, "human": 0.60, "best": 0.00},
+    },
+    "intermediate": {
+        "opening":    {"blunder": 0.15, "human": 0.80, "best": 0.05},
+        "middlegame": {"blunder": 0.05, "human": 0.75, "best": 0.20},
+        "endgame":    {"blunder": 0.05, "human": 0.70, "best": 0.25},
+        "danger":     {"blunder": 0.00, "human": 0.75, "best": 0.25},
+    },
+    "advanced": {
+        "opening":    {"blunder": 0.00, "human": 0.30, "best": 0.70},
+        "middlegame": {"blunder": 0.00, "human": 0.20, "best": 0.80},
+        "endgame":    {"blunder": 0.00, "human": 0.10, "best": 0.90},
+        "danger":     {"blunder": 0.00, "human": 0.10, "best": 0.90},
+    },
+}
+OPENING_MOVES = 10 # Full moves counted as the opening
+ENDGAME_MATERIAL = 26 # Combined non-King material (Q=9 ... P=1) at or below this is an endgame
+
+# --- Speculative Dispatch Settings ---
+# With the LLM router, start the likely specialists at the same time as the
+# router and keep only the one it picks, so a move costs about one call.
+SPECULATIVE_DISPATCH = True
+# Which specialists to start early, per skill level (bounds the extra cost)
+SPECULATIVE_POLICY = {
+    "beginner": ("blunder", "human"),
+    "intermediate": ("human",),
+    "advanced": ("best", "human"),
+}
+
+_router_rng = random.Random(ROUTER_SEED)
+
+def seed_router(seed):
+    """Re-seeds the local router (None = unpredictable)."""
+    _router_rng.seed(seed)
+
+def _board_situation(analysis, game):
+    """Classifies the board for the router: danger, opening, middlegame or endgame."""
+    if any(t["threatened_piece"]["value"] >= 3 for t in analysis.tactical_threats):
+        return "danger"
+    if game is None:
+        # Same rough proxy the LLM router uses without the game
+        return "opening" if len(analysis.legal_moves) < 25 else "middlegame"
+    if game.fullmove_number <= OPENING_MOVES:
+        return "opening"
+    if sum(game.board.material.values()) <= ENDGAME_MATERIAL:
+        return "endgame"
+    return "middlegame"
+
+def route_personality(analysis, user_skill_level, game=None):
+    """
+    The local Router: draws "best", "human" or "blunder" from
+    ROUTER_PROBABILITIES for the skill level and board situation.
+    Returns the same {"tool_choice", "reasoning"} packet as the LLM router.
+    """
+    situation = _board_situation(analysis, game)
+    table = ROUTER_PROBABILITIES.get(user_skill_level, ROUTER_PROBABILITIES["intermediate"])
+    weights = table[situation]
+    tools = [tool for tool, weight in weights.items() if weight > 0]
+    tool_choice = _router_rng.choices(tools, weights=[weights[tool] for tool in tools])[0]
+    print(f"[OPPONENT AGENT] Local router: skill={user_skill_level}, situation={situation}, "
+          f"distribution={weights} -> '{tool_choice}'")
+    return {
+        "tool_choice": tool_choice,
+        "reasoning": f"User is {user_skill_level} and the board situation is '{situation}'; "
+                     f"drew '{tool_choice}' with probability {weights[tool_choice]:.2f}."
+    }
+
+def _engine_best_move(game, time_budget):
+    """Runs the local engine; returns its result packet or None."""
+    if game is None:
+        return None
+    try:
+        result = find_best_move(game, time_budget)
+    except Exception as e:
+        print(f"!!! CRITICAL: Local engine error: {e}")
+        return None
+    if result and result.get("move"):
+        print(f"[OPPONENT AGENT] Engine chose {result['move']} (score {result['score']}, depth {result['depth']}, "
+              f"{result['nodes']} nodes in {result['time']}s)")
+        return result
+    return None
+
+async def _engine_reasoning(analysis, result):
+    """Asks the LLM to explain the engine's move; falls back to a plain summary."""
+    engine_summary = json.dumps({"score": result["score"], "line": result["pv"]})
+    reasoning_packet = await llm_api.call_best_move_reasoning_tool_async(
+        prompt_payloads.move_payload(analysis, result["move"]),
+        prompt_payloads.dangers_payload(analysis),
+        engine_summary
+    )
+    reasoning = reasoning_packet.get("reasoning")
+    if reasoning:
+        return reasoning
+    line = " ".join(result["pv"]) or result["move"]
+    return f"I calculated {result['depth']} moves deep and {result['move']} came out on top (expected line: {line})."
+
+async def _local_personality_move(tool_choice, analysis, user_skill_level):
+    """Picks a "human" or "blunder" move with move_selectors; returns a packet or None."""
+    strength = SELECTOR_STRENGTH.get(user_skill_level, {}).get(tool_choice)
+    selection = move_selectors.select_move(analysis, tool_choice, strength)
+    if not selection:
+        return None
+    print(f"[OPPONENT AGENT] Local '{tool_choice}' selector chose {selection['move']} (score {selection['score']}).")
+    reasoning = selection["reasoning"]
+    if USE_LLM_FOR_LOCAL_REASONING:
+        reasoning_packet = await llm_api.call_personality_reasoning_tool_async(
+            prompt_payloads.move_payload(analysis, selection["move"]),
+            prompt_payloads.dangers_payload(analysis),
+            tool_choice
+        )
+        reasoning = reasoning_packet.get("reasoning") or reasoning
+    return {"move": selection["move"], "reasoning": reasoning}
+
+async def _call_specialist(tool_choice, analysis, game, user_skill_level=None):
+    """
+    Runs one personality's tool and returns its {"move", "reasoning"}
+    packet (validated by the caller). "best" uses the local engine when
+    enabled, falling back to the Best Move Tool; "human" and "blunder"
+    use the local selectors when enabled.
+    """
+    tactical_threats_json = prompt_payloads.dangers_payload(analysis)
+    if tool_choice in ("human", "blunder") and USE_LOCAL_SELECTORS:
+        packet = await _local_personality_move(tool_choice, analysis, user_skill_level)
+        if packet:
+            return packet
+    if tool_choice == "best" and USE_LOCAL_ENGINE_FOR_BEST:
+        result = await llm_runtime.run_blocking(_engine_best_move, game, ENGINE_TIME_BUDGET)
+        if result:
+            return {"move": result["move"], "reasoning": await _engine_reasoning(analysis, result)}
+        print("[OPPONENT AGENT] No local engine result, calling Best Move Tool...")
+        return await llm_api.call_best_move_tool_async(
+            prompt_payloads.options_payload(analysis, "best_move"), tactical_threats_json)
+    if tool_choice == "best":
+        print("[OPPONENT AGENT] Calling Best Move Tool...")
+        return await llm_api.call_best_move_tool_async(
+            prompt_payloads.options_payload(analysis, "best_move"), tactical_threats_json)
+    if tool_choice == "blunder":
+        print("[OPPONENT AGENT] Calling Teaching Blunder Tool...")
+        return await llm_api.call_teaching_blunder_tool_async(
+            prompt_payloads.options_payload(analysis, "teaching_blunder"), tactical_threats_json)
+    print("[OPPONENT AGENT] Calling Human-Like Move Tool...")
+    return await llm_api.call_human_like_move_tool_async(
+        prompt_payloads.options_payload(analysis, "human_move"), tactical_threats_json)
+
+async def _route_and_dispatch_speculatively(analysis, user_skill_level, game):
+    """
+    Starts the LLM router and the SPECULATIVE_POLICY specialists together.
+    Returns (router_packet, tasks) where tasks maps each speculatively
+    started tool to its asyncio Task.
+    """
+    speculative_tools = SPECULATIVE_POLICY.get(user_skill_level, ())
+    print(f"[OPPONENT AGENT] Speculatively starting {list(speculative_tools)} alongside the Router Agent...")
+    tasks = {
+        tool: asyncio.create_task(_call_specialist(tool, analysis, game, user_skill_level))
+        for tool in speculative_tools
+    }
+    router_packet = await llm_api.call_opponent_router_agent_async(
+        analysis.enhanced_moves_json,
+        analysis.tactical_threats_json,
+        user_skill_level
+    )
+    return router_packet, tasks
+
+async def _fallback_move(game, legal_moves_list_simple, reasoning):
+    """Instant fallback: a short engine search, or a random move without a game."""
+    result = await llm_runtime.run_blocking(_engine_best_move, game, ENGINE_FALLBACK_TIME_BUDGET)
+    if result:
+        print(f"[OPPONENT AGENT] Fallback: Playing engine move {result['move']}.")
+        return {
+            "move": result["move"],
+            "reasoning": reasoning,
+            "move_type": "best"
+        }
+    print("[OPPONENT AGENT] Fallback: Choosing random move.")
+    return {
+        "move": random.choice(legal_moves_list_simple),
+        "reasoning": reasoning,
+        "move_type": "blunder" # Treat errors as blunders
+    }
+
+
+async def get_ai_move_async(analysis, user_skill_level, game=None):
     """
     This is the main "brain" of the AI Opponent Agent.
     It is now a "Router Agent" that first analyzes the situation,
     then calls a specialized tool ("best", "human", or "blunder").
     
     Uses "Move Consequence Mapping" ("Options List") and
-    "Tactical Threats" ("Dangers List") as the new ground truth.
+    "Tactical Threats" ("Dangers List") as the new ground truth,
+    both taken from the AI's PositionAnalysis.
+
+    When `game` is given, the "best" personality and every error
+    fallback use the local search engine; the LLM only writes the
+    reasoning for an engine move.
     """
     print(f"[OPPONENT AGENT] AI move requested. Skill level: {user_skill_level}")
+    enhanced_moves_json = analysis.enhanced_moves_json
+    tactical_threats_json = analysis.tactical_threats_json
+    legal_moves_list_simple = analysis.legal_moves
     
     # --- 1. Call the Router Agent ---
     # This call decides *which* personality to use based on high-level
     # definitions and principles.
-    print(f"[OPPONENT AGENT] Calling Router Agent to select personality...")
-    router_packet = llm_api.call_opponent_router_agent(
-        enhanced_moves_json, 
-        tactical_threats_json, 
-        user_skill_level
-    )
+    speculative_tasks = {}
+    if USE_LOCAL_ROUTER:
+        router_packet = route_personality(analysis, user_skill_level, game)
+    elif SPECULATIVE_DISPATCH:
+        router_packet, speculative_tasks = await _route_and_dispatch_speculatively(analysis, user_skill_level, game)
+    else:
+        print(f"[OPPONENT AGENT] Calling Router Agent to select personality...")
+        router_packet = await llm_api.call_opponent_router_agent_async(
+            enhanced_moves_json, 
+            tactical_threats_json, 
+            user_skill_level
+        )
     
     tool_choice = router_packet.get("tool_choice")
     if not tool_choice or tool_choice not in ["best", "human", "blunder"]:
@@ -31,31 +257,26 @@ def get_ai_move(enhanced_moves_json, tactical_threats_json, legal_moves_list_sim
     print(f"[OPPONENT AGENT] Router Agent selected: '{tool_choice}' based on reasoning: {router_packet.get('reasoning')}")
 
     # --- 2. Call the Selected Specialist Tool ---
-    # Data is already in JSON string format from app.py
+    # Data is already serialized once by the PositionAnalysis
     legal_moves_str = ", ".join(legal_moves_list_simple) # For sanitizer
     
-    packet = None
-    
-    if tool_choice == "best":
-        print("[OPPONENT AGENT] Calling Best Move Tool...")
-        packet = llm_api.call_best_move_tool(enhanced_moves_json, tactical_threats_json)
-    elif tool_choice == "blunder":
-        print("[OPPONENT AGENT] Calling Teaching Blunder Tool...")
-        packet = llm_api.call_teaching_blunder_tool(enhanced_moves_json, tactical_threats_json)
-    else: # "human"
-        print("[OPPONENT AGENT] Calling Human-Like Move Tool...")
-        packet = llm_api.call_human_like_move_tool(enhanced_moves_json, tactical_threats_json)
+    # Keep the speculative call the router picked; cancel the rest
+    for tool, task in speculative_tasks.items():
+        if tool != tool_choice:
+            task.cancel()
+            print(f"[OPPONENT AGENT] Cancelled speculative '{tool}' call.")
+
+    if tool_choice in speculative_tasks:
+        print(f"[OPPONENT AGENT] Using speculative '{tool_choice}' result.")
+        packet = await speculative_tasks[tool_choice]
+    else:
+        packet = await _call_specialist(tool_choice, analysis, game, user_skill_level)
 
     # --- 3. Validate and Return Final Packet ---
     if not packet or "move" not in packet or "reasoning" not in packet:
         print(f"!!! CRITICAL: AI Opponent Tool ({tool_choice}) failed or returned bad data.")
-        print("[OPPONENT AGENT] Fallback: Choosing random move.")
-        fallback_move = random.choice(legal_moves_list_simple)
-        return {
-            "move": fallback_move,
-            "reasoning": "I had a connection error, so I just picked a random move!",
-            "move_type": "blunder" # Treat errors as blunders
-        }
+        replacement = "went with my own quick calculation" if game else "just picked a random move"
+        return await _fallback_move(game, legal_moves_list_simple, f"I had a connection error, so I {replacement}!")
 
     # Validation Flow
     raw_move = packet["move"]
@@ -70,11 +291,19 @@ def get_ai_move(enhanced_moves_json, tactical_threats_json, legal_moves_list_sim
             "move_type": tool_choice
         }
     
-    # 2. Repair Path: If not legal, call the Sanitizer Tool
+    # 2. Repair Path: If not legal, try the local matcher, then the Sanitizer Tool
     print(f"!!! WARNING: AI Opponent Tool ({tool_choice}) hallucinated an illegal move: '{raw_move}'.")
-    print("[OPPONENT AGENT] Calling Move Sanitizer Tool to attempt repair...")
+    local_move = sanitize_move(raw_move, analysis.enhanced_moves)
+    if local_move:
+        print(f"[OPPONENT AGENT] Local repair matched '{raw_move}' to '{local_move}'.")
+        return {
+            "move": local_move,
+            "reasoning": packet["reasoning"],
+            "move_type": tool_choice
+        }
+    print("[OPPONENT AGENT] No unique local match. Calling Move Sanitizer Tool to attempt repair...")
     
-    repaired_packet = llm_api.call_move_sanitizer_tool(raw_move, legal_moves_str)
+    repaired_packet = await llm_api.call_move_sanitizer_tool_async(raw_move, legal_moves_str)
     repaired_move = repaired_packet.get("move") # Will be None if it fails
 
     # 3. Check if repair was successful
@@ -88,10 +317,14 @@ def get_ai_move(enhanced_moves_json, tactical_threats_json, legal_moves_list_sim
         
     # 4. Final Fallback: Repair failed or returned an illegal move
     print(f"!!! CRITICAL: Move repair failed. Sanitized move '{repaired_move}' is still illegal.")
-    print("[OPPONENT AGENT] Fallback: Choosing random move.")
-    fallback_move = random.choice(legal_moves_list_simple)
-    return {
-        "move": fallback_move,
-        "reasoning": f"My brain short-circuited! I wanted to play {raw_move} but it wasn't a valid move. I played a random move instead.",
-        "move_type": "blunder"
-    }
\ No newline at end of file
+    replacement = "my own quick calculation" if game else "a random move"
+    return await _fallback_move(
+        game,
+        legal_moves_list_simple,
+        f"My brain short-circuited! I wanted to play {raw_move} but it wasn't a valid move. I played {replacement} instead."
+    )
+
+
+def get_ai_move(analysis, user_skill_level, game=None):
+    """Blocking wrapper: runs get_ai_move_async on llm_runtime's shared event loop."""
+    return llm_runtime.run(get_ai_move_async(analysis, user_skill_level, game))
@@ -5,14 +5,18 @@ load_dotenv()
 
 import os
 import json
+import itertools
 import coach_agent
 import ai_opponent_agent
 import chess_llm_functions as ll_api
+import llm_cache
+import llm_runtime
+import prompt_payloads
 
 from PIL import Image
 from chess_app_functions import *
 from chess_logic import ChessGame
-from concurrent.futures import ThreadPoolExecutor # FOR PARALLEL CALLS
+from pondering import Ponderer
 from streamlit_image_coordinates import streamlit_image_coordinates
 
 #--- PAGE CONFIG --
@@ -27,6 +31,14 @@ st.title("")
 #--- SIDEBAR (simplified) -------------
 st.sidebar.header("About")
 st.sidebar.info("This chess app uses a team of specialized LLM agents to create a dynamic coaching experience. An Opponent Agent plays against you, while a Coach Agent analyzes your moves for key learning moments.")
+if llm_cache.CACHE_ENABLED:
+    cache_stats = llm_cache.response_cache.stats()
+    st.sidebar.caption(f"LLM cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses "
+                       f"({cache_stats['hit_rate']:.0%} hit rate, {cache_stats['entries']} entries)")
+token_totals = prompt_payloads.token_stats().values()
+if token_totals:
+    st.sidebar.caption(f"Prompt tokens: ~{sum(t['prompt_tokens'] for t in token_totals)} "
+                       f"over {sum(t['calls'] for t in token_totals)} LLM calls")
 
 
 #--- MAIN CONTENT AREA -----------------------------------------------
@@ -66,8 +78,13 @@ def init_game():
     # Post-game summary state
     st.session_state.post_game_summary_done = False
     
-    # Pre-move context for Coach
-    st.session_state.human_context_packet = None
+    # Pre-move context for Coach (a PositionAnalysis)
+    st.session_state.human_context_analysis = None
+
+    # Background worker precomputing AI replies during the human's turn
+    if 'ponderer' in st.session_state:
+        st.session_state.ponderer.shutdown()
+    st.session_state.ponderer = Ponderer()
 
 # Check if a game needs to be initialized
 if 'chess_game' not in st.session_state:
@@ -77,11 +94,30 @@ game = st.session_state.chess_game
 
 # --- UI DRAWING FUNCTIONS ---
 
+def render_chat_message(role, text):
+    """Renders one chat bubble."""
+    with st.chat_message(name=role, avatar="🤖" if role == "coach" else "🧑"):
+        st.write(text)
+
 def render_chat():
     """Renders the chat history."""
     for msg in st.session_state.chat_history:
-        with st.chat_message(name=msg["role"], avatar="🤖" if msg["role"] == "coach" else "🧑"):
-            st.write(msg['text'])
+        render_chat_message(msg["role"], msg['text'])
+
+def render_chat_stream(text_stream):
+    """
+    Streams a coach reply (an llm_runtime.TextStream) into the chat as it
+    is generated and returns the streamed text. No bubble is drawn if the
+    reply has no text (e.g. a silent coach or a failed call).
+    """
+    pieces = iter(text_stream)
+    with st.spinner("Coach Joey is thinking..."):
+        # Spinner is shown while waiting for the *first* chunk
+        first_piece = next(pieces, None)
+    if first_piece is None:
+        return None
+    with st.chat_message(name="coach", avatar="🤖"):
+        return st.write_stream(itertools.chain([first_piece], pieces))
 
 def draw_opponent_panel():
     """
@@ -118,7 +154,8 @@ def draw_board(is_opponent_thinking=False):
 
 def draw_right_panel(chat_spinner=False, is_board_disabled=False):
     """
-    Draws the right column (info, chat, moves) and returns user input.
+    Draws the right column (info, chat, moves) and returns the user's
+    chat input and the chat container (for streaming replies into).
     """
     
     # --- Game Info Panel ---
@@ -210,7 +247,7 @@ def draw_right_panel(chat_spinner=False, is_board_disabled=False):
     st.subheader("Move History")
     st.text_area("Moves", "\n".join(f"{i+1}. {move}" for i, move in enumerate(game.move_history)), height=150)
     
-    return user_prompt
+    return user_prompt, chat_container
 
 
 # --- SINGLE-PASS UI DRAW ---
@@ -229,7 +266,7 @@ with col1:
     click_value = draw_board(is_opponent_thinking)
 
 with col2:
-    user_prompt = draw_right_panel(chat_spinner, is_board_disabled)
+    user_prompt, chat_container = draw_right_panel(chat_spinner, is_board_disabled)
 
 
 # --- GAME PHASE LOGIC (Agent-based) ---
@@ -241,6 +278,10 @@ if phase == 'color_selection':
 elif phase in ['playing', 'awaiting_user_decision']:
     # --- This phase handles all USER interactions (clicks or chat) ---
     
+    # Ponder the AI's replies to the human's likely moves while they think
+    if phase == 'playing' and not game.game_over and not game.promotion_pending:
+        st.session_state.ponderer.start(game, st.session_state.player_color, st.session_state.user_skill_level)
+
     if user_prompt:
         # User sent a chat message
         st.session_state.chat_history.append({"role": "user", "text": user_prompt})
@@ -267,11 +308,7 @@ elif phase in ['playing', 'awaiting_user_decision']:
                     st.rerun()
                 else:
                     # Capture "Coach" context *before* the move
-                    human_context_packet = {
-                        "dangers_before": game.get_tactical_threats(game.turn),
-                        "options_before": game.get_all_legal_moves_with_consequences(game.turn)
-                    }
-                    st.session_state.human_context_packet = human_context_packet
+                    st.session_state.human_context_analysis = game.get_position_analysis(game.turn)
 
                     # Attempt to make the move
                     game.store_pre_move_state() # Store state in case of take-back
@@ -285,7 +322,7 @@ elif phase in ['playing', 'awaiting_user_decision']:
                     elif not success:
                         # Move was invalid
                         game.revert_to_pre_move_state() # Revert to before move attempt
-                        st.session_state.human_context_packet = None # Clear context
+                        st.session_state.human_context_analysis = None # Clear context
                         if clicked_piece and clicked_piece.color == game.turn:
                             st.session_state.selected_square = pos
                         st.rerun()
@@ -300,13 +337,13 @@ elif phase == 'processing_llms':
     
     # 1. Get data for the Coach Agent (Coach)
     last_move_data = game.game_data[-1]
-    human_context = st.session_state.human_context_packet
+    human_context = st.session_state.human_context_analysis
     
     # Print the ground truth for debugging
     print("\n" + "="*50)
     print("--- [GROUND TRUTH] COACH CONTEXT ---")
-    print(f"Dangers: {json.dumps(human_context['dangers_before'], indent=2)}")
-    print(f"Options: {len(human_context['options_before'])} legal moves found")
+    print(f"Dangers: {json.dumps(human_context.tactical_threats, indent=2)}")
+    print(f"Options: {len(human_context.legal_moves)} legal moves found")
     print(f"Chosen Move: {json.dumps(last_move_data, indent=2)}")
     print("="*50 + "\n")
     
@@ -314,47 +351,50 @@ elif phase == 'processing_llms':
     user_skill_level = st.session_state.user_skill_level
     player_color = st.session_state.player_color
     
-    # Generate the "Move Consequence Mapping" for the opponent
-    opponent_enhanced_moves = game.get_all_legal_moves_with_consequences(st.session_state.ai_color)
-    # Generate the "Dangers List" for the opponent
-    opponent_tactical_threats = game.get_tactical_threats(st.session_state.ai_color)
-    opponent_legal_moves_simple = [m['move'] for m in opponent_enhanced_moves] # For validation
+    # The "Move Consequence Mapping" and "Dangers List" for the opponent
+    opponent_analysis = game.get_position_analysis(st.session_state.ai_color)
     
     # 3. Call both agents in parallel
     instruction_packet = None
     ai_move_packet = None
 
-    with ThreadPoolExecutor() as executor:
-        # Submit Coach Agent
-        coach_future = executor.submit(
-            coach_agent.get_coaching_packet,
+    # A pondered reply to this exact position is picked up in processing_ai_move
+    pondered = st.session_state.ponderer.has_reply(game.position_hash, user_skill_level)
+    if not pondered:
+        st.session_state.ponderer.reset() # Free the worker for the real call
+
+    # Both agents run as coroutines on the shared LLM event loop, so their
+    # API calls overlap without creating threads on every move
+    dangers_after = game.get_tactical_threats(player_color)
+    run_opponent = not game.game_over and not pondered
+
+    def run_agents(on_text):
+        coroutines = [coach_agent.get_coaching_packet_async(
             last_move_data,
-            json.dumps(human_context['dangers_before']),
-            json.dumps(human_context['options_before']),
+            human_context,
             user_skill_level,
-            player_color
-        )
-        
-        # Submit Opponent Agent (only if game isn't over)
-        ai_future = None
-        if not game.game_over:
-            ai_future = executor.submit(
-                ai_opponent_agent.get_ai_move,
-                json.dumps(opponent_enhanced_moves),  # Pass as JSON
-                json.dumps(opponent_tactical_threats), # Pass as JSON
-                opponent_legal_moves_simple,
-                user_skill_level
-            )
-
-        # Wait for both futures to complete and get their results
-        instruction_packet = coach_future.result()
-        if ai_future:
-            ai_move_packet = ai_future.result()
+            player_color,
+            dangers_after, # Dangers after the move
+            on_text=on_text
+        )]
+        # Run the Opponent Agent too (only if game isn't over)
+        if run_opponent:
+            coroutines.append(ai_opponent_agent.get_ai_move_async(opponent_analysis, user_skill_level, game))
+        return llm_runtime.gather_async(*coroutines)
+
+    # The coach's message streams into the chat while both agents work
+    agents_stream = llm_runtime.TextStream(run_agents)
+    with chat_container:
+        render_chat_stream(agents_stream)
+    agent_results = agents_stream.wait()
+    instruction_packet = agent_results[0]
+    if run_opponent:
+        ai_move_packet = agent_results[1]
         
     # 4. Store packets in session state and move to next phase
     st.session_state.pending_coach_packet = instruction_packet
     st.session_state.pending_ai_packet = ai_move_packet
-    st.session_state.human_context_packet = None # Clear context packet
+    st.session_state.human_context_analysis = None # Clear context analysis
     st.session_state.chess_game_phase = 'processing_coach_packet'
     st.rerun()
 
@@ -381,12 +421,18 @@ elif phase == 'processing_coach_packet':
         if message:
             st.session_state.chat_history.append({"role": "coach", "text": message})
         
-        # Call the Post-Game tool
+        # Call the Post-Game tool, streaming the summary into the chat
         print("[APP] Game over. Calling Post-Game Summary Tool...")
-        summary_packet = coach_agent.get_post_game_summary(
-            json.dumps(game.game_data),
-            st.session_state.player_color
+        game_data_json = json.dumps(game.game_data)
+        player_color = st.session_state.player_color
+        summary_stream = llm_runtime.TextStream(
+            lambda on_text: coach_agent.get_post_game_summary_async(game_data_json, player_color, on_text)
         )
+        with chat_container:
+            if message:
+                render_chat_message("coach", message)
+            render_chat_stream(summary_stream)
+        summary_packet = summary_stream.wait()
         summary_message = summary_packet.get("message", "Game over. Well played!")
         st.session_state.chat_history.append({"role": "coach", "text": summary_message})
         
@@ -431,6 +477,7 @@ elif phase == 'processing_chat_message':
                 last_coach_message = msg['text']
                 break
                 
+    analysis = game.get_position_analysis(game.turn)
     game_context = {
         "user_skill_level": st.session_state.user_skill_level,
         "player_color": st.session_state.player_color,
@@ -438,14 +485,20 @@ elif phase == 'processing_chat_message':
         "last_coach_message": last_coach_message,
         "current_turn": game.turn,
         # Provide live, ground-truth data for the 'analyze_board' specialist
-        "dangers_list": json.dumps(game.get_tactical_threats(game.turn)),
-        "options_list": json.dumps(game.get_all_legal_moves_with_consequences(game.turn))
+        # (compact and relevance-pruned, see prompt_payloads)
+        "dangers_list": prompt_payloads.dangers_payload(analysis),
+        "options_list": prompt_payloads.options_payload(analysis, "qa_analyze_board")
     }
     game_context_json = json.dumps(game_context)
     
-    # 2. Call the Q&A Agent (non-streaming)
+    # 2. Call the Q&A Agent, streaming the answer into the chat
     # This single call runs the entire "Router -> Specialist" pipeline
-    qa_packet = coach_agent.get_qa_response(user_query, game_context_json)
+    qa_stream = llm_runtime.TextStream(
+        lambda on_text: coach_agent.get_qa_response_async(user_query, game_context_json, on_text)
+    )
+    with chat_container:
+        render_chat_stream(qa_stream)
+    qa_packet = qa_stream.wait()
     
     # 3. Add the response and return to the game
     response_text = qa_packet.get("commentary", "My apologies, I had a connection issue.")
@@ -468,25 +521,25 @@ elif phase == 'processing_ai_move':
     ai_packet = st.session_state.pending_ai_packet
     st.session_state.pending_ai_packet = None # Clear packet
     
+    if not ai_packet:
+        # Precomputed while the human was thinking?
+        ai_packet = st.session_state.ponderer.take(game.position_hash, st.session_state.user_skill_level)
+
     if not ai_packet:
         # This can happen if it's AI's turn first
         print("[APP] No AI packet found, generating one now...")
         
-        # Generate the "Move Consequence Mapping" for the opponent
-        opponent_enhanced_moves = game.get_all_legal_moves_with_consequences(st.session_state.ai_color)
-        # Generate the "Dangers List" for the opponent
-        opponent_tactical_threats = game.get_tactical_threats(st.session_state.ai_color)
-        opponent_legal_moves_simple = [m['move'] for m in opponent_enhanced_moves] # For validation
+        # The "Move Consequence Mapping" and "Dangers List" for the opponent
+        opponent_analysis = game.get_position_analysis(st.session_state.ai_color)
         
-        if not opponent_legal_moves_simple:
+        if not opponent_analysis.legal_moves:
             st.session_state.chess_game_phase = 'playing' # Game is over (stalemate/checkmate)
             st.rerun()
             
         ai_packet = ai_opponent_agent.get_ai_move(
-            json.dumps(opponent_enhanced_moves),  # Pass as JSON
-            json.dumps(opponent_tactical_threats), # Pass as JSON
-            opponent_legal_moves_simple,
-            st.session_state.user_skill_level
+            opponent_analysis,
+            st.session_state.user_skill_level,
+            game=game
         )
 
     # 4. Make the AI's move on the board
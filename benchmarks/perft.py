@@ -0,0 +1,170 @@
+"""
+Perft and move-generation benchmark for chess_logic.
+
+Perft counts every leaf of the legal move tree to a fixed depth. The counts
+for the reference positions below are well known, so any mismatch is a rules
+bug; the nodes-per-second figure tracks raw engine speed. Each position also
+times the analysis calls the agents depend on.
+
+Usage (from the repository root):
+    python benchmarks/perft.py                 # all positions, default depths
+    python benchmarks/perft.py --depth 4       # go deeper where counts are known
+    python benchmarks/perft.py --position kiwipete --divide
+
+Exits with status 1 if any node count is wrong.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chess_logic import ChessGame, Pawn, Knight, Bishop, Rook, Queen
+
+# --- Reference Positions ---
+# Node counts per depth from the standard perft suites.
+POSITIONS = [
+    {
+        "name": "start",
+        "fen": "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+        "nodes": {1: 20, 2: 400, 3: 8902, 4: 197281},
+    },
+    {
+        "name": "kiwipete", # Castling, pins, en passant and promotion all at once
+        "fen": "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+        "nodes": {1: 48, 2: 2039, 3: 97862},
+    },
+    {
+        "name": "en_passant_pins", # Horizontal pins through en passant captures
+        "fen": "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+        "nodes": {1: 14, 2: 191, 3: 2812, 4: 43238},
+    },
+    {
+        "name": "promotion_checks",
+        "fen": "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+        "nodes": {1: 6, 2: 264, 3: 9467},
+    },
+    {
+        "name": "promotion_captures",
+        "fen": "n1n5/PPPk4/8/8/8/8/4Kppp/5N1N b - - 0 1",
+        "nodes": {1: 24, 2: 496, 3: 9483},
+    },
+    {
+        "name": "castling",
+        "fen": "r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1",
+        "nodes": {1: 26, 2: 568, 3: 13744},
+    },
+    {
+        "name": "middlegame",
+        "fen": "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+        "nodes": {1: 44, 2: 1486, 3: 62379},
+    },
+]
+
+PROMOTION_CLASSES = (Queen, Rook, Bishop, Knight)
+PROMOTION_LETTERS = {Queen: 'Q', Rook: 'R', Bishop: 'B', Knight: 'N'}
+
+# --- Perft ---
+
+def _expand_moves(game):
+    """Legal moves as (start, end, promotion_class), one entry per promotion piece."""
+    promotion_rank = 0 if game.turn == 'white' else 7
+    moves = []
+    for start_pos, end_pos, piece in game._get_all_legal_moves_tuples(game.turn):
+        if isinstance(piece, Pawn) and end_pos[0] == promotion_rank:
+            moves.extend((start_pos, end_pos, cls) for cls in PROMOTION_CLASSES)
+        else:
+            moves.append((start_pos, end_pos, None))
+    return moves
+
+def perft(game, depth):
+    """Counts the leaf nodes of the legal move tree, using make/unmake."""
+    moves = _expand_moves(game)
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for start_pos, end_pos, promotion_class in moves:
+        game._push_move(start_pos, end_pos, promotion_class)
+        nodes += perft(game, depth - 1)
+        game._pop_move()
+    return nodes
+
+def divide(game, depth):
+    """Per-root-move node counts, for bisecting a perft mismatch."""
+    counts = {}
+    for start_pos, end_pos, promotion_class in _expand_moves(game):
+        move = f"{game.pos_to_notation(start_pos)}-{game.pos_to_notation(end_pos)}"
+        if promotion_class:
+            move += f"={PROMOTION_LETTERS[promotion_class]}"
+        game._push_move(start_pos, end_pos, promotion_class)
+        counts[move] = perft(game, depth - 1) if depth > 1 else 1
+        game._pop_move()
+    return counts
+
+# --- Analysis Timings ---
+
+def time_call(func, repeat):
+    """Returns the mean wall time of func() in milliseconds."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) * 1000 / repeat
+
+def time_analysis(game, repeat):
+    """Times the per-position analysis the agents rely on (uncached)."""
+    def consequences():
+        game._consequence_cache.clear() # Measure the work, not the memo
+        game.get_all_legal_moves_with_consequences(game.turn)
+    return {
+        "consequences": time_call(consequences, repeat),
+        "threats": time_call(lambda: game.get_tactical_threats(game.turn), repeat),
+        "status": time_call(game._update_game_status, repeat),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Perft and analysis benchmark for chess_logic.")
+    parser.add_argument("--depth", type=int, default=3, help="Maximum perft depth (default: 3)")
+    parser.add_argument("--position", action="append", help="Only run the named position(s)")
+    parser.add_argument("--divide", action="store_true", help="Print per-move counts at the deepest depth")
+    parser.add_argument("--repeat", type=int, default=50, help="Repetitions per analysis timing")
+    args = parser.parse_args()
+
+    positions = [p for p in POSITIONS if not args.position or p["name"] in args.position]
+    failures = 0
+    total_nodes, total_time = 0, 0.0
+
+    print(f"{'position':<20}{'depth':>6}{'nodes':>12}{'expected':>12}{'time (s)':>10}{'nps':>10}")
+    for position in positions:
+        game = ChessGame(position["fen"])
+        for depth in range(1, args.depth + 1):
+            start = time.perf_counter()
+            nodes = perft(game, depth)
+            elapsed = time.perf_counter() - start
+            total_nodes += nodes
+            total_time += elapsed
+            expected = position["nodes"].get(depth)
+            flag = ""
+            if expected is not None and nodes != expected:
+                failures += 1
+                flag = "  MISMATCH"
+            print(f"{position['name']:<20}{depth:>6}{nodes:>12}{expected if expected is not None else '?':>12}"
+                  f"{elapsed:>10.3f}{nodes / elapsed if elapsed else 0:>10.0f}{flag}")
+        if args.divide:
+            for move, count in sorted(divide(game, args.depth).items()):
+                print(f"    {move}: {count}")
+
+    print(f"\nTotal: {total_nodes} nodes in {total_time:.2f}s ({total_nodes / total_time if total_time else 0:.0f} nps)")
+
+    print(f"\n{'position':<20}{'consequences (ms)':>19}{'threats (ms)':>14}{'status (ms)':>13}")
+    for position in positions:
+        timings = time_analysis(ChessGame(position["fen"]), args.repeat)
+        print(f"{position['name']:<20}{timings['consequences']:>19.3f}{timings['threats']:>14.3f}{timings['status']:>13.3f}")
+
+    if failures:
+        print(f"\n!!! CRITICAL: {failures} perft count(s) did not match.")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,359 @@
+import time
+from chess_logic import ChessGame, Queen, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, iter_bits
+
+# --- Search Settings ---
+MATE_SCORE = 100000 # Mate scores are MATE_SCORE - plies to mate
+INFINITY = 10 ** 9
+MAX_DEPTH = 32
+DEFAULT_TT_SIZE = 1 << 16 # Transposition table slots (a power of two)
+TIME_CHECK_INTERVAL = 256 # Nodes between clock checks
+
+# TT bound flags
+EXACT, LOWER_BOUND, UPPER_BOUND = 0, 1, 2
+
+# --- Evaluation Tables ---
+# Centipawn values indexed by piece type (PAWN..KING)
+PIECE_VALUES_CP = (100, 320, 330, 500, 900, 0)
+
+# Piece-square tables from White's point of view, a8..h1 (the board's own
+# square order); Black looks them up with the square mirrored (sq ^ 56).
+PAWN_TABLE = (
+     0,   0,   0,   0,   0,   0,   0,   0,
+    50,  50,  50,  50,  50,  50,  50,  50,
+    10,  10,  20,  30,  30,  20,  10,  10,
+     5,   5,  10,  25,  25,  10,   5,   5,
+     0,   0,   0,  20,  20,   0,   0,   0,
+     5,  -5, -10,   0,   0, -10,  -5,   5,
+     5,  10,  10, -20, -20,  10,  10,   5,
+     0,   0,   0,   0,   0,   0,   0,   0,
+)
+KNIGHT_TABLE = (
+   -50, -40, -30, -30, -30, -30, -40, -50,
+   -40, -20,   0,   0,   0,   0, -20, -40,
+   -30,   0,  10,  15,  15,  10,   0, -30,
+   -30,   5,  15,  20,  20,  15,   5, -30,
+   -30,   0,  15,  20,  20,  15,   0, -30,
+   -30,   5,  10,  15,  15,  10,   5, -30,
+   -40, -20,   0,   5,   5,   0, -20, -40,
+   -50, -40, -30, -30, -30, -30, -40, -50,
+)
+BISHOP_TABLE = (
+   -20, -10, -10, -10, -10, -10, -10, -20,
+   -10,   0,   0,   0,   0,   0,   0, -10,
+   -10,   0,   5,  10,  10,   5,   0, -10,
+   -10,   5,   5,  10,  10,   5,   5, -10,
+   -10,   0,  10,  10,  10,  10,   0, -10,
+   -10,  10,  10,  10,  10,  10,  10, -10,
+   -10,   5,   0,   0,   0,   0,   5, -10,
+   -20, -10, -10, -10, -10, -10, -10, -20,
+)
+ROOK_TABLE = (
+     0,   0,   0,   0,   0,   0,   0,   0,
+     5,  10,  10,  10,  10,  10,  10,   5,
+    -5,   0,   0,   0,   0,   0,   0,  -5,
+    -5,   0,   0,   0,   0,   0,   0,  -5,
+    -5,   0,   0,   0,   0,   0,   0,  -5,
+    -5,   0,   0,   0,   0,   0,   0,  -5,
+    -5,   0,   0,   0,   0,   0,   0,  -5,
+     0,   0,   0,   5,   5,   0,   0,   0,
+)
+QUEEN_TABLE = (
+   -20, -10, -10,  -5,  -5, -10, -10, -20,
+   -10,   0,   0,   0,   0,   0,   0, -10,
+   -10,   0,   5,   5,   5,   5,   0, -10,
+    -5,   0,   5,   5,   5,   5,   0,  -5,
+     0,   0,   5,   5,   5,   5,   0,  -5,
+   -10,   5,   5,   5,   5,   5,   0, -10,
+   -10,   0,   5,   0,   0,   0,   0, -10,
+   -20, -10, -10,  -5,  -5, -10, -10, -20,
+)
+KING_TABLE = (
+   -30, -40, -40, -50, -50, -40, -40, -30,
+   -30, -40, -40, -50, -50, -40, -40, -30,
+   -30, -40, -40, -50, -50, -40, -40, -30,
+   -30, -40, -40, -50, -50, -40, -40, -30,
+   -20, -30, -30, -40, -40, -30, -30, -20,
+   -10, -20, -20, -20, -20, -20, -20, -10,
+    20,  20,   0,   0,   0,   0,  20,  20,
+    20,  30,  10,   0,   0,  10,  30,  20,
+)
+PIECE_SQUARE_TABLES = (PAWN_TABLE, KNIGHT_TABLE, BISHOP_TABLE, ROOK_TABLE, QUEEN_TABLE, KING_TABLE)
+
+# Value + table bonus per piece code and square, so evaluation is one lookup per piece
+_PIECE_SQUARE_SCORES = [None] * 12
+for _piece_type in (PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING):
+    _table = PIECE_SQUARE_TABLES[_piece_type]
+    _PIECE_SQUARE_SCORES[_piece_type] = [PIECE_VALUES_CP[_piece_type] + _table[sq] for sq in range(64)]
+    _PIECE_SQUARE_SCORES[_piece_type + 6] = [PIECE_VALUES_CP[_piece_type] + _table[sq ^ 56] for sq in range(64)]
+
+class _SearchTimeout(Exception):
+    """Raised inside the search when the time budget runs out."""
+
+def evaluate(board, color):
+    """Static evaluation in centipawns from `color`'s point of view."""
+    bitboards = board.bitboards
+    score = 0
+    for code in range(6):
+        table = _PIECE_SQUARE_SCORES[code]
+        for sq in iter_bits(bitboards[code]):
+            score += table[sq]
+    for code in range(6, 12):
+        table = _PIECE_SQUARE_SCORES[code]
+        for sq in iter_bits(bitboards[code]):
+            score -= table[sq]
+    return score if color == 'white' else -score
+
+class SearchEngine:
+    """
+    A small in-process chess engine over ChessGame: iterative-deepening
+    alpha-beta (negamax) with a bounded transposition table, TT-move /
+    MVV-LVA / killer move ordering and a captures-only quiescence search,
+    all under a hard wall-clock budget.
+
+    The search runs on a private copy of the game (rebuilt from FEN), so
+    the caller's game is never touched and can be read by other threads.
+    Promotions are searched as Queen promotions only, matching how the
+    app auto-promotes the AI's pawns.
+    """
+    def __init__(self, tt_size=DEFAULT_TT_SIZE):
+        self.tt_size = tt_size
+        self.tt = [None] * tt_size # (key, depth, score, flag, move)
+
+    def search(self, game, time_budget=1.0, max_depth=MAX_DEPTH):
+        """
+        Searches the side to move's best move. Returns a result packet:
+        {"move": "e2-e4", "score": centipawns, "depth": int, "nodes": int,
+         "time": seconds, "pv": ["e2-e4", ...]}, or None with no legal moves.
+        Depth 1 always completes, so a move is returned even on a tiny budget.
+        """
+        start_time = time.perf_counter()
+        self.deadline = start_time + time_budget
+        self.nodes = 0
+        self.killers = [[None, None] for _ in range(max_depth + 1)]
+        self.root = ChessGame(game.get_fen())
+        # Any position already seen in the real game counts as a repetition
+        self.seen_positions = set(game.position_history)
+        self.path = []
+
+        if not self._ordered_moves(self.root, 0, None):
+            return None
+
+        best_move, best_score, completed_depth = None, 0, 0
+        for depth in range(1, max_depth + 1):
+            try:
+                score, move = self._search_root(depth)
+            except _SearchTimeout:
+                break
+            best_move, best_score, completed_depth = move, score, depth
+            if abs(score) >= MATE_SCORE - MAX_DEPTH:
+                break # Forced mate found; deeper search cannot improve it
+            if time.perf_counter() >= self.deadline:
+                break
+
+        return {
+            "move": self._notation(best_move),
+            "score": best_score,
+            "depth": completed_depth,
+            "nodes": self.nodes,
+            "time": round(time.perf_counter() - start_time, 3),
+            "pv": self._principal_variation(best_move, completed_depth),
+        }
+
+    # --- Search ---
+
+    def _search_root(self, depth):
+        game = self.root
+        alpha, beta = -INFINITY, INFINITY
+        best_move = None
+        tt_move = self._tt_move(game.position_hash)
+        for move in self._ordered_moves(game, 0, tt_move):
+            game._push_move(*move)
+            self.path.append(game.position_hash)
+            try:
+                score = -self._negamax(depth - 1, 1, -beta, -alpha, allow_timeout=depth > 1)
+            finally:
+                self.path.pop()
+                game._pop_move()
+            if score > alpha or best_move is None:
+                alpha, best_move = score, move
+        self._tt_store(game.position_hash, depth, alpha, EXACT, best_move, 0)
+        return alpha, best_move
+
+    def _negamax(self, depth, ply, alpha, beta, allow_timeout=True):
+        game = self.root
+        self.nodes += 1
+        if allow_timeout and self.nodes % TIME_CHECK_INTERVAL == 0 and time.perf_counter() >= self.deadline:
+            raise _SearchTimeout()
+
+        key = game.position_hash
+        if key in self.seen_positions or self.path.count(key) > 1 or game.halfmove_clock >= 100:
+            return 0 # Repetition or fifty-move rule
+
+        if depth <= 0:
+            return self._quiescence(ply, alpha, beta, allow_timeout)
+
+        original_alpha = alpha
+        entry = self.tt[key & (self.tt_size - 1)]
+        tt_move = None
+        if entry is not None and entry[0] == key:
+            tt_move = entry[4]
+            if entry[1] >= depth:
+                score = self._score_from_tt(entry[2], ply)
+                if entry[3] == EXACT:
+                    return score
+                if entry[3] == LOWER_BOUND:
+                    alpha = max(alpha, score)
+                elif entry[3] == UPPER_BOUND:
+                    beta = min(beta, score)
+                if alpha >= beta:
+                    return score
+
+        moves = self._ordered_moves(game, ply, tt_move)
+        if not moves:
+            return -(MATE_SCORE - ply) if game.is_in_check(game.turn) else 0
+
+        best_score, best_move = -INFINITY, None
+        for move in moves:
+            game._push_move(*move)
+            self.path.append(game.position_hash)
+            try:
+                score = -self._negamax(depth - 1, ply + 1, -beta, -alpha, allow_timeout)
+            finally:
+                self.path.pop()
+                game._pop_move()
+            if score > best_score:
+                best_score, best_move = score, move
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                if game.board.squares[move[1][0] * 8 + move[1][1]] is None and ply < len(self.killers):
+                    killers = self.killers[ply]
+                    if killers[0] != move:
+                        killers[1], killers[0] = killers[0], move
+                break
+
+        if best_score <= original_alpha:
+            flag = UPPER_BOUND
+        elif best_score >= beta:
+            flag = LOWER_BOUND
+        else:
+            flag = EXACT
+        self._tt_store(key, depth, best_score, flag, best_move, ply)
+        return best_score
+
+    def _quiescence(self, ply, alpha, beta, allow_timeout):
+        """Searches captures (and promotions) only, until the position is quiet."""
+        game = self.root
+        self.nodes += 1
+        if allow_timeout and self.nodes % TIME_CHECK_INTERVAL == 0 and time.perf_counter() >= self.deadline:
+            raise _SearchTimeout()
+
+        stand_pat = evaluate(game.board, game.turn)
+        if stand_pat >= beta:
+            return stand_pat
+        if stand_pat > alpha:
+            alpha = stand_pat
+
+        for move in self._ordered_moves(game, ply, None, captures_only=True):
+            game._push_move(*move)
+            try:
+                score = -self._quiescence(ply + 1, -beta, -alpha, allow_timeout)
+            finally:
+                game._pop_move()
+            if score >= beta:
+                return score
+            if score > alpha:
+                alpha = score
+        return alpha
+
+    # --- Move Ordering ---
+
+    def _ordered_moves(self, game, ply, tt_move, captures_only=False):
+        """
+        Legal moves as (start_pos, end_pos, promotion_class) tuples,
+        best candidates first: TT move, captures by MVV-LVA (plus Queen
+        promotions), killer moves, then the rest.
+        """
+        squares = game.board.squares
+        promotion_rank = 0 if game.turn == 'white' else 7
+        killers = self.killers[ply] if ply < len(self.killers) else (None, None)
+        scored = []
+        for start_pos, end_pos, piece in game._get_all_legal_moves_tuples(game.turn):
+            victim = squares[end_pos[0] * 8 + end_pos[1]]
+            is_pawn = piece.piece_type == PAWN
+            if is_pawn and victim is None and start_pos[1] != end_pos[1]:
+                victim_value = PIECE_VALUES_CP[PAWN] # En passant
+            else:
+                victim_value = PIECE_VALUES_CP[victim.piece_type] if victim else 0
+            promotion_class = Queen if is_pawn and end_pos[0] == promotion_rank else None
+            if captures_only and not victim_value and not promotion_class:
+                continue
+
+            move = (start_pos, end_pos, promotion_class)
+            if move == tt_move:
+                order = 1000000
+            elif victim_value or promotion_class:
+                order = 100000 + 10 * victim_value - PIECE_VALUES_CP[piece.piece_type] + (800 if promotion_class else 0)
+            elif move == killers[0]:
+                order = 90000
+            elif move == killers[1]:
+                order = 80000
+            else:
+                order = 0
+            scored.append((order, move))
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return [move for _, move in scored]
+
+    # --- Transposition Table ---
+
+    def _tt_move(self, key):
+        entry = self.tt[key & (self.tt_size - 1)]
+        return entry[4] if entry is not None and entry[0] == key else None
+
+    def _tt_store(self, key, depth, score, flag, move, ply):
+        """Stores an entry, keeping the deeper one when two keys collide."""
+        index = key & (self.tt_size - 1)
+        entry = self.tt[index]
+        if entry is None or entry[0] == key or entry[1] <= depth:
+            # Mate scores are stored relative to this node, not the root
+            if score >= MATE_SCORE - MAX_DEPTH * 2:
+                score += ply
+            elif score <= -(MATE_SCORE - MAX_DEPTH * 2):
+                score -= ply
+            self.tt[index] = (key, depth, score, flag, move)
+
+    @staticmethod
+    def _score_from_tt(score, ply):
+        if score >= MATE_SCORE - MAX_DEPTH * 2:
+            return score - ply
+        if score <= -(MATE_SCORE - MAX_DEPTH * 2):
+            return score + ply
+        return score
+
+    # --- Reporting ---
+
+    def _notation(self, move):
+        if move is None:
+            return None
+        return f"{self.root.pos_to_notation(move[0])}-{self.root.pos_to_notation(move[1])}"
+
+    def _principal_variation(self, best_move, depth):
+        """Follows TT moves from the root to list the expected line."""
+        game = self.root
+        pv, pushed = [], 0
+        move = best_move
+        while move is not None and pushed < depth:
+            legal = self._ordered_moves(game, 0, None)
+            if move not in legal:
+                break
+            pv.append(self._notation(move))
+            game._push_move(*move)
+            pushed += 1
+            move = self._tt_move(game.position_hash)
+        for _ in range(pushed):
+            game._pop_move()
+        return pv
+
+def find_best_move(game, time_budget=1.0, max_depth=MAX_DEPTH):
+    """Convenience wrapper: searches `game` with a fresh engine. See SearchEngine.search."""
+    return SearchEngine().search(game, time_budget, max_depth)
@@ -1,6 +1,11 @@
 import os
 import json
 import google.generativeai as genai
+import llm_runtime
+from json_stream import JsonFieldExtractor, extract_json
+from llm_cache import CACHE_ENABLED, make_key, response_cache
+from prompt_payloads import WIRE_LEGEND, record_prompt
+from response_schemas import RESPONSE_SCHEMAS, SchemaError, validate
 
 # --- API KEY CONFIG ---
 # This is set in app.py or by the environment
@@ -13,8 +18,98 @@ genai.configure(api_key=GOOGLE_API_KEY)
 flash_model = genai.GenerativeModel('gemini-2.5-flash') 
 pro_model = genai.GenerativeModel('gemini-2.5-pro') 
 
+# --- STRUCTURED OUTPUT ---
+# Send each tool's response_schema so Gemini returns JSON of exactly that
+# shape; replies are still parsed tolerantly and validated either way.
+STRUCTURED_OUTPUT = True
+
+def _generation_config(tool):
+    schema = RESPONSE_SCHEMAS.get(tool)
+    if not STRUCTURED_OUTPUT or schema is None:
+        return None
+    return {"response_mime_type": "application/json", "response_schema": schema}
+
+# --- RESPONSE CACHE ---
+# Bump a tool's version here whenever its prompt template changes, so
+# answers cached for the old prompt are no longer served.
+PROMPT_VERSIONS = {
+    # v2: compact payloads with WIRE_LEGEND; router without the definitions block
+    # v3: OPTIONS_LIST described as pruned, plus guaranteed quiet moves
+    "triage_analyst": 2,
+    "conversational_coach": 2,
+    "qa_analyze_board": 2,
+    "opponent_router": 2,
+    "best_move": 3,
+    "best_move_reasoning": 2,
+    "personality_reasoning": 2,
+    "human_move": 3,
+    "teaching_blunder": 3,
+}
+
+# Tools whose answer is a deliberate random pick: caching would freeze
+# one choice per input for every user until the TTL runs out
+UNCACHED_TOOLS = {"opponent_router", "human_move", "teaching_blunder"}
+
+async def _generate_json_async(tool, model, prompt, cache_inputs, raw_label=None, stream_field=None, on_text=None):
+    """
+    Runs one tool prompt and returns the reply as a dict validated
+    against the tool's response schema. Replies are cached in llm_cache
+    under (tool, model, prompt version, inputs), so a repeated call with
+    the same inputs skips the API. `cache_inputs` must hold everything the
+    prompt was built from. Raises on API, parse or schema errors, in which
+    case nothing is cached.
+
+    With `on_text`, the reply is streamed and the text of its
+    `stream_field` string is passed to `on_text` piece by piece as it is
+    generated (in one piece on a cache hit).
+    """
+    key = None
+    if CACHE_ENABLED and tool not in UNCACHED_TOOLS:
+        key = make_key(tool, model.model_name, PROMPT_VERSIONS.get(tool, 1), cache_inputs)
+        cached = response_cache.get(key)
+        if cached is not None and tool in RESPONSE_SCHEMAS:
+            try:
+                validate(cached, RESPONSE_SCHEMAS[tool])
+            except SchemaError as e:
+                print(f"[LLM CACHE] Ignoring cached {tool} reply: {e}")
+                cached = None # Stored before a schema change; fetch a fresh one
+        if cached is not None:
+            print(f"[LLM CACHE] Hit for {tool}. Stats: {response_cache.stats()}")
+            if on_text and cached.get(stream_field):
+                on_text(cached[stream_field])
+            return cached
+
+    record_prompt(tool, prompt)
+    generation_config = _generation_config(tool)
+    if on_text:
+        raw_text = await _stream_field_async(model, prompt, generation_config, stream_field, on_text)
+    else:
+        response = await model.generate_content_async(prompt, generation_config=generation_config)
+        raw_text = response.text
+    if raw_label:
+        print(f"--- {raw_label} (RAW) ---\n{raw_text}\n------------------------------")
+
+    parsed_json = extract_json(raw_text)
+    if tool in RESPONSE_SCHEMAS:
+        validate(parsed_json, RESPONSE_SCHEMAS[tool])
+    if key is not None:
+        response_cache.set(key, parsed_json)
+    return parsed_json
+
+async def _stream_field_async(model, prompt, generation_config, stream_field, on_text):
+    """Streams a reply, passing the decoded `stream_field` text to `on_text`; returns the raw reply."""
+    extractor = JsonFieldExtractor(stream_field)
+    chunks = []
+    response = await model.generate_content_async(prompt, generation_config=generation_config, stream=True)
+    async for chunk in response:
+        chunks.append(chunk.text)
+        new_text = extractor.feed(chunk.text)
+        if new_text:
+            on_text(new_text)
+    return "".join(chunks)
+
 # --- Move Sanitizer Tool ---
-def call_move_sanitizer_tool(malformed_move, legal_moves_str):
+async def call_move_sanitizer_tool_async(malformed_move, legal_moves_str):
     """
     An LLM-based tool to repair a malformed move string.
     It compares the bad string against the list of legal moves.
@@ -45,11 +140,7 @@ def call_move_sanitizer_tool(malformed_move, legal_moves_str):
         {{"move": "null"}}
         """
         
-        response = flash_model.generate_content(prompt)
-        print(f"--- SANITIZER TOOL (RAW) ---\n{response.text}\n------------------------------")
-        
-        json_str = response.text.strip().replace("```json", "").replace("```", "").strip()
-        parsed_json = json.loads(json_str)
+        parsed_json = await _generate_json_async("move_sanitizer", flash_model, prompt, [malformed_move, legal_moves_str], "SANITIZER TOOL")
         
         if "move" in parsed_json and parsed_json["move"] != "null":
             return parsed_json
@@ -75,6 +166,7 @@ CORE_CHESS_DEFINITIONS = """
     * **"Bad Trade" (A Blunder):** This is when you capture a *low-value* piece (like a Pawn) with a *high-value* piece (like your Queen), and the opponent can then recapture your Queen. You lose a Queen for a Pawn.
     * **"Equal Trade":** This is when two pieces of *equal value* are exchanged (e.g., your Knight captures a Knight, and they recapture). This is neither good nor bad, just a decision.
     * **"Good Trade" (Profit):** This is when you capture a *high-value* piece (like a Rook) with a *low-value* piece (like your Knight), and even if they recapture, you have won material.
+    * **`see` (Exchange Result):** Every move in the `OPTIONS_LIST` carries a `see` number: the net material you end up with after *all* captures and recaptures on the landing square have been played out (x-rays included). `see > 0` wins material, `see == 0` is safe or an "Equal Trade", and `see < 0` is a "Hanging Piece" or "Bad Trade". Trust `see` over your own count of `retaliation` and `defenders`.
 
  4. **"Tempo" (A Key Principle):** This is the concept of developing your pieces.
     * **"Good Tempo":** Moves that develop a *new* piece from your back rank (e.g., `previous_move_count: 0`).
@@ -114,7 +206,7 @@ CORE_CHESS_DEFINITIONS = """
 """
 
 # --- Coach Post-Move Tools ---
-def call_triage_analyst_tool(last_move_data_json, dangers_before_json, options_before_json):
+async def call_triage_analyst_tool_async(last_move_data_json, dangers_before_json, options_before_json):
     """
     Specialist Tool 1: The "Triage Analyst".
     This tool implements the "Offense-First" logic. Its *only* job is
@@ -133,7 +225,7 @@ def call_triage_analyst_tool(last_move_data_json, dangers_before_json, options_b
         try:
             options = json.loads(options_before_json)
             for move in options:
-                if move.get('move') == chosen_move_notation:
+                if (move.get('mv') or move.get('move')) == chosen_move_notation: # Compact or full packet
                     chosen_move_full_data = json.dumps(move)
                     break
         except Exception:
@@ -148,6 +240,8 @@ def call_triage_analyst_tool(last_move_data_json, dangers_before_json, options_b
         
         {CORE_CHESS_DEFINITIONS}
 
+        {WIRE_LEGEND}
+
         `DANGERS_LIST (The "Before" Picture - What was threatening me?)`:
         {dangers_before_json}
         
@@ -290,28 +384,26 @@ def call_triage_analyst_tool(last_move_data_json, dangers_before_json, options_b
         Return *only* the single-line JSON verdict, including your justification.
         """
         
-        response = pro_model.generate_content(prompt)
-        print(f"--- TRIAGE ANALYST (RAW) ---\n{response.text}\n------------------------------")
-        
-        json_str = response.text.strip().replace("```json", "").replace("```", "").strip()
-        parsed_json = json.loads(json_str)
+        parsed_json = await _generate_json_async("triage_analyst", pro_model, prompt, [chosen_move_full_data, dangers_before_json], "TRIAGE ANALYST")
         return parsed_json
             
     except Exception as e:
         print(f"!!! CRITICAL: Triage Analyst Tool error: {e}")
         return {"verdict": "error", "focus": "tool_failure", "justification": str(e)}
 
-def call_conversational_coach_tool(triage_verdict_json, 
-                                   last_move_data_json,
-                                   dangers_before_json,
-                                   options_before_json,
-                                   user_skill_level, 
-                                   player_color):
+async def call_conversational_coach_tool_async(triage_verdict_json, 
+                                               last_move_data_json,
+                                               dangers_before_json,
+                                               options_before_json,
+                                               user_skill_level, 
+                                               player_color,
+                                               on_text=None):
     """
     Specialist Tool 2: The "Conversationalist".
     This tool is the "mouth." It receives the "verdict" from the
     Triage Analyst and turns it into a human-like, conversational
     message, as requested by the user.
+    Pass `on_text` to receive the `message` as it streams in.
     """
     print("[CONVERSATIONALIST TOOL] Generating response...")
     try:
@@ -333,6 +425,7 @@ def call_conversational_coach_tool(triage_verdict_json,
         {triage_verdict_json}
 
         `FULL_MOVE_CONTEXT (Use this for your response!)`:
+        ({WIRE_LEGEND})
         - CHOSEN_MOVE: {last_move_data_json}
         - DANGERS_BEFORE: {dangers_before_json}
         - OPTIONS_BEFORE: {options_before_json}
@@ -376,11 +469,8 @@ def call_conversational_coach_tool(triage_verdict_json,
         {{"response_type": "praise", "message": "Great find!"}}
         """
         
-        response = flash_model.generate_content(prompt)
-        print(f"--- CONVERSATIONALIST (RAW) ---\n{response.text}\n------------------------------")
-        
-        json_str = response.text.strip().replace("```json", "").replace("```", "").strip()
-        parsed_json = json.loads(json_str)
+        parsed_json = await _generate_json_async("conversational_coach", flash_model, prompt, [triage_verdict_json, last_move_data_json, dangers_before_json, options_before_json, user_skill_level, player_color], "CONVERSATIONALIST",
+                                                  stream_field="message", on_text=on_text)
         return parsed_json
             
     except Exception as e:
@@ -389,7 +479,7 @@ def call_conversational_coach_tool(triage_verdict_json,
 
 # --- Coach Q&A Tools ---
 
-def call_qa_router_tool(user_query, game_context_json):
+async def call_qa_router_tool_async(user_query, game_context_json):
     """
     Tool 1: The "Q&A Router".
     This tool's only job is to analyze the user's *intent*
@@ -433,19 +523,15 @@ def call_qa_router_tool(user_query, game_context_json):
         {{"tool_choice": "explain_concept"}}
         """
         
-        response = flash_model.generate_content(prompt)
-        print(f"--- Q&A ROUTER (RAW) ---\n{response.text}\n------------------------------")
-        
-        json_str = response.text.strip().replace("```json", "").replace("```", "").strip()
-        parsed_json = json.loads(json_str)
+        parsed_json = await _generate_json_async("qa_router", flash_model, prompt, [user_query, game_context_json], "Q&A ROUTER")
         return parsed_json
             
     except Exception as e:
         print(f"!!! CRITICAL: Q&A Router Tool error: {e}")
         return {"tool_choice": "general_chit_chat"}
 
-def call_qa_explain_last_move_tool(user_query, game_context_json):
-    """Specialist: Explains AI's last move."""
+async def call_qa_explain_last_move_tool_async(user_query, game_context_json, on_text=None):
+    """Specialist: Explains AI's last move. `on_text` receives the streamed commentary."""
     try:
         context = json.loads(game_context_json)
         ai_reasoning = context.get("last_ai_reasoning", "I don't have a record of my last thought.")
@@ -466,14 +552,12 @@ def call_qa_explain_last_move_tool(user_query, game_context_json):
         Return *only* the JSON response.
         {{"commentary": "I moved my knight there because..."}}
         """
-        response = flash_model.generate_content(prompt)
-        json_str = response.text.strip().replace("```json", "").replace("```", "").strip()
-        return json.loads(json_str)
+        return await _generate_json_async("qa_explain_last_move", flash_model, prompt, [user_query, game_context_json], stream_field="commentary", on_text=on_text)
     except Exception as e:
         return {"commentary": f"Sorry, I had an error: {e}"}
 
-def call_qa_analyze_board_tool(user_query, game_context_json):
-    """Specialist: Analyzes the live board."""
+async def call_qa_analyze_board_tool_async(user_query, game_context_json, on_text=None):
+    """Specialist: Analyzes the live board. `on_text` receives the streamed commentary."""
     try:
         context = json.loads(game_context_json)
         dangers = context.get("dangers_list", "[]")
@@ -488,6 +572,8 @@ def call_qa_analyze_board_tool(user_query, game_context_json):
         Use the following *ground truth data* to answer them.
         Do not make things up.
         
+        {WIRE_LEGEND}
+
         `GROUND_TRUTH_DANGERS (What's attacking me?)`:
         {dangers}
         
@@ -505,14 +591,12 @@ def call_qa_analyze_board_tool(user_query, game_context_json):
         Return *only* the JSON response.
         {{"commentary": "That's a great question..."}}
         """
-        response = pro_model.generate_content(prompt) # Use Pro for smart analysis
-        json_str = response.text.strip().replace("```json", "").replace("```", "").strip()
-        return json.loads(json_str)
+        return await _generate_json_async("qa_analyze_board", pro_model, prompt, [user_query, game_context_json], stream_field="commentary", on_text=on_text) # Use Pro for smart analysis
     except Exception as e:
         return {"commentary": f"Sorry, I had an error: {e}"}
 
-def call_qa_explain_concept_tool(user_query, game_context_json):
-    """Specialist: Explains a core concept."""
+async def call_qa_explain_concept_tool_async(user_query, game_context_json, on_text=None):
+    """Specialist: Explains a core concept. `on_text` receives the streamed commentary."""
     try:
         prompt = f"""
         You are 'Coach Joey'. The user is asking for the
@@ -535,14 +619,13 @@ def call_qa_explain_concept_tool(user_query, game_context_json):
         Return *only* the JSON response.
         {{"commentary": "A 'pin' is when..."}}
         """
-        response = flash_model.generate_content(prompt)
-        json_str = response.text.strip().replace("```json", "").replace("```", "").strip()
-        return json.loads(json_str)
+        return await _generate_json_async("qa_explain_concept", flash_model, prompt, [user_query], # The answer depends only on the question
+                                          stream_field="commentary", on_text=on_text)
     except Exception as e:
         return {"commentary": f"Sorry, I had an error: {e}"}
 
-def call_qa_chit_chat_tool(user_query, game_context_json):
-    """Specialist: Handles small talk."""
+async def call_qa_chit_chat_tool_async(user_query, game_context_json, on_text=None):
+    """Specialist: Handles small talk. `on_text` receives the streamed commentary."""
     try:
         prompt = f"""
         You are 'Coach Joey'. The user is just making
@@ -560,17 +643,15 @@ def call_qa_chit_chat_tool(user_query, game_context_json):
         Return *only* the JSON response.
         {{"commentary": "You've got this!"}}
         """
-        response = flash_model.generate_content(prompt)
-        json_str = response.text.strip().replace("```json", "").replace("```", "").strip()
-        return json.loads(json_str)
+        return await _generate_json_async("qa_chit_chat", flash_model, prompt, [user_query, game_context_json], stream_field="commentary", on_text=on_text)
     except Exception as e:
         return {"commentary": f"Sorry, I had an error: {e}"}
 
-def call_post_game_analyst_tool(game_data_json, player_color):
+async def call_post_game_analyst_tool_async(game_data_json, player_color, on_text=None):
     """
     Specialist 3: The Post-Game Analyst.
     Provides a summary of the entire game.
-    (This function is unchanged and still used)
+    Pass `on_text` to receive the `message` as it streams in.
     """
     print("[POST-GAME TOOL] Analyzing full game...")
     try:
@@ -596,11 +677,8 @@ def call_post_game_analyst_tool(game_data_json, player_color):
         {{"message": "Here's a summary of your game:\\n1. Your opening was strong...\\n2. The turning point was on move 15 when...\\n3. Great find on move 22!..."}}
         """
         
-        response = pro_model.generate_content(prompt) # Use Pro for a better summary
-        print(f"--- POST-GAME TOOL (RAW) ---\n{response.text}\n------------------------------")
-        
-        json_str = response.text.strip().replace("```json", "").replace("```", "").strip()
-        parsed_json = json.loads(json_str)
+        parsed_json = await _generate_json_async("post_game_analyst", pro_model, prompt, [game_data_json, player_color], "POST-GAME TOOL",
+                                                  stream_field="message", on_text=on_text) # Use Pro for a better summary
         return parsed_json
             
     except Exception as e:
@@ -608,7 +686,7 @@ def call_post_game_analyst_tool(game_data_json, player_color):
         return {"message": "Sorry, I had an error analyzing the full game."}
 
 # --- AI Opponent Agent Tools ---
-def call_opponent_router_agent(enhanced_moves_json, tactical_threats_json, user_skill_level):
+async def call_opponent_router_agent_async(enhanced_moves_json, tactical_threats_json, user_skill_level):
     """
     This is the "Router Agent" or "Meta-Agent."
     It uses natural language logic to choose a personality ("tool")
@@ -646,8 +724,6 @@ def call_opponent_router_agent(enhanced_moves_json, tactical_threats_json, user_
         and a `BOARD_SUMMARY`.
         
         You MUST choose one of three tools: "best", "human", or "blunder".
-
-        {CORE_CHESS_DEFINITIONS}
         
         **Your Logic:**
         
@@ -679,11 +755,7 @@ def call_opponent_router_agent(enhanced_moves_json, tactical_threats_json, user_
         {{"tool_choice": "human", "reasoning": "User is intermediate and the board is quiet, so a solid 'human' move is appropriate."}}
         """
         
-        response = flash_model.generate_content(prompt) # Use fast model
-        print(f"--- ROUTER AGENT (RAW) ---\n{response.text}\n------------------------------")
-        
-        json_str = response.text.strip().replace("```json", "").replace("```", "").strip()
-        parsed_json = json.loads(json_str)
+        parsed_json = await _generate_json_async("opponent_router", flash_model, prompt, [board_summary, user_skill_level], "ROUTER AGENT") # Use fast model
         return parsed_json
             
     except Exception as e:
@@ -691,7 +763,7 @@ def call_opponent_router_agent(enhanced_moves_json, tactical_threats_json, user_
         return {"tool_choice": "human", "reasoning": "Router failed, defaulting to human."}
 
 
-def call_best_move_tool(enhanced_legal_moves_json, tactical_threats_json):
+async def call_best_move_tool_async(enhanced_legal_moves_json, tactical_threats_json):
     """
     Opponent Tool 1: The Engine (Specialist).
     Now uses the CORE_CHESS_DEFINITIONS.
@@ -709,10 +781,12 @@ def call_best_move_tool(enhanced_legal_moves_json, tactical_threats_json):
 
         {CORE_CHESS_DEFINITIONS}
 
+        {WIRE_LEGEND}
+
         `TACTICAL_THREATS_LIST (Your Dangers)`:
         {tactical_threats_json}
 
-        `OPTIONS_LIST (Your Opportunities & All Legal Moves)`:
+        `OPTIONS_LIST (Your Opportunities: the most relevant legal moves, plus a few quiet ones)`:
         {enhanced_legal_moves_json}
 
         **GM's Decision-Making Principles (Your Logic):**
@@ -759,18 +833,103 @@ def call_best_move_tool(enhanced_legal_moves_json, tactical_threats_json):
         {{"move": "Qe5-e6", "reasoning": "My Knight on c3 was attacked, but the TACTICAL_THREATS_LIST correctly identified it as a pin to my Queen. Moving the Knight would be a 'Blunder'. I am moving my Queen to e6, which breaks the pin safely."}}
         """
         
-        response = pro_model.generate_content(prompt) # Use Pro for best move
-        print(f"--- BEST MOVE TOOL (RAW) ---\n{response.text}\n------------------------------")
-        
-        json_str = response.text.strip().replace("```json", "").replace("```", "").strip()
-        parsed_json = json.loads(json_str)
+        parsed_json = await _generate_json_async("best_move", pro_model, prompt, [enhanced_legal_moves_json, tactical_threats_json], "BEST MOVE TOOL") # Use Pro for best move
         return parsed_json
             
     except Exception as e:
         print(f"!!! CRITICAL: Best Move Tool error: {e}")
         return {"move": None, "reasoning": "Error"}
 
-def call_human_like_move_tool(enhanced_legal_moves_json, tactical_threats_json):
+async def call_best_move_reasoning_tool_async(chosen_move_json, tactical_threats_json, engine_summary):
+    """
+    Opponent Tool 1b: The Engine's Voice.
+    The move is already chosen by the local search engine; this tool
+    only explains it in plain language, so it can use the fast model.
+    """
+    print("[BEST MOVE REASONING TOOL] Explaining engine move...")
+    try:
+        prompt = f"""
+        You are a world-champion chess player explaining the move you just chose.
+        The move is FINAL. Do not suggest a different move.
+
+        You must strictly follow the `CORE_CHESS_DEFINITIONS`.
+
+        {CORE_CHESS_DEFINITIONS}
+
+        {WIRE_LEGEND}
+
+        `CHOSEN_MOVE (Its consequences)`:
+        {chosen_move_json}
+
+        `TACTICAL_THREATS_LIST (Your Dangers before the move)`:
+        {tactical_threats_json}
+
+        `ENGINE_SUMMARY (Score in centipawns from your side, expected line)`:
+        {engine_summary}
+
+        **Your Task:**
+        In 1-2 sentences, explain *why* this move is strong. Ground your
+        explanation in the `CHOSEN_MOVE` consequences (captures, checks,
+        forks, pins, tempo) and any danger it solves from the
+        `TACTICAL_THREATS_LIST`. Do not mention the engine or centipawns.
+
+        Return your reasoning in this exact JSON format.
+
+        {{"reasoning": "My Knight on c3 was pinned to my Queen, so I moved the Queen to e6 to break the pin safely."}}
+        """
+
+        parsed_json = await _generate_json_async("best_move_reasoning", flash_model, prompt, [chosen_move_json, tactical_threats_json, engine_summary], "BEST MOVE REASONING TOOL") # Use Flash; the hard part is done
+        return parsed_json
+
+    except Exception as e:
+        print(f"!!! CRITICAL: Best Move Reasoning Tool error: {e}")
+        return {"reasoning": None}
+
+async def call_personality_reasoning_tool_async(chosen_move_json, tactical_threats_json, personality):
+    """
+    Opponent Tool 2b/3b: The Personality's Voice.
+    The "human" or "blunder" move is already chosen locally; this tool
+    only writes the reasoning in that personality's voice.
+    """
+    print(f"[PERSONALITY REASONING TOOL] Explaining '{personality}' move...")
+    try:
+        if personality == "blunder":
+            voice = """You are a chess teacher *pretending* to be a beginner. The move
+        is an intentional, instructive mistake. Write a "flawed" one-sentence
+        justification that shows *why* a beginner would make it (e.g., "I forgot about...")."""
+        else:
+            voice = """You are an 1800 ELO "club" chess player. Write a simple one-sentence
+        justification that shows this is a safe, natural move."""
+
+        prompt = f"""
+        {voice}
+        The move is FINAL. Do not suggest a different move.
+
+        You must follow the `CORE_CHESS_DEFINITIONS`.
+
+        {CORE_CHESS_DEFINITIONS}
+
+        {WIRE_LEGEND}
+
+        `CHOSEN_MOVE (Its consequences)`:
+        {chosen_move_json}
+
+        `TACTICAL_THREATS_LIST (Your Dangers before the move)`:
+        {tactical_threats_json}
+
+        Return your reasoning in this exact JSON format.
+
+        {{"reasoning": "Just developing my pawn. (I didn't see that my Queen on d4 was under attack!)"}}
+        """
+
+        parsed_json = await _generate_json_async("personality_reasoning", flash_model, prompt, [chosen_move_json, tactical_threats_json, personality], "PERSONALITY REASONING TOOL") # Use Flash
+        return parsed_json
+
+    except Exception as e:
+        print(f"!!! CRITICAL: Personality Reasoning Tool error: {e}")
+        return {"reasoning": None}
+
+async def call_human_like_move_tool_async(enhanced_legal_moves_json, tactical_threats_json):
     """
     Opponent Tool 2: The Club Player (Specialist).
     Now uses the CORE_CHESS_DEFINITIONS.
@@ -786,10 +945,12 @@ def call_human_like_move_tool(enhanced_legal_moves_json, tactical_threats_json):
 
         {CORE_CHESS_DEFINITIONS}
 
+        {WIRE_LEGEND}
+
         `TACTICAL_THREATS_LIST (Your Dangers)`:
         {tactical_threats_json}
 
-        `OPTIONS_LIST (Your Opportunities & All Legal Moves)`:
+        `OPTIONS_LIST (Your Opportunities: the most relevant legal moves, plus a few quiet ones)`:
         {enhanced_legal_moves_json}
         
         **Your Decision-Making Principles:**
@@ -822,18 +983,14 @@ def call_human_like_move_tool(enhanced_legal_moves_json, tactical_threats_json):
         {{"move": "Qd4-c5", "reasoning": "My Queen was attacked by a pawn! That would be a 'Hanging Piece' blunder. I moved it to c5, which looks like a safe square."}}
         """
         
-        response = flash_model.generate_content(prompt) # Use Flash
-        print(f"--- HUMAN MOVE TOOL (RAW) ---\n{response.text}\n------------------------------")
-        
-        json_str = response.text.strip().replace("```json", "").replace("```", "").strip()
-        parsed_json = json.loads(json_str)
+        parsed_json = await _generate_json_async("human_move", flash_model, prompt, [enhanced_legal_moves_json, tactical_threats_json], "HUMAN MOVE TOOL") # Use Flash
         return parsed_json
             
     except Exception as e:
         print(f"!!! CRITICAL: Human Move Tool error: {e}")
         return {"move": None, "reasoning": "Error"}
 
-def call_teaching_blunder_tool(enhanced_legal_moves_json, tactical_threats_json):
+async def call_teaching_blunder_tool_async(enhanced_legal_moves_json, tactical_threats_json):
     """
     Opponent Tool 3: The Teacher-in-Disguise (Specialist).
     Now *intentionally breaks* the CORE_CHESS_DEFINITIONS.
@@ -850,10 +1007,12 @@ def call_teaching_blunder_tool(enhanced_legal_moves_json, tactical_threats_json)
 
         {CORE_CHESS_DEFINITIONS}
 
+        {WIRE_LEGEND}
+
         `TACTICAL_THREATS_LIST (Your Dangers)`:
         {tactical_threats_json}
 
-        `OPTIONS_LIST (Your Opportunities & All Legal Moves)`:
+        `OPTIONS_LIST (Your Opportunities: the most relevant legal moves, plus a few quiet ones)`:
         {enhanced_legal_moves_json}
 
         **Your Goal:** Find an obvious "Hanging Piece," "Bad Trade,"
@@ -881,8 +1040,9 @@ def call_teaching_blunder_tool(enhanced_legal_moves_json, tactical_threats_json)
 
         3.  **Priority 3: Make a "Bad Tempo" Blunder.**
             * If no material blunders are obvious, just pick a "Bad Tempo"
-                move (one where `previous_move_count > 0` but no
-                new pieces are developed).
+                move: a quiet move (no `consequences`) of a piece with
+                `previous_move_count > 0`. The quiet moves are at the end
+                of the `OPTIONS_LIST`.
 
         Your `reasoning` must be a "flawed" one-sentence justification
         that shows *why* you made the mistake (e.g., "I forgot about...").
@@ -894,13 +1054,63 @@ def call_teaching_blunder_tool(enhanced_legal_moves_json, tactical_threats_json)
         {{"move": "b2-b3", "reasoning": "Just developing my pawn. (I didn't see that my Queen on d4 was under attack!)"}}
         """
         
-        response = flash_model.generate_content(prompt) # Use Flash
-        print(f"--- BLUNDER TOOL (RAW) ---\n{response.text}\n------------------------------")
-        
-        json_str = response.text.strip().replace("```json", "").replace("```", "").strip()
-        parsed_json = json.loads(json_str)
+        parsed_json = await _generate_json_async("teaching_blunder", flash_model, prompt, [enhanced_legal_moves_json, tactical_threats_json], "BLUNDER TOOL") # Use Flash
         return parsed_json
             
     except Exception as e:
         print(f"!!! CRITICAL: Blunder Tool error: {e}")
-        return {"move": None, "reasoning": "Error"}
\ No newline at end of file
+        return {"move": None, "reasoning": "Error"}
+
+
+# --- Blocking Wrappers ---
+# The tools above are coroutines for the async agents. These run them on
+# llm_runtime's shared event loop for synchronous callers (an `on_text`
+# callback is then invoked on the loop's thread).
+
+def call_move_sanitizer_tool(malformed_move, legal_moves_str):
+    return llm_runtime.run(call_move_sanitizer_tool_async(malformed_move, legal_moves_str))
+
+def call_triage_analyst_tool(last_move_data_json, dangers_before_json, options_before_json):
+    return llm_runtime.run(call_triage_analyst_tool_async(last_move_data_json, dangers_before_json, options_before_json))
+
+def call_conversational_coach_tool(triage_verdict_json, last_move_data_json, dangers_before_json,
+                                   options_before_json, user_skill_level, player_color, on_text=None):
+    return llm_runtime.run(call_conversational_coach_tool_async(
+        triage_verdict_json, last_move_data_json, dangers_before_json,
+        options_before_json, user_skill_level, player_color, on_text))
+
+def call_qa_router_tool(user_query, game_context_json):
+    return llm_runtime.run(call_qa_router_tool_async(user_query, game_context_json))
+
+def call_qa_explain_last_move_tool(user_query, game_context_json, on_text=None):
+    return llm_runtime.run(call_qa_explain_last_move_tool_async(user_query, game_context_json, on_text))
+
+def call_qa_analyze_board_tool(user_query, game_context_json, on_text=None):
+    return llm_runtime.run(call_qa_analyze_board_tool_async(user_query, game_context_json, on_text))
+
+def call_qa_explain_concept_tool(user_query, game_context_json, on_text=None):
+    return llm_runtime.run(call_qa_explain_concept_tool_async(user_query, game_context_json, on_text))
+
+def call_qa_chit_chat_tool(user_query, game_context_json, on_text=None):
+    return llm_runtime.run(call_qa_chit_chat_tool_async(user_query, game_context_json, on_text))
+
+def call_post_game_analyst_tool(game_data_json, player_color, on_text=None):
+    return llm_runtime.run(call_post_game_analyst_tool_async(game_data_json, player_color, on_text))
+
+def call_opponent_router_agent(enhanced_moves_json, tactical_threats_json, user_skill_level):
+    return llm_runtime.run(call_opponent_router_agent_async(enhanced_moves_json, tactical_threats_json, user_skill_level))
+
+def call_best_move_tool(enhanced_legal_moves_json, tactical_threats_json):
+    return llm_runtime.run(call_best_move_tool_async(enhanced_legal_moves_json, tactical_threats_json))
+
+def call_best_move_reasoning_tool(chosen_move_json, tactical_threats_json, engine_summary):
+    return llm_runtime.run(call_best_move_reasoning_tool_async(chosen_move_json, tactical_threats_json, engine_summary))
+
+def call_personality_reasoning_tool(chosen_move_json, tactical_threats_json, personality):
+    return llm_runtime.run(call_personality_reasoning_tool_async(chosen_move_json, tactical_threats_json, personality))
+
+def call_human_like_move_tool(enhanced_legal_moves_json, tactical_threats_json):
+    return llm_runtime.run(call_human_like_move_tool_async(enhanced_legal_moves_json, tactical_threats_json))
+
+def call_teaching_blunder_tool(enhanced_legal_moves_json, tactical_threats_json):
+    return llm_runtime.run(call_teaching_blunder_tool_async(enhanced_legal_moves_json, tactical_threats_json))
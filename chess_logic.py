@@ -1,18 +1,223 @@
 import uuid
-import copy
 import json
+import random
+
+# Set to True to cross-check the pin-aware legal move generator against
+# the original simulate-and-test filter on every call (slow; debugging only).
+DEBUG_MOVEGEN = False
+
+# How many positions' consequence maps and analyses ChessGame keeps memoized.
+CONSEQUENCE_CACHE_SIZE = 64
+
+# --- Bitboard Core ---
+# Squares are indexed 0..63 as (row * 8 + col), so a8 = 0 and h1 = 63,
+# matching the (r, c) tuples used everywhere else in this module.
+# Each of the twelve piece sets is a plain Python int used as a 64-bit mask.
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = range(6)
+COLOR_OFFSET = {'white': 0, 'black': 6}
+
+def square_index(pos):
+    """Converts an (r, c) tuple to a 0..63 square index."""
+    return pos[0] * 8 + pos[1]
+
+def index_to_pos(sq):
+    """Converts a 0..63 square index back to an (r, c) tuple."""
+    return (sq >> 3, sq & 7)
+
+def iter_bits(bb):
+    """Yields the square index of every set bit, lowest first."""
+    while bb:
+        low = bb & -bb
+        yield low.bit_length() - 1
+        bb ^= low
+
+def popcount(bb):
+    """Counts the set bits of a bitboard (int.bit_count needs Python 3.10)."""
+    return bin(bb).count("1")
+
+# --- Precomputed Attack Tables (built once at import) ---
+# Leapers (knight, king, pawn captures) get one ordered target tuple and one
+# bitboard per square. Sliders get a ray per direction and square; the
+# attacked part of a ray is found by locating its first blocker.
+KNIGHT_OFFSETS = ((-2, -1), (-2, 1), (2, -1), (2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2))
+KING_OFFSETS = ((-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1))
+BISHOP_DIRECTIONS = ((-1, -1), (-1, 1), (1, -1), (1, 1))
+ROOK_DIRECTIONS = ((-1, 0), (1, 0), (0, -1), (0, 1))
+QUEEN_DIRECTIONS = BISHOP_DIRECTIONS + ROOK_DIRECTIONS
+SLIDER_DIRECTIONS = {BISHOP: BISHOP_DIRECTIONS, ROOK: ROOK_DIRECTIONS, QUEEN: QUEEN_DIRECTIONS}
+
+def _build_step_table(offsets):
+    """Builds the ordered target tuples and attack bitboards for a leaper."""
+    targets, masks = [], []
+    for sq in range(64):
+        r, c = index_to_pos(sq)
+        squares = tuple((r + dr, c + dc) for dr, dc in offsets if 0 <= r + dr < 8 and 0 <= c + dc < 8)
+        targets.append(squares)
+        masks.append(sum(1 << square_index(pos) for pos in squares))
+    return targets, masks
+
+def _build_ray_table(direction):
+    """Builds the ordered ray squares (nearest first) and ray bitboards for one direction."""
+    dr, dc = direction
+    targets, masks = [], []
+    for sq in range(64):
+        r, c = index_to_pos(sq)
+        squares = []
+        for i in range(1, 8):
+            nr, nc = r + i * dr, c + i * dc
+            if not (0 <= nr < 8 and 0 <= nc < 8):
+                break
+            squares.append((nr, nc))
+        targets.append(tuple(squares))
+        masks.append(sum(1 << square_index(pos) for pos in squares))
+    return targets, masks
+
+KNIGHT_TARGETS, KNIGHT_ATTACKS = _build_step_table(KNIGHT_OFFSETS)
+KING_TARGETS, KING_ATTACKS = _build_step_table(KING_OFFSETS)
+PAWN_TARGETS, PAWN_ATTACKS = {}, {}
+for _color, _dr in (('white', -1), ('black', 1)):
+    PAWN_TARGETS[_color], PAWN_ATTACKS[_color] = _build_step_table(((_dr, -1), (_dr, 1)))
+
+RAY_SQUARES, RAY_MASKS = {}, {}
+for _direction in QUEEN_DIRECTIONS:
+    RAY_SQUARES[_direction], RAY_MASKS[_direction] = _build_ray_table(_direction)
+# BETWEEN[a][b]: squares strictly between two squares on a shared line, else 0
+BETWEEN = [[0] * 64 for _ in range(64)]
+for _direction in QUEEN_DIRECTIONS:
+    for _a in range(64):
+        for _b_pos in RAY_SQUARES[_direction][_a]:
+            _b = square_index(_b_pos)
+            BETWEEN[_a][_b] = RAY_MASKS[_direction][_a] & ~RAY_MASKS[_direction][_b] & ~(1 << _b)
+ALL_SQUARES = (1 << 64) - 1
+
+# Rays that run towards higher square indices find their first blocker with
+# the lowest set bit; the others with the highest.
+_ASCENDING_DIRECTIONS = frozenset(d for d in QUEEN_DIRECTIONS if d[0] * 8 + d[1] > 0)
+
+def _first_blocker(direction, blockers):
+    """Returns the square index of the blocker nearest to the ray's origin."""
+    if direction in _ASCENDING_DIRECTIONS:
+        return (blockers & -blockers).bit_length() - 1
+    return blockers.bit_length() - 1
+
+def ray_attacks(direction, sq, occupied):
+    """Returns the bitboard a slider on `sq` attacks along one direction."""
+    ray = RAY_MASKS[direction][sq]
+    blockers = ray & occupied
+    if not blockers:
+        return ray
+    return ray ^ RAY_MASKS[direction][_first_blocker(direction, blockers)]
+
+def ray_attack_squares(direction, sq, occupied):
+    """Same as ray_attacks, but returns the (r, c) squares nearest first."""
+    squares = RAY_SQUARES[direction][sq]
+    blockers = RAY_MASKS[direction][sq] & occupied
+    if not blockers:
+        return squares
+    first = _first_blocker(direction, blockers)
+    # Distance along a rook or bishop line is the larger of the two deltas
+    return squares[:max(abs((first >> 3) - (sq >> 3)), abs((first & 7) - (sq & 7)))]
+
+def slider_attacks(sq, occupied, directions):
+    """Returns the combined attack bitboard of a slider over several directions."""
+    attacks = 0
+    for direction in directions:
+        attacks |= ray_attacks(direction, sq, occupied)
+    return attacks
+
+def piece_attacks_bb(piece_type, color, sq, occupied):
+    """Returns the attack bitboard of a piece type standing on `sq`."""
+    if piece_type == PAWN:
+        return PAWN_ATTACKS[color][sq]
+    if piece_type == KNIGHT:
+        return KNIGHT_ATTACKS[sq]
+    if piece_type == KING:
+        return KING_ATTACKS[sq]
+    if piece_type == BISHOP:
+        return slider_attacks(sq, occupied, BISHOP_DIRECTIONS)
+    if piece_type == ROOK:
+        return slider_attacks(sq, occupied, ROOK_DIRECTIONS)
+    return slider_attacks(sq, occupied, QUEEN_DIRECTIONS)
+
+# --- Zobrist Hashing ---
+# A fixed seed keeps keys identical across processes, so a position hash can
+# be shared between Streamlit workers and persistent caches.
+_zobrist_rng = random.Random(0x5EED_C0DE)
+ZOBRIST_PIECES = [[_zobrist_rng.getrandbits(64) for _ in range(64)] for _ in range(12)]
+ZOBRIST_BLACK_TO_MOVE = _zobrist_rng.getrandbits(64)
+ZOBRIST_CASTLING = [_zobrist_rng.getrandbits(64) for _ in range(16)] # One per rights mask
+ZOBRIST_EN_PASSANT = [_zobrist_rng.getrandbits(64) for _ in range(8)] # One per file
+
+# Castling rights bitmask, plus which rights a move from/to a square removes
+WHITE_KINGSIDE, WHITE_QUEENSIDE, BLACK_KINGSIDE, BLACK_QUEENSIDE = 1, 2, 4, 8
+ALL_CASTLING_RIGHTS = 15
+CASTLING_RIGHTS_LOST = {
+    (7, 4): WHITE_KINGSIDE | WHITE_QUEENSIDE, (7, 7): WHITE_KINGSIDE, (7, 0): WHITE_QUEENSIDE,
+    (0, 4): BLACK_KINGSIDE | BLACK_QUEENSIDE, (0, 7): BLACK_KINGSIDE, (0, 0): BLACK_QUEENSIDE,
+}
+
+# --- FEN ---
+STARTING_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+# Castling right, FEN letter, and the King/Rook home squares it needs
+CASTLING_FEN = (
+    (WHITE_KINGSIDE, 'K', (7, 4), (7, 7)), (WHITE_QUEENSIDE, 'Q', (7, 4), (7, 0)),
+    (BLACK_KINGSIDE, 'k', (0, 4), (0, 7)), (BLACK_QUEENSIDE, 'q', (0, 4), (0, 0)),
+)
+
+class PieceDescriptor:
+    """
+    Flyweight record of everything a piece shares with every other piece
+    of its kind and color. There are exactly twelve, one per piece code
+    (the bitboard index: piece_type + COLOR_OFFSET[color]).
+    """
+    __slots__ = ('code', 'piece_type', 'color', 'value', 'symbol', 'image_name', 'directions')
+
+    def __init__(self, piece_class, color):
+        self.code = piece_class.piece_type + COLOR_OFFSET[color]
+        self.piece_type = piece_class.piece_type
+        self.color = color
+        self.value = piece_class.value
+        self.symbol = piece_class.symbols[0 if color == 'white' else 1]
+        self.image_name = f"{color[0]}_{piece_class.__name__.lower()}.png"
+        self.directions = SLIDER_DIRECTIONS.get(piece_class.piece_type, ())
 
 class Piece:
-    """Base class for all chess pieces."""
+    """
+    Base class for all chess pieces.
+    Instances only hold per-piece state in __slots__ (square, move
+    history, name); everything shared by a kind of piece lives on the
+    class or in its PieceDescriptor. The subclasses are a thin view
+    over the board's integer core for move generation and the UI.
+    """
+    __slots__ = ('color', 'code', 'square', 'has_moved', 'move_count', 'name')
+    piece_type = None # Index into the bitboard sets (PAWN..KING)
+    value = 0 # Base value
+    symbols = ('X', 'X') # Fallback (white, black) symbols
+
     def __init__(self, color, position, name=None):
         self.color = color
-        self.position = position
+        self.code = self.piece_type + COLOR_OFFSET[color] # Small-int piece code
+        self.square = position[0] * 8 + position[1]
         self.has_moved = False
         self.move_count = 0 # For tempo tracking
-        self.symbol = 'X' # Fallback symbol
         self.name = name if name else self.__class__.__name__
-        self.image_name = f"{self.color[0]}_{self.__class__.__name__.lower()}.png"
-        self.value = 0 # Base value
+
+    @property
+    def position(self):
+        """The (r, c) tuple of the piece's square."""
+        return (self.square >> 3, self.square & 7)
+
+    @property
+    def descriptor(self):
+        return PIECE_DESCRIPTORS[self.code]
+
+    @property
+    def symbol(self):
+        return PIECE_DESCRIPTORS[self.code].symbol
+
+    @property
+    def image_name(self):
+        return PIECE_DESCRIPTORS[self.code].image_name
 
     def get_valid_moves(self, board, game=None):
         """Returns a list of valid moves for the piece."""
@@ -22,9 +227,14 @@ class Piece:
         """
         Returns squares this piece is attacking,
         including through/at friendly pieces (for defense/x-ray).
+        The result may be a shared table entry, so do not mutate it.
         """
         raise NotImplementedError
 
+    def get_attack_bb(self, board):
+        """Returns the same squares as get_attack_squares, as a bitboard."""
+        return piece_attacks_bb(self.piece_type, self.color, self.square, board.occupied)
+
     def _is_valid_and_capturable(self, pos, board):
         """Helper to check if a position is on the board and can be moved to."""
         r, c = pos
@@ -38,17 +248,31 @@ class Piece:
             return True, True  # Can capture opponent's piece
         return False, False # Blocked by own piece
 
+    def _exclude_own_pieces(self, squares, board):
+        """Filters attack squares down to moves (drops squares holding friendly pieces)."""
+        own = board.occupancy[self.color]
+        return [pos for pos in squares if not (own >> (pos[0] * 8 + pos[1])) & 1]
+
+    def _get_sliding_attack_squares(self, board):
+        """Ray-table attack squares for Queen/Rook/Bishop, in direction order."""
+        sq = self.square
+        occupied = board.occupied
+        squares = []
+        for direction in self.directions:
+            squares.extend(ray_attack_squares(direction, sq, occupied))
+        return squares
+
 class King(Piece):
-    def __init__(self, color, position, name=None):
-        super().__init__(color, position, name or "King")
-        self.symbol = '♔' if color == 'white' else '♚'
-        self.value = 1000 # Invaluable
+    __slots__ = ()
+    piece_type = KING
+    value = 1000 # Invaluable
+    symbols = ('♔', '♚')
 
     def _get_castling_moves(self, board, game):
         castling_moves = []
         if self.has_moved or game.is_in_check(self.color):
             return []
-        king_row, _ = self.position
+        king_row = self.square >> 3
         # Kingside
         rook_k = board.get_piece((king_row, 7))
         if isinstance(rook_k, Rook) and not rook_k.has_moved and all(board.get_piece((king_row, c)) is None for c in [5, 6]):
@@ -65,172 +289,84 @@ class King(Piece):
 
     def get_valid_moves(self, board, game=None):
         """Gets valid moves, including castling."""
-        moves = []
-        r, c = self.position
-        for dr in [-1, 0, 1]:
-            for dc in [-1, 0, 1]:
-                if dr == 0 and dc == 0: continue
-                new_pos = (r + dr, c + dc)
-                if self._is_valid_and_capturable(new_pos, board)[0]:
-                    moves.append(new_pos)
+        moves = self._exclude_own_pieces(self.get_attack_squares(board), board)
         if game: moves.extend(self._get_castling_moves(board, game))
         return moves
     
     def get_attack_squares(self, board):
-        """Calculates all squares this King attacks (for check/defense)."""
-        moves = []
-        r, c = self.position
-        for dr in [-1, 0, 1]:
-            for dc in [-1, 0, 1]:
-                if dr == 0 and dc == 0: continue
-                new_pos = (r + dr, c + dc)
-                nr, nc = new_pos
-                # Only check if it's on the board
-                if 0 <= nr < 8 and 0 <= nc < 8:
-                    moves.append(new_pos)
-        return moves
+        """Looks up all squares this King attacks (for check/defense)."""
+        return KING_TARGETS[self.square]
+
+    def get_attack_bb(self, board):
+        return KING_ATTACKS[self.square]
 
 class Queen(Piece):
-    def __init__(self, color, position, name=None):
-        super().__init__(color, position, name or "Queen")
-        self.symbol = '♕' if color == 'white' else '♛'
-        self.value = 9
-        self.directions = [(-1, -1), (-1, 1), (1, -1), (1, 1), (-1, 0), (1, 0), (0, -1), (0, 1)] # (NEW)
+    __slots__ = ()
+    piece_type = QUEEN
+    value = 9
+    symbols = ('♕', '♛')
+    directions = QUEEN_DIRECTIONS
 
     def get_valid_moves(self, board, game=None):
-        moves = []
-        r, c = self.position
-        for dr, dc in self.directions:
-            for i in range(1, 8):
-                new_pos = (r + i * dr, c + i * dc)
-                is_valid, can_capture = self._is_valid_and_capturable(new_pos, board)
-                if is_valid:
-                    moves.append(new_pos)
-                    if can_capture: break
-                else: break
-        return moves
+        return self._exclude_own_pieces(self._get_sliding_attack_squares(board), board)
 
     def get_attack_squares(self, board):
         """Calculates attack squares, including X-Ray defense."""
-        moves = []
-        r, c = self.position
-        for dr, dc in self.directions:
-            for i in range(1, 8):
-                new_pos = (r + i * dr, c + i * dc)
-                nr, nc = new_pos
-                if not (0 <= nr < 8 and 0 <= nc < 8):
-                    break # Off board
-                moves.append(new_pos)
-                if board.get_piece(new_pos) is not None:
-                    break # Stop after hitting *any* piece
-        return moves
+        return self._get_sliding_attack_squares(board)
 
 class Rook(Piece):
-    def __init__(self, color, position, name=None):
-        super().__init__(color, position, name)
-        self.symbol = '♖' if color == 'white' else '♜'
-        self.value = 5
-        self.directions = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+    __slots__ = ()
+    piece_type = ROOK
+    value = 5
+    symbols = ('♖', '♜')
+    directions = ROOK_DIRECTIONS
 
     def get_valid_moves(self, board, game=None):
-        moves = []
-        r, c = self.position
-        for dr, dc in self.directions:
-            for i in range(1, 8):
-                new_pos = (r + i * dr, c + i * dc)
-                is_valid, can_capture = self._is_valid_and_capturable(new_pos, board)
-                if is_valid:
-                    moves.append(new_pos)
-                    if can_capture: break
-                else: break
-        return moves
+        return self._exclude_own_pieces(self._get_sliding_attack_squares(board), board)
 
     def get_attack_squares(self, board):
         """Calculates attack squares, including X-Ray defense."""
-        moves = []
-        r, c = self.position
-        for dr, dc in self.directions:
-            for i in range(1, 8):
-                new_pos = (r + i * dr, c + i * dc)
-                nr, nc = new_pos
-                if not (0 <= nr < 8 and 0 <= nc < 8):
-                    break # Off board
-                moves.append(new_pos)
-                if board.get_piece(new_pos) is not None:
-                    break # Stop after hitting *any* piece
-        return moves
+        return self._get_sliding_attack_squares(board)
 
 class Bishop(Piece):
-    def __init__(self, color, position, name=None):
-        super().__init__(color, position, name)
-        self.symbol = '♗' if color == 'white' else '♝'
-        self.value = 3
-        self.directions = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
+    __slots__ = ()
+    piece_type = BISHOP
+    value = 3
+    symbols = ('♗', '♝')
+    directions = BISHOP_DIRECTIONS
 
     def get_valid_moves(self, board, game=None):
-        moves = []
-        r, c = self.position
-        for dr, dc in self.directions:
-            for i in range(1, 8):
-                new_pos = (r + i * dr, c + i * dc)
-                is_valid, can_capture = self._is_valid_and_capturable(new_pos, board)
-                if is_valid:
-                    moves.append(new_pos)
-                    if can_capture: break
-                else: break
-        return moves
+        return self._exclude_own_pieces(self._get_sliding_attack_squares(board), board)
 
     def get_attack_squares(self, board):
         """Calculates attack squares, including X-Ray defense."""
-        moves = []
-        r, c = self.position
-        for dr, dc in self.directions:
-            for i in range(1, 8):
-                new_pos = (r + i * dr, c + i * dc)
-                nr, nc = new_pos
-                if not (0 <= nr < 8 and 0 <= nc < 8):
-                    break # Off board
-                moves.append(new_pos)
-                if board.get_piece(new_pos) is not None:
-                    break # Stop after hitting *any* piece
-        return moves
+        return self._get_sliding_attack_squares(board)
 
 class Knight(Piece):
-    def __init__(self, color, position, name=None):
-        super().__init__(color, position, name)
-        self.symbol = '♘' if color == 'white' else '♞'
-        self.value = 3
+    __slots__ = ()
+    piece_type = KNIGHT
+    value = 3
+    symbols = ('♘', '♞')
 
     def get_valid_moves(self, board, game=None):
-        moves = []
-        r, c = self.position
-        potential_moves = [(r-2, c-1), (r-2, c+1), (r+2, c-1), (r+2, c+1), (r-1, c-2), (r-1, c+2), (r+1, c-2), (r+1, c+2)]
-        for move in potential_moves:
-            if self._is_valid_and_capturable(move, board)[0]:
-                moves.append(move)
-        return moves
+        return self._exclude_own_pieces(self.get_attack_squares(board), board)
 
     def get_attack_squares(self, board):
-        """Calculates all squares this Knight attacks (for check/defense)."""
-        moves = []
-        r, c = self.position
-        potential_moves = [(r-2, c-1), (r-2, c+1), (r+2, c-1), (r+2, c+1), (r-1, c-2), (r-1, c+2), (r+1, c-2), (r+1, c+2)]
-        for move in potential_moves:
-            nr, nc = move
-            # Only check if it's on the board
-            if 0 <= nr < 8 and 0 <= nc < 8:
-                moves.append(move)
-        return moves
+        """Looks up all squares this Knight attacks (for check/defense)."""
+        return KNIGHT_TARGETS[self.square]
+
+    def get_attack_bb(self, board):
+        return KNIGHT_ATTACKS[self.square]
 
 class Pawn(Piece):
-    def __init__(self, color, position, name=None):
-        super().__init__(color, position, name)
-        self.symbol = '♙' if color == 'white' else '♟'
-        self.value = 1
+    __slots__ = ()
+    piece_type = PAWN
+    value = 1
+    symbols = ('♙', '♟')
 
     def get_valid_moves(self, board, game=None):
         moves = []
-        r, c = self.position
+        r, c = self.square >> 3, self.square & 7
         direction = -1 if self.color == 'white' else 1
         # 1. Forward moves
         one_step = (r + direction, c)
@@ -242,43 +378,232 @@ class Pawn(Piece):
                 if 0 <= two_steps[0] < 8 and board.get_piece(two_steps) is None:
                     moves.append(two_steps)
         # 3. Captures
-        for dc in [-1, 1]:
-            capture_pos = (r + direction, c + dc)
-            if 0 <= capture_pos[0] < 8 and 0 <= capture_pos[1] < 8:
-                target_piece = board.get_piece(capture_pos)
-                if target_piece and target_piece.color != self.color:
-                    moves.append(capture_pos)
+        enemy = board.occupancy['black' if self.color == 'white' else 'white']
+        for capture_pos in self.get_attack_squares(board):
+            if (enemy >> (capture_pos[0] * 8 + capture_pos[1])) & 1:
+                moves.append(capture_pos)
         # 4. En Passant
         if game and game.en_passant_target and (game.en_passant_target == (r + direction, c - 1) or game.en_passant_target == (r + direction, c + 1)):
             moves.append(game.en_passant_target)
         return moves
 
     def get_attack_squares(self, board):
-        """Calculates all squares this Pawn attacks (for check/defense)."""
-        moves = []
-        r, c = self.position
-        direction = -1 if self.color == 'white' else 1
-        for dc in [-1, 1]:
-            capture_pos = (r + direction, c + dc)
-            # Only check if it's on the board
-            if 0 <= capture_pos[0] < 8 and 0 <= capture_pos[1] < 8:
-                moves.append(capture_pos)
-        return moves
+        """Looks up all squares this Pawn attacks (for check/defense)."""
+        return PAWN_TARGETS[self.color][self.square]
+
+    def get_attack_bb(self, board):
+        return PAWN_ATTACKS[self.color][self.square]
+
+PIECE_CLASSES = (Pawn, Knight, Bishop, Rook, Queen, King) # Indexed by piece_type
+PIECE_DESCRIPTORS = [None] * 12 # Indexed by piece code
+for _piece_class in PIECE_CLASSES:
+    for _color in ('white', 'black'):
+        _descriptor = PieceDescriptor(_piece_class, _color)
+        PIECE_DESCRIPTORS[_descriptor.code] = _descriptor
+
+FEN_PIECE_CLASSES = {'p': Pawn, 'n': Knight, 'b': Bishop, 'r': Rook, 'q': Queen, 'k': King}
+FEN_PIECE_LETTERS = {cls.piece_type: letter for letter, cls in FEN_PIECE_CLASSES.items()}
 
 class Board:
-    """Represents the chessboard and its pieces."""
-    def __init__(self):
-        self.grid = [[None for _ in range(8)] for _ in range(8)]
-        self.setup_pieces()
+    """
+    Represents the chessboard and its pieces.
+    Squares are 0..63 indices throughout: `squares[sq]` holds the Piece
+    (or None) for the UI and for name lookups, while twelve piece
+    bitboards plus per-color occupancy are the internal source of truth
+    for fast queries. `get_piece`/`set_piece` accept (r, c) tuples.
+
+    The board also maintains per-color attack maps incrementally:
+    `attacks_from[sq]` is the attack bitboard of the piece on `sq`,
+    `attacked_by[color][sq]` is the bitboard of `color` pieces attacking
+    `sq`, and `attack_counts[color][sq]` is how many there are.
+
+    Per-color piece lists are the occupancy bitboards (see iter_pieces);
+    alongside them the board tracks each King's square, how many pieces
+    of every code are on the board, and each side's material (Kings
+    excluded), so none of these needs a board scan.
+    """
+    def __init__(self, placement=None):
+        self.squares = [None] * 64
+        self.bitboards = [0] * 12 # One set per (color, piece type)
+        self.occupancy = {'white': 0, 'black': 0}
+        self.occupied = 0
+        self.sliders = 0 # Bishops, rooks and queens of both colors
+        self.attacks_from = [0] * 64
+        self.attacked_by = {'white': [0] * 64, 'black': [0] * 64}
+        self.attack_counts = {'white': [0] * 64, 'black': [0] * 64}
+        self.zobrist = 0 # Piece-placement part of the position hash
+        self.king_square = {'white': None, 'black': None}
+        self.piece_counts = [0] * 12 # Indexed by piece code
+        self.material = {'white': 0, 'black': 0} # Sum of piece values, Kings excluded
+        if placement:
+            self.setup_from_fen(placement)
+        else:
+            self.setup_pieces()
 
     def get_piece(self, pos):
         r, c = pos
-        return self.grid[r][c] if 0 <= r < 8 and 0 <= c < 8 else None
+        return self.squares[r * 8 + c] if 0 <= r < 8 and 0 <= c < 8 else None
 
     def set_piece(self, pos, piece):
-        r, c = pos
-        self.grid[r][c] = piece
-        if piece: piece.position = pos
+        """Places a piece (or None) on an (r, c) square."""
+        self.set_square(pos[0] * 8 + pos[1], piece)
+
+    def set_square(self, sq, piece):
+        """
+        Places a piece (or None) on square index `sq`. This is the single
+        mutation point for the board, so it also keeps the bitboards and
+        the attack maps in sync (for real moves as well as simulate/undo).
+        """
+        bit = 1 << sq
+        squares = self.squares
+        old_piece = squares[sq]
+
+        # Sliders whose rays reach this square must be re-cast if the
+        # square changes between empty and occupied.
+        if (old_piece is None) != (piece is None):
+            affected_sliders = (self.attacked_by['white'][sq] | self.attacked_by['black'][sq]) & self.sliders
+        else:
+            affected_sliders = 0
+
+        if old_piece is not None:
+            self._set_attacks(sq, old_piece.color, 0)
+            self.zobrist ^= ZOBRIST_PIECES[old_piece.code][sq]
+            self.bitboards[old_piece.code] &= ~bit
+            self.piece_counts[old_piece.code] -= 1
+            if old_piece.piece_type == KING:
+                if self.king_square[old_piece.color] == sq:
+                    self.king_square[old_piece.color] = None
+            else:
+                self.material[old_piece.color] -= old_piece.value
+            self.occupancy[old_piece.color] &= ~bit
+            self.occupied &= ~bit
+            if old_piece.piece_type in (BISHOP, ROOK, QUEEN):
+                self.sliders &= ~bit
+        squares[sq] = piece
+        if piece:
+            piece.square = sq
+            self.zobrist ^= ZOBRIST_PIECES[piece.code][sq]
+            self.bitboards[piece.code] |= bit
+            self.piece_counts[piece.code] += 1
+            if piece.piece_type == KING:
+                self.king_square[piece.color] = sq
+            else:
+                self.material[piece.color] += piece.value
+            self.occupancy[piece.color] |= bit
+            self.occupied |= bit
+            if piece.piece_type in (BISHOP, ROOK, QUEEN):
+                self.sliders |= bit
+
+        for slider_sq in iter_bits(affected_sliders):
+            slider = squares[slider_sq]
+            self._set_attacks(slider_sq, slider.color,
+                              piece_attacks_bb(slider.piece_type, slider.color, slider_sq, self.occupied))
+        if piece:
+            self._set_attacks(sq, piece.color, piece_attacks_bb(piece.piece_type, piece.color, sq, self.occupied))
+
+    def _set_attacks(self, sq, color, new_attacks):
+        """Replaces the attack set of the piece on `sq`, updating only the squares that changed."""
+        old_attacks = self.attacks_from[sq]
+        if old_attacks == new_attacks:
+            return
+        self.attacks_from[sq] = new_attacks
+        attacked_by = self.attacked_by[color]
+        counts = self.attack_counts[color]
+        bit = 1 << sq
+        for target in iter_bits(old_attacks & ~new_attacks):
+            attacked_by[target] &= ~bit
+            counts[target] -= 1
+        for target in iter_bits(new_attacks & ~old_attacks):
+            attacked_by[target] |= bit
+            counts[target] += 1
+
+    def attacked_squares(self, color):
+        """Returns the bitboard of every square attacked by `color`."""
+        attacks_from = self.attacks_from
+        attacked = 0
+        for sq in iter_bits(self.occupancy[color]):
+            attacked |= attacks_from[sq]
+        return attacked
+
+    def attackers_to(self, sq, color, occupied=None):
+        """
+        Returns a bitboard of every `color` piece attacking square index `sq`.
+        Attacks are symmetric, so this looks up the attack tables *from* the
+        target square. Pass a reduced `occupied` to see x-rays through pieces.
+        """
+        if occupied is None:
+            occupied = self.occupied
+        bbs = self.bitboards
+        offset = COLOR_OFFSET[color]
+        queens = bbs[QUEEN + offset]
+        return ((PAWN_ATTACKS['black' if color == 'white' else 'white'][sq] & bbs[PAWN + offset])
+                | (KNIGHT_ATTACKS[sq] & bbs[KNIGHT + offset])
+                | (KING_ATTACKS[sq] & bbs[KING + offset])
+                | (slider_attacks(sq, occupied, ROOK_DIRECTIONS) & (bbs[ROOK + offset] | queens))
+                | (slider_attacks(sq, occupied, BISHOP_DIRECTIONS) & (bbs[BISHOP + offset] | queens)))
+
+    def static_exchange(self, start_sq, end_sq):
+        """
+        Static Exchange Evaluation: resolves the whole capture sequence on
+        `end_sq` that starts with the piece on `start_sq` moving there, with
+        each side recapturing with its least valuable attacker (or stopping
+        when that loses material). Pieces that line up behind a capturer
+        join in as x-rays. Pins are ignored.
+
+        Returns the net material result for the mover in piece values
+        (Pawn=1 ... Queen=9). A quiet move scores 0 if the landing square is
+        safe and a negative value if the piece can be won there.
+        """
+        squares = self.squares
+        bbs = self.bitboards
+        piece = squares[start_sq]
+        target = squares[end_sq]
+        occupied = self.occupied & ~(1 << start_sq)
+        gain = [target.value if target else 0]
+        on_square = piece.value
+
+        if piece.piece_type == PAWN:
+            victim_sq = (start_sq & ~7) | (end_sq & 7)
+            if target is None and victim_sq != start_sq and squares[victim_sq]:
+                # En passant: the victim stands beside the start square
+                gain[0] = squares[victim_sq].value
+                occupied &= ~(1 << victim_sq)
+            if end_sq < 8 or end_sq >= 56:
+                gain[0] += Queen.value - Pawn.value
+                on_square = Queen.value
+
+        side = 'black' if piece.color == 'white' else 'white'
+        while True:
+            attackers = self.attackers_to(end_sq, side, occupied) & occupied
+            if not attackers:
+                break
+            offset = COLOR_OFFSET[side]
+            for piece_type in range(6):
+                candidates = attackers & bbs[piece_type + offset]
+                if candidates:
+                    break
+            other = 'black' if side == 'white' else 'white'
+            if piece_type == KING and self.attackers_to(end_sq, other, occupied) & occupied:
+                break # The King cannot recapture onto a defended square
+            gain.append(on_square - gain[-1])
+            on_square = squares[(candidates & -candidates).bit_length() - 1].value
+            occupied &= ~(candidates & -candidates) # Uncovers any x-ray behind it
+            side = other
+
+        # Each side may stop capturing whenever continuing would lose material
+        for i in range(len(gain) - 1, 0, -1):
+            gain[i - 1] = -max(-gain[i - 1], gain[i])
+        return gain[0]
+
+    def pieces_bb(self, color, piece_type):
+        """Returns the bitboard for one (color, piece type) set."""
+        return self.bitboards[piece_type + COLOR_OFFSET[color]]
+
+    def iter_pieces(self, color):
+        """Yields (pos, piece) for every piece of a color, a8..h1 order."""
+        squares = self.squares
+        for sq in iter_bits(self.occupancy[color]):
+            yield (sq >> 3, sq & 7), squares[sq]
 
     def move_piece(self, start_pos, end_pos):
         piece = self.get_piece(start_pos)
@@ -292,11 +617,8 @@ class Board:
         return None
     
     def find_king(self, color):
-        for r in range(8):
-            for c in range(8):
-                piece = self.get_piece((r, c))
-                if isinstance(piece, King) and piece.color == color: return (r, c)
-        return None
+        king_sq = self.king_square[color]
+        return None if king_sq is None else (king_sq >> 3, king_sq & 7)
 
     def setup_pieces(self):
         for r, color in [(0, 'black'), (7, 'white')]:
@@ -313,85 +635,206 @@ class Board:
             self.set_piece((1, c), Pawn('black', (1, c), name=f"{files[c]}_pawn"))
             self.set_piece((6, c), Pawn('white', (6, c), name=f"{files[c]}_pawn"))
 
+    def setup_from_fen(self, placement):
+        """
+        Places pieces from the first field of a FEN string. Names follow
+        setup_pieces as closely as the position allows: Pawns by file,
+        Rooks and Knights by board side, Bishops by square color.
+        Every piece off its starting rank is marked as moved, and so are
+        all Kings and Rooks: the castling rights (see ChessGame._parse_fen)
+        decide which of those have not moved. Raises ValueError for a malformed placement.
+        """
+        ranks = placement.split('/')
+        if len(ranks) != 8:
+            raise ValueError(f"FEN placement needs 8 ranks, got {len(ranks)}: '{placement}'")
+        for r, rank in enumerate(ranks):
+            c = 0
+            for char in rank:
+                if char.isdigit():
+                    c += int(char)
+                    continue
+                piece_class = FEN_PIECE_CLASSES.get(char.lower())
+                if piece_class is None or c > 7:
+                    raise ValueError(f"Bad FEN rank '{rank}'")
+                color = 'white' if char.isupper() else 'black'
+                piece = piece_class(color, (r, c), name=self._fen_piece_name(piece_class, color, r, c))
+                home_rank = (6 if color == 'white' else 1) if piece_class is Pawn else (7 if color == 'white' else 0)
+                piece.has_moved = r != home_rank or piece_class in (King, Rook)
+                piece.move_count = 1 if piece.has_moved else 0 # History unknown: assume one move
+                self.set_piece((r, c), piece)
+                c += 1
+            if c != 8:
+                raise ValueError(f"Bad FEN rank '{rank}'")
+
+    @staticmethod
+    def _fen_piece_name(piece_class, color, r, c):
+        """Picks the setup_pieces-style name for a piece loaded from FEN."""
+        if piece_class is Pawn:
+            return f"{'abcdefgh'[c]}_pawn"
+        if piece_class in (Rook, Knight):
+            return f"{'Q' if c < 4 else 'K'}_{piece_class.__name__.lower()}"
+        if piece_class is Bishop:
+            # The c-file bishop starts on a dark square for White, light for Black
+            on_light_square = (r + c) % 2 == 0
+            return "Q_bishop" if on_light_square == (color == 'black') else "K_bishop"
+        return None # Queen and King use their class defaults
+
+class PositionAnalysis:
+    """
+    The shared per-turn analysis context for one position and one color:
+    the "Dangers List" (tactical threats), the "Options List" (move
+    consequence mapping), the simple legal move list used for validation,
+    and their JSON serializations. Everything is computed at most once,
+    so the app phases and agents can pass this object around instead of
+    re-running the analysis and re-serializing the same large lists.
+    Get one from `ChessGame.get_position_analysis`; treat it as read-only.
+    """
+    def __init__(self, game, color, signature):
+        self.position_hash = game.position_hash
+        self.color = color
+        self.signature = signature # Piece names/move counts, see ChessGame._piece_signature
+        self.tactical_threats = game.get_tactical_threats(color)
+        self.enhanced_moves = game.get_all_legal_moves_with_consequences(color)
+        self.legal_moves = [m['move'] for m in self.enhanced_moves] # For validation
+        self._tactical_threats_json = None
+        self._enhanced_moves_json = None
+
+    @property
+    def tactical_threats_json(self):
+        if self._tactical_threats_json is None:
+            self._tactical_threats_json = json.dumps(self.tactical_threats)
+        return self._tactical_threats_json
+
+    @property
+    def enhanced_moves_json(self):
+        if self._enhanced_moves_json is None:
+            self._enhanced_moves_json = json.dumps(self.enhanced_moves)
+        return self._enhanced_moves_json
+
 class ChessGame:
     """Manages the state and logic of a chess game."""
-    def __init__(self):
-        self.reset_game()
+    def __init__(self, fen=None):
+        self.reset_game(fen)
 
-    def reset_game(self):
-        self.board = Board()
-        self.turn = 'white'
+    def reset_game(self, fen=None):
+        """Starts a new game from the initial position, or from a FEN string."""
+        # Parse first: a malformed FEN raises before the current game is touched
+        if fen:
+            board, turn, castling_rights, en_passant_target, halfmove_clock, fullmove_number = self._parse_fen(fen)
+        else:
+            board, turn, castling_rights, en_passant_target, halfmove_clock, fullmove_number = \
+                Board(), 'white', ALL_CASTLING_RIGHTS, None, 0, 1
+        self.board = board
+        self.turn = turn
         self.game_over = False
         self.status_message = "White's turn."
         self.move_history = []
         self.promotion_pending = None
-        self.en_passant_target = None
-        self.position_history = {} # For 50-move rule, threefold rep
+        self.en_passant_target = en_passant_target
+        self.castling_rights = castling_rights
+        self.halfmove_clock = halfmove_clock # Moves since the last capture or pawn move
+        self.fullmove_number = fullmove_number # Incremented after each Black move
+        self.position_hash = 0 # 64-bit Zobrist key, a cheap identity for caches
+        self._update_position_hash()
+        self.position_history = {} # Zobrist key -> count, for repetition draws
         self.game_id = f"chs-{uuid.uuid4()}"
         self.game_data = [] # Structured log of all moves
         self._record_position()
-        self._pre_move_state = None # For "take back" functionality
+        self._undo_stack = [] # One undo record per move made, for unmake_move
+        self._pre_move_state = None # Undo-stack depth for "take back" functionality
+        self._status_before_promotion = None
+        self._consequence_cache = {} # (position hash, color) -> (piece signature, packets)
+        self._analysis_cache = {} # (position hash, color) -> PositionAnalysis
+        if fen:
+            self._update_game_status() # The position may already be decided
+
+    def load_fen(self, fen):
+        """
+        Replaces the current game with the position described by a FEN
+        string. On a malformed FEN, raises ValueError and keeps the game.
+        """
+        self.reset_game(fen)
+
+    def _parse_fen(self, fen):
+        """
+        Parses and validates a FEN string (the clocks may be omitted).
+        Returns (board, turn, castling rights, en passant target, halfmove
+        clock, fullmove number) without changing the game.
+        Raises ValueError for a malformed FEN.
+        """
+        fields = fen.split()
+        if len(fields) not in (4, 6):
+            raise ValueError(f"FEN needs 4 or 6 fields, got {len(fields)}: '{fen}'")
+        placement, turn, castling, en_passant = fields[:4]
+        if turn not in ('w', 'b'):
+            raise ValueError(f"Bad FEN side to move '{turn}'")
+        if castling != '-' and (not castling or any(letter not in "KQkq" for letter in castling)
+                                or len(set(castling)) != len(castling)):
+            raise ValueError(f"Bad FEN castling field '{castling}'")
+        if en_passant != '-' and not (len(en_passant) == 2 and en_passant[0] in "abcdefgh" and en_passant[1] in "36"):
+            raise ValueError(f"Bad FEN en passant square '{en_passant}'")
+        try:
+            halfmove_clock, fullmove_number = (int(fields[4]), int(fields[5])) if len(fields) == 6 else (0, 1)
+        except ValueError:
+            raise ValueError(f"Bad FEN clocks: '{fen}'")
+        if halfmove_clock < 0 or fullmove_number < 1:
+            raise ValueError(f"Bad FEN clocks: '{fen}'")
+        board = Board(placement)
+
+        # A right only counts if its King and Rook are still at home
+        castling_rights = 0
+        for right, letter, king_pos, rook_pos in CASTLING_FEN:
+            king, rook = board.get_piece(king_pos), board.get_piece(rook_pos)
+            if letter in castling and isinstance(king, King) and isinstance(rook, Rook) \
+                    and king.color == rook.color == ('white' if letter.isupper() else 'black'):
+                castling_rights |= right
+                king.has_moved = rook.has_moved = False
+                king.move_count = rook.move_count = 0
+
+        en_passant_target = None if en_passant == '-' else self._notation_to_pos_tuple(en_passant)
+        return (board, 'white' if turn == 'w' else 'black', castling_rights, en_passant_target,
+                halfmove_clock, fullmove_number)
+
+    def get_fen(self):
+        """Serializes the current position as a standard FEN string."""
+        ranks = []
+        for r in range(8):
+            rank, empty = "", 0
+            for piece in self.board.squares[r * 8:r * 8 + 8]:
+                if piece is None:
+                    empty += 1
+                    continue
+                if empty:
+                    rank += str(empty)
+                    empty = 0
+                letter = FEN_PIECE_LETTERS[piece.piece_type]
+                rank += letter.upper() if piece.color == 'white' else letter
+            ranks.append(rank + (str(empty) if empty else ""))
+        castling = "".join(letter for right, letter, _, _ in CASTLING_FEN if self.castling_rights & right) or "-"
+        en_passant = self.pos_to_notation(self.en_passant_target) if self.en_passant_target else "-"
+        return (f"{'/'.join(ranks)} {self.turn[0]} {castling} {en_passant} "
+                f"{self.halfmove_clock} {self.fullmove_number}")
 
     def pos_to_notation(self, pos):
         r, c = pos
         return f"{'abcdefgh'[c]}{8-r}"
 
-    def _get_board_state_string(self):
-        """Generates a FEN-like string for position history tracking."""
-        state_parts = []
-        for r in range(8):
-            empty_count = 0
-            for c in range(8):
-                piece = self.board.get_piece((r,c))
-                if piece:
-                    if empty_count > 0:
-                        state_parts.append(str(empty_count))
-                        empty_count = 0
-                    state_parts.append(piece.symbol)
-                else:
-                    empty_count += 1
-            if empty_count > 0:
-                state_parts.append(str(empty_count))
-            if r < 7:
-                state_parts.append('/')
-        
-        # Add turn
-        state_parts.append(f" {self.turn[0]} ")
-        
-        # --- Castling Rights Logic ---
-        castling_rights = ""
-        
-        # White King
-        white_king = self.board.get_piece((7,4))
-        if white_king and isinstance(white_king, King) and not white_king.has_moved:
-            # White Kingside Rook
-            white_rook_k = self.board.get_piece((7,7))
-            if white_rook_k and isinstance(white_rook_k, Rook) and not white_rook_k.has_moved:
-                castling_rights += "K"
-            # White Queenside Rook
-            white_rook_q = self.board.get_piece((7,0))
-            if white_rook_q and isinstance(white_rook_q, Rook) and not white_rook_q.has_moved:
-                castling_rights += "Q"
-
-        # Black King
-        black_king = self.board.get_piece((0,4))
-        if black_king and isinstance(black_king, King) and not black_king.has_moved:
-            # Black Kingside Rook
-            black_rook_k = self.board.get_piece((0,7))
-            if black_rook_k and isinstance(black_rook_k, Rook) and not black_rook_k.has_moved:
-                castling_rights += "k"
-            # Black Queenside Rook
-            black_rook_q = self.board.get_piece((0,0))
-            if black_rook_q and isinstance(black_rook_q, Rook) and not black_rook_q.has_moved:
-                castling_rights += "q"
-                
-        state_parts.append(f"{castling_rights if castling_rights else '-'} ")
-        # --- Fixed Logic ---
+    def _update_position_hash(self):
+        """
+        Refreshes the public Zobrist key. The piece part is kept incrementally
+        by Board.set_piece; side to move, castling and en passant are folded
+        in here after every move.
+        """
+        key = self.board.zobrist ^ ZOBRIST_CASTLING[self.castling_rights]
+        if self.turn == 'black':
+            key ^= ZOBRIST_BLACK_TO_MOVE
+        if self.en_passant_target:
+            key ^= ZOBRIST_EN_PASSANT[self.en_passant_target[1]]
+        self.position_hash = key
 
-        # Add en passant
-        state_parts.append(f"{self.pos_to_notation(self.en_passant_target) if self.en_passant_target else '-'}")
-        
-        return "".join(state_parts)
+    def _update_castling_rights(self, start_pos, end_pos):
+        """Drops the castling rights a move from/to these squares invalidates."""
+        self.castling_rights &= ~(CASTLING_RIGHTS_LOST.get(start_pos, 0) | CASTLING_RIGHTS_LOST.get(end_pos, 0))
 
     def get_board_state_narrative(self):
         """
@@ -401,14 +844,12 @@ class ChessGame:
         narrative = []
         pieces = {'white': [], 'black': []}
         
-        for r in range(8):
-            for c in range(8):
-                piece = self.board.get_piece((r, c))
-                if piece:
-                    pos_str = self.pos_to_notation((r, c))
-                    attack_squares = [self.pos_to_notation(pos) for pos in piece.get_attack_squares(self.board)]
-                    attack_str = f" (Attacking: {', '.join(attack_squares)})" if attack_squares else ""
-                    pieces[piece.color].append(f"{piece.name} on {pos_str}{attack_str}")
+        for color in ('white', 'black'):
+            for pos, piece in self.board.iter_pieces(color):
+                pos_str = self.pos_to_notation(pos)
+                attack_squares = [self.pos_to_notation(attack_pos) for attack_pos in piece.get_attack_squares(self.board)]
+                attack_str = f" (Attacking: {', '.join(attack_squares)})" if attack_squares else ""
+                pieces[color].append(f"{piece.name} on {pos_str}{attack_str}")
 
         narrative.append("Board State:\n")
         narrative.append("White Pieces:")
@@ -449,9 +890,8 @@ class ChessGame:
         return "\n".join(narrative)
 
     def _record_position(self):
-        """Records the FEN-like string for repetition tracking."""
-        state_key = self._get_board_state_string()
-        self.position_history[state_key] = self.position_history.get(state_key, 0) + 1
+        """Records the Zobrist key for repetition tracking."""
+        self.position_history[self.position_hash] = self.position_history.get(self.position_hash, 0) + 1
 
     def _record_move_data(self, piece, start_pos, end_pos, captured_piece, promoted_into=None):
         """Records a detailed log of the move in self.game_data."""
@@ -474,13 +914,16 @@ class ChessGame:
 
     def _check_insufficient_material(self):
         """Checks for draw by insufficient material."""
-        pieces = [p for row in self.board.grid for p in row if p]
+        counts = self.board.piece_counts
+        piece_count = sum(counts)
         
         # King vs King
-        if len(pieces) == 2: return True
+        if piece_count == 2: return True
         
         # King vs King + (Knight or Bishop)
-        if len(pieces) == 3 and any(isinstance(p, (Knight, Bishop)) for p in pieces): return True
+        if piece_count == 3:
+            minors = sum(counts[piece_type + offset] for piece_type in (KNIGHT, BISHOP) for offset in (0, 6))
+            if minors: return True
         
         # TODO: Add more complex rules (e.g., two knights vs king is a draw)
         return False
@@ -488,13 +931,15 @@ class ChessGame:
     def _update_game_status(self):
         """Updates the game status message based on the current board state."""
         # Note: This is called *after* a move, so self.turn is the *next* player
-        if self.is_checkmate(self.turn):
+        in_check = self.is_in_check(self.turn)
+        has_moves = self.has_legal_moves(self.turn)
+        if in_check and not has_moves:
             self.game_over = True
             self.status_message = f"Checkmate! {'White' if self.turn == 'black' else 'Black'} wins."
-        elif self.is_stalemate(self.turn):
+        elif not in_check and not has_moves:
             self.game_over = True
             self.status_message = "Stalemate! The game is a draw."
-        elif self.position_history.get(self._get_board_state_string(), 0) >= 5:
+        elif self.position_history.get(self.position_hash, 0) >= 5:
             # FIDE rule: 5-fold repetition is an automatic draw
             self.game_over = True
             self.status_message = "Draw by fivefold repetition."
@@ -503,45 +948,141 @@ class ChessGame:
             self.status_message = "Draw by insufficient material."
         else:
             self.status_message = f"{self.turn.capitalize()}'s turn"
-            if self.is_in_check(self.turn): self.status_message += " (in check)."
+            if in_check: self.status_message += " (in check)."
             
         if self.game_over and "draw" in self.status_message.lower():
              if self.game_data: self.game_data[-1]['draw'] = 1
 
     def is_square_attacked(self, pos, attacker_color):
         """Checks if a specific square is attacked by any piece of the attacker's color."""
-        for r in range(8):
-            for c in range(8):
-                piece = self.board.get_piece((r, c))
-                if piece and piece.color == attacker_color:
-                    if pos in piece.get_attack_squares(self.board):
-                        return True
-        return False
+        return self.board.attack_counts[attacker_color][square_index(pos)] > 0
 
     def _get_attackers_of_square(self, pos, attacker_color):
         """Helper function to get a list of all pieces attacking a square."""
-        attackers = []
-        for r in range(8):
-            for c in range(8):
-                piece = self.board.get_piece((r, c))
-                if piece and piece.color == attacker_color:
-                    if pos in piece.get_attack_squares(self.board):
-                        attackers.append(piece)
-        return attackers
+        squares = self.board.squares
+        attackers_bb = self.board.attacked_by[attacker_color][square_index(pos)]
+        return [squares[sq] for sq in iter_bits(attackers_bb)]
+
+    def _get_pins_and_checkers(self, color):
+        """
+        Computes, once per position, which enemy pieces give check to
+        `color` and which `color` pieces are absolutely pinned.
+        Returns (checkers_bb, pins), where `pins` maps a pinned piece's
+        square index to the mask of squares it may still move to
+        (the line between its King and the pinner, pinner included).
+        """
+        board = self.board
+        opponent_color = 'black' if color == 'white' else 'white'
+        king_sq = board.king_square[color]
+        checkers = board.attacked_by[opponent_color][king_sq]
+
+        own = board.occupancy[color]
+        queens = board.pieces_bb(opponent_color, QUEEN)
+        line_pinners = board.pieces_bb(opponent_color, ROOK) | queens
+        diagonal_pinners = board.pieces_bb(opponent_color, BISHOP) | queens
+        pins = {}
+        for direction in QUEEN_DIRECTIONS:
+            ray = RAY_MASKS[direction][king_sq]
+            blockers = ray & board.occupied
+            if not blockers:
+                continue
+            first = _first_blocker(direction, blockers)
+            if not (own >> first) & 1:
+                continue # Nearest piece is an enemy (a checker or harmless)
+            rest = blockers & ~(1 << first)
+            if not rest:
+                continue
+            second = _first_blocker(direction, rest)
+            pinners = line_pinners if direction in ROOK_DIRECTIONS else diagonal_pinners
+            if (pinners >> second) & 1:
+                pins[first] = BETWEEN[king_sq][second] | (1 << second)
+        return checkers, pins
 
     def _get_all_legal_moves_tuples(self, color):
         """
         Internal helper to get all legal moves as (start, end, piece) tuples.
         This is the new source of truth for all move generation.
+        Returns a lazy iterator, so `has_legal_moves` can stop at the first move.
         """
-        for r in range(8):
-            for c in range(8):
-                piece = self.board.get_piece((r, c))
-                if piece and piece.color == color:
-                    start_pos = (r, c)
-                    for end_pos in piece.get_valid_moves(self.board, self):
-                        if not self.move_puts_king_in_check(start_pos, end_pos):
-                            yield (start_pos, end_pos, piece) # Yield a generator
+        if DEBUG_MOVEGEN:
+            return self._cross_check_legal_moves(color)
+        return self._generate_legal_moves_tuples(color)
+
+    def _generate_legal_moves_tuples(self, color):
+        """
+        The pin- and check-aware generator. Pins and checkers are computed
+        once per position, so only legal moves are emitted and the board is
+        never mutated (except for the rare en passant capture, which is
+        simulated because it removes two pieces from one rank).
+        """
+        board = self.board
+        king_sq = board.king_square[color]
+        if king_sq is None:
+            # No King on the board (e.g. a test setup): nothing can be pinned
+            for start_pos, piece in list(board.iter_pieces(color)):
+                for end_pos in piece.get_valid_moves(board, self):
+                    yield (start_pos, end_pos, piece)
+            return
+
+        opponent_color = 'black' if color == 'white' else 'white'
+        checkers, pins = self._get_pins_and_checkers(color)
+        num_checkers = popcount(checkers)
+
+        # Squares a non-King move must land on: anywhere, or (in check)
+        # capture the checker / block its line.
+        if num_checkers == 0:
+            target_mask = ALL_SQUARES
+        elif num_checkers == 1:
+            target_mask = checkers | BETWEEN[king_sq][checkers.bit_length() - 1]
+        else:
+            target_mask = 0 # Double check: only the King may move
+
+        # Snapshot the piece list: en passant simulation mutates the board
+        for start_pos, piece in list(board.iter_pieces(color)):
+            start_sq = square_index(start_pos)
+            if piece.piece_type == KING:
+                # The King must not stay on a line it is being x-rayed along
+                occupied_without_king = board.occupied & ~(1 << start_sq)
+                for end_pos in piece.get_valid_moves(board, self):
+                    if abs(end_pos[1] - start_pos[1]) == 2:
+                        yield (start_pos, end_pos, piece) # Castling is fully checked by King
+                    elif not board.attackers_to(square_index(end_pos), opponent_color, occupied_without_king):
+                        yield (start_pos, end_pos, piece)
+                continue
+            if not target_mask:
+                continue
+            allowed = target_mask & pins.get(start_sq, ALL_SQUARES)
+            for end_pos in piece.get_valid_moves(board, self):
+                if piece.piece_type == PAWN and end_pos == self.en_passant_target and start_pos[1] != end_pos[1]:
+                    if not self.move_puts_king_in_check(start_pos, end_pos):
+                        yield (start_pos, end_pos, piece)
+                elif (allowed >> square_index(end_pos)) & 1:
+                    yield (start_pos, end_pos, piece)
+
+    def _get_all_legal_moves_tuples_simulated(self, color):
+        """
+        The original simulate-and-test generator: every pseudo-legal move
+        is played on the board and checked with `move_puts_king_in_check`.
+        Kept as a reference for DEBUG_MOVEGEN.
+        """
+        # Snapshot the piece list: the legality check mutates the board
+        for start_pos, piece in list(self.board.iter_pieces(color)):
+            for end_pos in piece.get_valid_moves(self.board, self):
+                if not self.move_puts_king_in_check(start_pos, end_pos):
+                    yield (start_pos, end_pos, piece) # Yield a generator
+
+    def _cross_check_legal_moves(self, color):
+        """Runs both generators and fails loudly if they disagree."""
+        fast_moves = list(self._generate_legal_moves_tuples(color))
+        slow_moves = list(self._get_all_legal_moves_tuples_simulated(color))
+        if fast_moves != slow_moves:
+            fast = {(s, e) for s, e, _ in fast_moves}
+            slow = {(s, e) for s, e, _ in slow_moves}
+            raise AssertionError(
+                f"Legal move generators disagree for {color}: "
+                f"only fast={sorted(fast - slow)}, only simulated={sorted(slow - fast)}"
+            )
+        return iter(fast_moves)
 
     def _get_all_legal_moves(self, color):
         """
@@ -562,242 +1103,260 @@ class ChessGame:
         tactical_threats = []
         opponent_color = 'black' if color_being_threatened == 'white' else 'white'
         
-        for r in range(8):
-            for c in range(8):
-                threatened_piece = self.board.get_piece((r, c))
+        # 1. Only our own pieces can be threatened
+        for pos, threatened_piece in self.board.iter_pieces(color_being_threatened):
+            
+            # 2. Is this piece attacked?
+            attackers = self._get_attackers_of_square(pos, opponent_color)
+            if not attackers:
+                continue # Not attacked, not a threat.
                 
-                # 1. Is this one of our pieces?
-                if not threatened_piece or threatened_piece.color != color_being_threatened:
+            # 3. This piece is attacked. Now check for pins.
+            is_pin = False
+            pinned_to_piece_data = None
+            
+            for attacker in attackers:
+                # Pins only apply to sliding pieces (Queen, Rook, Bishop)
+                if attacker.piece_type not in SLIDER_DIRECTIONS:
                     continue
                     
-                pos = (r, c)
+                # Calculate direction from attacker to our piece
+                dr = pos[0] - attacker.position[0]
+                dc = pos[1] - attacker.position[1]
                 
-                # 2. Is this piece attacked?
-                attackers = self._get_attackers_of_square(pos, opponent_color)
-                if not attackers:
-                    continue # Not attacked, not a threat.
-                    
-                # 3. This piece is attacked. Now check for pins.
-                is_pin = False
-                pinned_to_piece_data = None
+                # Normalize direction
+                unit_dr = 0 if dr == 0 else dr // abs(dr)
+                unit_dc = 0 if dc == 0 else dc // abs(dc)
                 
-                for attacker in attackers:
-                    # Pins only apply to sliding pieces (Queen, Rook, Bishop)
-                    if not hasattr(attacker, 'directions'):
-                        continue
-                        
-                    # Calculate direction from attacker to our piece
-                    dr = pos[0] - attacker.position[0]
-                    dc = pos[1] - attacker.position[1]
+                # If this direction isn't in the attacker's moveset, it's not a pin
+                if (unit_dr, unit_dc) not in attacker.directions:
+                    continue
                     
-                    # Normalize direction
-                    unit_dr = 0 if dr == 0 else dr // abs(dr)
-                    unit_dc = 0 if dc == 0 else dc // abs(dc)
+                # 4. Scan *past* our piece along the same line
+                for i in range(1, 8):
+                    scan_pos = (pos[0] + i * unit_dr, pos[1] + i * unit_dc)
                     
-                    # If this direction isn't in the attacker's moveset, it's not a pin
-                    if (unit_dr, unit_dc) not in attacker.directions:
-                        continue
+                    if not (0 <= scan_pos[0] < 8 and 0 <= scan_pos[1] < 8):
+                        break # Off board
                         
-                    # 4. Scan *past* our piece along the same line
-                    for i in range(1, 8):
-                        scan_pos = (pos[0] + i * unit_dr, pos[1] + i * unit_dc)
-                        
-                        if not (0 <= scan_pos[0] < 8 and 0 <= scan_pos[1] < 8):
-                            break # Off board
-                            
-                        scanned_piece = self.board.get_piece(scan_pos)
+                    scanned_piece = self.board.get_piece(scan_pos)
+                    
+                    if scanned_piece:
+                        # We hit another piece.
+                        if scanned_piece.color == color_being_threatened:
+                            # It's a friendly piece. This is a PIN!
+                            is_pin = True
+                            pinned_to_piece_data = {
+                                "name": scanned_piece.name,
+                                "position": self.pos_to_notation(scan_pos),
+                                "value": scanned_piece.value
+                            }
+                        # If it's an enemy piece, it blocks the pin.
+                        # In either case, the scan along this line stops.
+                        break 
                         
-                        if scanned_piece:
-                            # We hit another piece.
-                            if scanned_piece.color == color_being_threatened:
-                                # It's a friendly piece. This is a PIN!
-                                is_pin = True
-                                pinned_to_piece_data = {
-                                    "name": scanned_piece.name,
-                                    "position": self.pos_to_notation(scan_pos),
-                                    "value": scanned_piece.value
-                                }
-                            # If it's an enemy piece, it blocks the pin.
-                            # In either case, the scan along this line stops.
-                            break 
-                            
-                    if is_pin:
-                        break # Found a pin, no need to check other attackers
-
-                # 5. Build the JSON packet for this single threat
-                tactical_threats.append({
-                    "threatened_piece": {
-                        "name": threatened_piece.name,
-                        "position": self.pos_to_notation(pos),
-                        "value": threatened_piece.value
-                    },
-                    "attacking_pieces": [
-                        {"name": p.name, "position": self.pos_to_notation(p.position), "value": p.value} 
-                        for p in attackers
-                    ],
-                    "is_pin": is_pin,
-                    "pinned_to_piece": pinned_to_piece_data
-                })
-                
+                if is_pin:
+                    break # Found a pin, no need to check other attackers
+
+            # 5. Build the JSON packet for this single threat
+            tactical_threats.append({
+                "threatened_piece": {
+                    "name": threatened_piece.name,
+                    "position": self.pos_to_notation(pos),
+                    "value": threatened_piece.value
+                },
+                "attacking_pieces": [
+                    {"name": p.name, "position": self.pos_to_notation(p.position), "value": p.value} 
+                    for p in attackers
+                ],
+                "is_pin": is_pin,
+                "pinned_to_piece": pinned_to_piece_data
+            })
+            
         return tactical_threats
 
     def get_all_legal_moves_with_consequences(self, color):
         """
         This is the new "Move Consequence Mapping" function.
-        It simulates every legal move to see what its results are
-        (captures, checks, attacks) AND checks for retaliation.
+        For every legal move it reports the results (captures, checks,
+        attacks) AND the retaliation against the landing square.
         This is the "predictive" ground truth for the AI Opponent Agent.
+
+        Results are memoized per position hash, so repeated calls for the
+        same position (human turn, AI turn, Q&A context) are free.
+        The packets are shared with the cache: treat them as read-only.
         """
-        enhanced_moves_list = []
+        cache_key = (self.position_hash, color)
+        signature = self._piece_signature()
+        cached = self._consequence_cache.get(cache_key)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+
+        enhanced_moves_list = [
+            self._get_move_consequences(start_pos, end_pos, piece, color)
+            for start_pos, end_pos, piece in self._get_all_legal_moves_tuples(color)
+        ]
+        if len(self._consequence_cache) >= CONSEQUENCE_CACHE_SIZE:
+            self._consequence_cache.clear()
+        self._consequence_cache[cache_key] = (signature, enhanced_moves_list)
+        return enhanced_moves_list
+
+    def _piece_signature(self):
+        """
+        Names and move counts of every piece, a8..h1. The packets report
+        both, but the Zobrist hash does not cover them, so cache hits
+        keyed by position hash are validated against this.
+        """
+        squares = self.board.squares
+        return tuple((squares[sq].name, squares[sq].move_count) for sq in iter_bits(self.board.occupied))
+
+    def get_position_analysis(self, color=None):
+        """
+        Returns the PositionAnalysis for `color` (default: side to move)
+        in the current position, computing it only on the first request.
+        """
+        color = color or self.turn
+        cache_key = (self.position_hash, color)
+        signature = self._piece_signature()
+        analysis = self._analysis_cache.get(cache_key)
+        if analysis is None or analysis.signature != signature:
+            analysis = PositionAnalysis(self, color, signature)
+            if len(self._analysis_cache) >= CONSEQUENCE_CACHE_SIZE:
+                self._analysis_cache.clear()
+            self._analysis_cache[cache_key] = analysis
+        return analysis
+
+    def _get_move_consequences(self, start_pos, end_pos, piece, color):
+        """
+        Builds the consequence packet for one move in a single pass over
+        the attack tables. Instead of playing the move, every query runs
+        against the post-move occupancy (start square vacated, end square
+        filled), with the moving piece masked out of its old square.
+        Like the original simulation, only the moving piece is relocated:
+        the castling Rook, an en passant victim and a promotion are ignored.
+        """
+        board = self.board
+        squares = board.squares
         opponent_color = 'black' if color == 'white' else 'white'
+        start_sq = square_index(start_pos)
+        end_sq = square_index(end_pos)
+        start_bit, end_bit = 1 << start_sq, 1 << end_sq
+        occupied = (board.occupied & ~start_bit) | end_bit
+        opponents = board.occupancy[opponent_color] & ~end_bit
+        own = (board.occupancy[color] & ~start_bit) | end_bit
+        piece_type = piece.piece_type
 
-        # Use the new tuple generator to get all legal moves
-        for start_pos, end_pos, piece in self._get_all_legal_moves_tuples(color):
-            
-            move_notation = f"{self.pos_to_notation(start_pos)}-{self.pos_to_notation(end_pos)}"
-            
-            # --- Define the packet structure ---
-            captured_piece_on_square = self.board.get_piece(end_pos)
-            packet = {
-                "move": move_notation,
-                "moving_piece": {
-                    "name": piece.name,
-                    "value": piece.value,
-                    "previous_move_count": piece.move_count # Add tempo data
-                },
-                "captured_piece": None,
-                "consequences": [],
-                "retaliation": [], # For the 2-ply check
-                "defenders": [], # For the defense check
-                "creates_pin": None, # For offensive pin check
-                "is_fork": False # For offensive fork check
-            }
-
-            # --- Simulate Move ---
-            original_piece_has_moved = piece.has_moved # Store pre-move state
-            original_move_count = piece.move_count # Store pre-move state
-            
-            self.board.set_piece(end_pos, piece)
-            self.board.set_piece(start_pos, None)
-            piece.has_moved = True # Temporarily set
-            piece.move_count += 1 # Temporarily set
-            
-            # --- Analyze Consequences of the *simulated* board state ---
-            
-            # 1. Was it a capture?
-            if captured_piece_on_square:
-                packet["consequences"].append(f"Captures {captured_piece_on_square.name} on {self.pos_to_notation(end_pos)}")
-                packet["captured_piece"] = {"name": captured_piece_on_square.name, "value": captured_piece_on_square.value}
-            
-            # 2. Does the moved piece now attack anything?
-            attacked_high_value_pieces = []
-            for attack_pos in piece.get_attack_squares(self.board):
-                target = self.board.get_piece(attack_pos)
-                if target and target.color == opponent_color:
-                    packet["consequences"].append(f"Attacks {target.name} on {self.pos_to_notation(attack_pos)}")
-                    # Track high-value attacks for fork detection
-                    if target.value >= 3: # Knight, Bishop, Rook, Queen
-                        attacked_high_value_pieces.append(target)
-            
-            # 2a. Check for Forks
-            if len(attacked_high_value_pieces) >= 2:
-                packet["is_fork"] = True
-                
-            # 3. Does this move deliver check?
-            is_check = self.is_in_check(opponent_color)
-            if is_check:
+        # --- Define the packet structure ---
+        captured_piece_on_square = squares[end_sq]
+        packet = {
+            "move": f"{self.pos_to_notation(start_pos)}-{self.pos_to_notation(end_pos)}",
+            "moving_piece": {
+                "name": piece.name,
+                "value": piece.value,
+                "previous_move_count": piece.move_count # Add tempo data
+            },
+            "captured_piece": None,
+            "consequences": [],
+            "retaliation": [], # For the 2-ply check
+            "defenders": [], # For the defense check
+            "creates_pin": None, # For offensive pin check
+            "is_fork": False, # For offensive fork check
+            "see": board.static_exchange(start_sq, end_sq) # Net material after all trades on end_pos
+        }
+
+        # 1. Was it a capture?
+        if captured_piece_on_square:
+            packet["consequences"].append(f"Captures {captured_piece_on_square.name} on {self.pos_to_notation(end_pos)}")
+            packet["captured_piece"] = {"name": captured_piece_on_square.name, "value": captured_piece_on_square.value}
+
+        # 2. Does the moved piece now attack anything? (Same order as get_attack_squares)
+        if piece_type in SLIDER_DIRECTIONS:
+            # A ray can only ever hit one enemy piece: its first blocker
+            attacked_squares = [first for direction in SLIDER_DIRECTIONS[piece_type]
+                                for first in iter_bits(ray_attacks(direction, end_sq, occupied) & opponents)]
+        else:
+            if piece_type == KNIGHT:
+                targets = KNIGHT_TARGETS[end_sq]
+            elif piece_type == KING:
+                targets = KING_TARGETS[end_sq]
+            else:
+                targets = PAWN_TARGETS[color][end_sq]
+            attacked_squares = [r * 8 + c for r, c in targets if (opponents >> (r * 8 + c)) & 1]
+        high_value_attacks = 0
+        for target_sq in attacked_squares:
+            target = squares[target_sq]
+            packet["consequences"].append(f"Attacks {target.name} on {self.pos_to_notation(index_to_pos(target_sq))}")
+            if target.value >= 3: # Knight, Bishop, Rook, Queen (and King)
+                high_value_attacks += 1
+
+        # 3. Does this move deliver check (directly or by discovery)?
+        king_bb = board.pieces_bb(opponent_color, KING) & ~end_bit # A captured King gives no check
+        if king_bb:
+            king_sq = king_bb.bit_length() - 1
+            gives_direct_check = (piece_attacks_bb(piece_type, color, end_sq, occupied) >> king_sq) & 1
+            if gives_direct_check or board.attackers_to(king_sq, color, occupied) & ~start_bit:
                 packet["consequences"].append("Delivers check!")
-                # Check if the check is *also* a high-value attack (a fork)
-                king_pos = self.board.find_king(opponent_color)
-                # Avoid double-counting if king is already in the list
-                if king_pos and king_pos not in [p.position for p in attacked_high_value_pieces]:
-                    attacked_high_value_pieces.append(self.board.get_piece(king_pos))
-            
-            # Re-check for forks including the King
-            if len(attacked_high_value_pieces) >= 2:
-                packet["is_fork"] = True
-                
-            # 4. Retaliation Check
-            # Is the square the piece *landed on* attacked by the opponent?
-            if self.is_square_attacked(end_pos, opponent_color):
-                # Find all pieces that are attacking that square
-                for r in range(8):
-                    for c in range(8):
-                        attacker_piece = self.board.get_piece((r, c))
-                        if attacker_piece and attacker_piece.color == opponent_color:
-                            if end_pos in attacker_piece.get_attack_squares(self.board):
-                                packet["retaliation"].append({
-                                    "name": attacker_piece.name,
-                                    "value": attacker_piece.value,
-                                    "position": self.pos_to_notation((r,c))
-                                })
-
-            # 4b. Defender Check
-            # Is the square the piece *landed on* defended by its *own* team?
-            for r in range(8):
-                for c in range(8):
-                    defender_piece = self.board.get_piece((r, c))
-                    # Check if it's a friendly piece AND *not* the piece that just moved
-                    if defender_piece and defender_piece.color == color and defender_piece.position != end_pos:
-                        if end_pos in defender_piece.get_attack_squares(self.board):
-                            packet["defenders"].append({
-                                "name": defender_piece.name,
-                                "value": defender_piece.value,
-                                "position": self.pos_to_notation((r,c))
-                            })
-
-            # 5. Check if this move *creates* a pin (Offensive Pin)
-            if hasattr(piece, 'directions'): # Only sliding pieces can pin
-                for dr, dc in piece.directions:
-                    # Scan along this direction from the piece's new position
-                    first_opponent_piece = None
-                    for i in range(1, 8):
-                        scan_pos = (end_pos[0] + i * dr, end_pos[1] + i * dc)
-                        
-                        if not (0 <= scan_pos[0] < 8 and 0 <= scan_pos[1] < 8):
-                            break # Off board
-                            
-                        scanned_piece = self.board.get_piece(scan_pos)
-                        
-                        if scanned_piece:
-                            if scanned_piece.color == opponent_color:
-                                if not first_opponent_piece:
-                                    first_opponent_piece = scanned_piece
-                                else:
-                                    # This is the *second* opponent piece on the line
-                                    # We have created a pin!
-                                    packet["creates_pin"] = {
-                                        "pinned_piece": {
-                                            "name": first_opponent_piece.name,
-                                            "position": self.pos_to_notation(first_opponent_piece.position),
-                                            "value": first_opponent_piece.value
-                                        },
-                                        "pinned_to_piece": {
-                                            "name": scanned_piece.name,
-                                            "position": self.pos_to_notation(scanned_piece.position),
-                                            "value": scanned_piece.value
-                                        }
-                                    }
-                                    break # Pin found, stop scanning this line
-                            else:
-                                # Hit a friendly piece, blocks the pin
-                                break
-                    if packet["creates_pin"]:
-                        break # Pin found, stop checking directions
-
-            # --- Undo Move ---
-            self.board.set_piece(start_pos, piece)
-            self.board.set_piece(end_pos, captured_piece_on_square)
-            piece.has_moved = original_piece_has_moved # Restore
-            piece.move_count = original_move_count # Restore
-            
-            # --- Store Result ---
-            if not packet["consequences"]:
-                packet["consequences"].append("Positional move")
-                
-            enhanced_moves_list.append(packet)
-            
-        return enhanced_moves_list
+                # A check is a high-value attack too, unless already counted
+                if not gives_direct_check:
+                    high_value_attacks += 1
+
+        # 3a. Check for Forks
+        if high_value_attacks >= 2:
+            packet["is_fork"] = True
+
+        # 4. Retaliation Check
+        # Is the square the piece *landed on* attacked by the opponent?
+        for attacker_sq in iter_bits(board.attackers_to(end_sq, opponent_color, occupied)):
+            attacker_piece = squares[attacker_sq]
+            packet["retaliation"].append({
+                "name": attacker_piece.name,
+                "value": attacker_piece.value,
+                "position": self.pos_to_notation(index_to_pos(attacker_sq))
+            })
+
+        # 4b. Defender Check
+        # Is the square the piece *landed on* defended by its *own* team?
+        for defender_sq in iter_bits(board.attackers_to(end_sq, color, occupied) & ~start_bit):
+            defender_piece = squares[defender_sq]
+            packet["defenders"].append({
+                "name": defender_piece.name,
+                "value": defender_piece.value,
+                "position": self.pos_to_notation(index_to_pos(defender_sq))
+            })
+
+        # 5. Check if this move *creates* a pin (Offensive Pin)
+        # An enemy piece is pinned when the next piece behind it on the ray is also an enemy.
+        for direction in SLIDER_DIRECTIONS.get(piece_type, ()):
+            blockers = RAY_MASKS[direction][end_sq] & occupied
+            if not blockers:
+                continue
+            first = _first_blocker(direction, blockers)
+            if (own >> first) & 1:
+                continue # Hit a friendly piece, blocks the pin
+            rest = blockers & ~(1 << first)
+            if not rest:
+                continue
+            second = _first_blocker(direction, rest)
+            if (opponents >> second) & 1:
+                pinned_piece = squares[first]
+                pinned_to_piece = squares[second]
+                packet["creates_pin"] = {
+                    "pinned_piece": {
+                        "name": pinned_piece.name,
+                        "position": self.pos_to_notation(index_to_pos(first)),
+                        "value": pinned_piece.value
+                    },
+                    "pinned_to_piece": {
+                        "name": pinned_to_piece.name,
+                        "position": self.pos_to_notation(index_to_pos(second)),
+                        "value": pinned_to_piece.value
+                    }
+                }
+                break # Pin found, stop checking directions
+
+        if not packet["consequences"]:
+            packet["consequences"].append("Positional move")
+        return packet
 
 
     def _notation_to_pos_tuple(self, notation):
@@ -806,27 +1365,148 @@ class ChessGame:
         return (8 - int(rank), files.index(notation[0]))
 
     def store_pre_move_state(self):
-        """Saves the game state before a move for the 'take back' feature."""
-        self._pre_move_state = {
-            'board': copy.deepcopy(self.board), 'turn': self.turn,
-            'status_message': self.status_message, 'move_history': list(self.move_history),
-            'promotion_pending': self.promotion_pending, 'en_passant_target': self.en_passant_target,
-            'position_history': dict(self.position_history), 'game_data': list(self.game_data)
-        }
+        """
+        Marks the current position for the 'take back' feature.
+        Only the undo-stack depth is saved; no copy of the board is made.
+        """
+        self._pre_move_state = len(self._undo_stack)
         
     def revert_to_pre_move_state(self):
-        """Restores the game state from the saved pre-move state."""
-        if self._pre_move_state:
-            for key, value in self._pre_move_state.items():
-                setattr(self, key, value)
-            self._pre_move_state = None
-            return True
-        return False
+        """Unmakes every move made since store_pre_move_state."""
+        if self._pre_move_state is None:
+            return False
+        if self.promotion_pending:
+            self._cancel_promotion()
+        while len(self._undo_stack) > self._pre_move_state:
+            self.unmake_move()
+        self._pre_move_state = None
+        return True
         
     def clear_pre_move_state(self):
         """Clears the pre-move state, "finalizing" the move."""
         self._pre_move_state = None
 
+    def _push_move(self, start_pos, end_pos, promotion_class=None):
+        """
+        Plays a move on the board (castling, en passant and promotion
+        included) and updates turn, en passant, castling rights and the
+        position hash. No validation, history or status is touched, so
+        this plus _pop_move is the cheap make/unmake pair for search code.
+        Returns the undo record it pushed onto the undo stack.
+        """
+        board = self.board
+        piece = board.get_piece(start_pos)
+        undo = {
+            'start': start_pos, 'end': end_pos, 'piece': piece,
+            'has_moved': piece.has_moved, 'move_count': piece.move_count,
+            'captured': None, 'captured_pos': None, # captured_pos is only set for en passant
+            'rook': None, # (rook, rook_start, rook_end, has_moved, move_count) when castling
+            'en_passant_target': self.en_passant_target, 'castling_rights': self.castling_rights,
+            'position_hash': self.position_hash, 'turn': self.turn,
+            'halfmove_clock': self.halfmove_clock, 'fullmove_number': self.fullmove_number,
+        }
+
+        if isinstance(piece, King) and abs(start_pos[1] - end_pos[1]) == 2:
+            is_kingside = end_pos[1] > start_pos[1]
+            rook_start = (start_pos[0], 7 if is_kingside else 0)
+            rook_end = (start_pos[0], 5 if is_kingside else 3)
+            rook = board.get_piece(rook_start)
+            undo['rook'] = (rook, rook_start, rook_end, rook.has_moved, rook.move_count)
+            board.move_piece(start_pos, end_pos) # Move King
+            board.move_piece(rook_start, rook_end) # Move Rook
+        elif promotion_class:
+            undo['captured'] = board.get_piece(end_pos)
+            board.set_piece(start_pos, None)
+            board.set_piece(end_pos, promotion_class(piece.color, end_pos))
+        elif isinstance(piece, Pawn) and end_pos == self.en_passant_target and start_pos[1] != end_pos[1]:
+            captured_pawn_pos = (start_pos[0], end_pos[1])
+            undo['captured'] = board.get_piece(captured_pawn_pos)
+            undo['captured_pos'] = captured_pawn_pos
+            board.set_piece(captured_pawn_pos, None) # Remove captured pawn
+            board.move_piece(start_pos, end_pos) # Move attacking pawn
+        else:
+            undo['captured'] = board.move_piece(start_pos, end_pos)
+
+        # Set new en passant target if this was a 2-step pawn move
+        self.en_passant_target = ((start_pos[0] + end_pos[0]) // 2, start_pos[1]) if isinstance(piece, Pawn) and abs(start_pos[0] - end_pos[0]) == 2 else None
+        self._update_castling_rights(start_pos, end_pos)
+        self.halfmove_clock = 0 if isinstance(piece, Pawn) or undo['captured'] else self.halfmove_clock + 1
+        if self.turn == 'black':
+            self.fullmove_number += 1
+        self.turn = 'black' if self.turn == 'white' else 'white'
+        self._update_position_hash()
+        self._undo_stack.append(undo)
+        return undo
+
+    def _pop_move(self):
+        """Reverses the last _push_move exactly. Returns its undo record."""
+        undo = self._undo_stack.pop()
+        board = self.board
+        piece = undo['piece']
+        start_pos, end_pos = undo['start'], undo['end']
+
+        if undo['rook']:
+            rook, rook_start, rook_end, rook_has_moved, rook_move_count = undo['rook']
+            board.set_piece(rook_start, rook)
+            board.set_piece(rook_end, None)
+            rook.has_moved, rook.move_count = rook_has_moved, rook_move_count
+        board.set_piece(start_pos, piece)
+        if undo['captured_pos']:
+            board.set_piece(end_pos, None)
+            board.set_piece(undo['captured_pos'], undo['captured'])
+        else:
+            board.set_piece(end_pos, undo['captured'])
+        piece.has_moved, piece.move_count = undo['has_moved'], undo['move_count']
+
+        self.en_passant_target = undo['en_passant_target']
+        self.castling_rights = undo['castling_rights']
+        self.turn = undo['turn']
+        self.position_hash = undo['position_hash']
+        self.halfmove_clock, self.fullmove_number = undo['halfmove_clock'], undo['fullmove_number']
+        return undo
+
+    def _finish_move(self, undo, status_message_before):
+        """
+        Shared tail of make_move/promote_pawn: remembers what unmake_move
+        needs to roll back, then records repetition and game status.
+        """
+        undo['status_message'] = status_message_before
+        undo['game_over'] = self.game_over
+        self._record_position()
+        self._update_game_status()
+
+    def unmake_move(self):
+        """
+        Takes back the last move made with make_move/promote_pawn
+        (or cancels a pending promotion). Can be called repeatedly.
+        Returns False when there is nothing to take back.
+        """
+        if self.promotion_pending:
+            self._cancel_promotion()
+            return True
+        if not self._undo_stack:
+            return False
+
+        # The position being left was counted once for repetition tracking
+        count = self.position_history.get(self.position_hash, 0) - 1
+        if count > 0:
+            self.position_history[self.position_hash] = count
+        else:
+            self.position_history.pop(self.position_hash, None)
+
+        undo = self._pop_move()
+        del self.move_history[undo['move_history_len']:]
+        del self.game_data[undo['game_data_len']:]
+        self.status_message = undo['status_message']
+        self.game_over = undo['game_over']
+        return True
+
+    def _cancel_promotion(self):
+        """Drops a pending promotion; the pawn never left its square."""
+        self.promotion_pending = None
+        self.status_message = self._status_before_promotion
+        self._status_before_promotion = None
+
     def make_move(self, start_pos, end_pos):
         """
         Attempts to make a move on the board.
@@ -851,50 +1531,33 @@ class ChessGame:
                  
         if self.move_puts_king_in_check(start_pos, end_pos): return False, "Cannot move into check."
         
-        # --- Handle Castling ---
-        if isinstance(piece, King) and abs(start_pos[1] - end_pos[1]) == 2:
-            is_kingside = end_pos[1] > start_pos[1]
-            rook_start = (start_pos[0], 7 if is_kingside else 0)
-            rook_end = (start_pos[0], 5 if is_kingside else 3)
-            self.board.move_piece(start_pos, end_pos) # Move King
-            self.board.move_piece(rook_start, rook_end) # Move Rook
-            self.move_history.append("O-O" if is_kingside else "O-O-O")
+        # --- Check for promotion (finished by promote_pawn) ---
+        if isinstance(piece, Pawn) and end_pos[0] in [0, 7]:
+            captured_piece = self.board.get_piece(end_pos)
+            self.promotion_pending = (start_pos, end_pos, captured_piece, piece)
+            self._status_before_promotion = self.status_message
+            self.status_message = f"{self.turn.capitalize()} to promote pawn."
+            return True, "Promotion" # Special status for UI
+        
+        status_message_before = self.status_message
+        undo = self._push_move(start_pos, end_pos)
+        undo['move_history_len'] = len(self.move_history)
+        undo['game_data_len'] = len(self.game_data)
+        
+        if undo['rook']:
+            # --- Castling ---
+            self.move_history.append("O-O" if end_pos[1] > start_pos[1] else "O-O-O")
             self._record_move_data(piece, start_pos, end_pos, None)
         else:
-            # --- Handle Standard Moves ---
-            
-            # Check for promotion
-            if isinstance(piece, Pawn) and end_pos[0] in [0, 7]:
-                captured_piece = self.board.get_piece(end_pos)
-                self.promotion_pending = (start_pos, end_pos, captured_piece, piece)
-                self.status_message = f"{self.turn.capitalize()} to promote pawn."
-                return True, "Promotion" # Special status for UI
-            
-            # Check for en passant
-            is_en_passant = isinstance(piece, Pawn) and end_pos == self.en_passant_target
-            captured_piece = None
-            
-            if is_en_passant:
-                pawn_dir = -1 if piece.color == 'white' else 1
-                captured_pawn_pos = (end_pos[0] - pawn_dir, end_pos[1])
-                captured_piece = self.board.get_piece(captured_pawn_pos)
-                self.board.set_piece(captured_pawn_pos, None) # Remove captured pawn
-                self.board.move_piece(start_pos, end_pos) # Move attacking pawn
-            else:
-                captured_piece = self.board.move_piece(start_pos, end_pos) # Standard move
-            
-            # Set new en passant target if this was a 2-step pawn move
-            self.en_passant_target = ((start_pos[0] + end_pos[0]) // 2, start_pos[1]) if isinstance(piece, Pawn) and abs(start_pos[0] - end_pos[0]) == 2 else None
-            
+            # --- Standard Moves (including en passant) ---
+            captured_piece = undo['captured']
             move_notation = f"{piece.symbol} {self.pos_to_notation(start_pos)}-{self.pos_to_notation(end_pos)}"
             if captured_piece: move_notation += f" (captures {captured_piece.symbol})"
             self.move_history.append(move_notation)
             self._record_move_data(piece, start_pos, end_pos, captured_piece)
 
         # --- Post-Move Updates ---
-        self.turn = 'black' if self.turn == 'white' else 'white'
-        self._record_position()
-        self._update_game_status()
+        self._finish_move(undo, status_message_before)
         return True, self.status_message
 
     def promote_pawn(self, piece_choice_str):
@@ -904,10 +1567,10 @@ class ChessGame:
         start_pos, end_pos, captured_piece, original_pawn = self.promotion_pending
         
         piece_map = {'Queen': Queen, 'Rook': Rook, 'Bishop': Bishop, 'Knight': Knight}
-        new_piece = piece_map[piece_choice_str](self.turn, end_pos) # Use self.turn (which is still pre-switch)
-        
-        self.board.set_piece(start_pos, None)
-        self.board.set_piece(end_pos, new_piece)
+        undo = self._push_move(start_pos, end_pos, promotion_class=piece_map[piece_choice_str])
+        undo['move_history_len'] = len(self.move_history)
+        undo['game_data_len'] = len(self.game_data)
+        new_piece = self.board.get_piece(end_pos)
         
         self.promotion_pending = None
         self.move_history.append(f"{self.pos_to_notation(end_pos)}={new_piece.symbol}")
@@ -915,17 +1578,16 @@ class ChessGame:
         # Record the move data *after* all pieces are in place
         self._record_move_data(original_pawn, start_pos, end_pos, captured_piece, promoted_into=piece_choice_str)
         
-        # Now, switch turns and update status
-        self.turn = 'black' if self.turn == 'white' else 'white'
-        self._record_position()
-        self._update_game_status()
+        # Turn was switched by _push_move; now update status
+        self._finish_move(undo, self._status_before_promotion)
+        self._status_before_promotion = None
         return True, "Pawn promoted."
 
     def is_in_check(self, color):
         """Checks if the king of the given color is in check."""
-        king_pos = self.board.find_king(color)
-        if not king_pos: return False # Should not happen
-        return self.is_square_attacked(king_pos, 'black' if color == 'white' else 'white')
+        king_sq = self.board.king_square[color]
+        if king_sq is None: return False # Should not happen
+        return self.board.attack_counts['black' if color == 'white' else 'white'][king_sq] > 0
 
     def move_puts_king_in_check(self, start_pos, end_pos):
         """
@@ -937,6 +1599,13 @@ class ChessGame:
         original_has_moved = original_piece.has_moved
         original_move_count = original_piece.move_count # Store move count
         
+        # An en passant capture also removes the pawn beside the start square
+        en_passant_pos = None
+        if isinstance(original_piece, Pawn) and end_pos == self.en_passant_target and start_pos[1] != end_pos[1]:
+            en_passant_pos = (start_pos[0], end_pos[1])
+            en_passant_pawn = self.board.get_piece(en_passant_pos)
+            self.board.set_piece(en_passant_pos, None)
+        
         # Simulate move
         self.board.set_piece(end_pos, original_piece)
         self.board.set_piece(start_pos, None)
@@ -946,6 +1615,8 @@ class ChessGame:
         # Undo move
         self.board.set_piece(start_pos, original_piece)
         self.board.set_piece(end_pos, captured_piece)
+        if en_passant_pos:
+            self.board.set_piece(en_passant_pos, en_passant_pawn)
         original_piece.has_moved = original_has_moved # Restore has_moved state
         original_piece.move_count = original_move_count # Restore move count
         
@@ -1,25 +1,44 @@
 import json
 import chess_llm_functions as llm_api
+import llm_runtime
+import prompt_payloads
+import triage_engine
+
+# Run the "Offense-First" triage as local rules instead of the Pro-model tool
+USE_LOCAL_TRIAGE = True
 
 
 # --- 1. POST-MOVE COACH AGENT ("Offense-First" Pipeline) ---
 
-def get_coaching_packet(last_move_data, dangers_before_json, options_before_json, user_skill_level, player_color):
+async def get_coaching_packet_async(last_move_data, analysis_before, user_skill_level, player_color, dangers_after=None,
+                                    on_text=None):
     """
     This is the main "brain" of the post-move Coach Agent.
     It orchestrates the "Triage -> Converse" pipeline to implement the
     "Offense-First" logic.
+
+    `analysis_before` is the PositionAnalysis of the position the human
+    moved from (their "Dangers List" and "Options List"); `dangers_after`
+    is their Dangers List after the move, used to tell whether a threat
+    was actually solved. `on_text` receives the coach's message as it
+    streams in.
     """
     print("[COACH AGENT] Human move detected.")
+    chosen_move = (last_move_data.get("move_notation"),)
+    dangers_before_json = prompt_payloads.dangers_payload(analysis_before)
     
-    # --- STEP 1: Call the "Triage" tool (The "Brain") ---
-    # This tool implements the "Offense-First" logic.
-    print("[COACH AGENT] Calling Triage Analyst Tool...")
-    triage_verdict_json = llm_api.call_triage_analyst_tool(
-        json.dumps(last_move_data), 
-        dangers_before_json, 
-        options_before_json
-    )
+    # --- STEP 1: Run the "Triage" (The "Brain") ---
+    # This implements the "Offense-First" logic.
+    if USE_LOCAL_TRIAGE:
+        print("[COACH AGENT] Running local Offense-First triage...")
+        triage_verdict_json = triage_engine.triage_move(last_move_data, analysis_before, dangers_after)
+    else:
+        print("[COACH AGENT] Calling Triage Analyst Tool...")
+        triage_verdict_json = await llm_api.call_triage_analyst_tool_async(
+            json.dumps(last_move_data), 
+            dangers_before_json, 
+            prompt_payloads.options_payload(analysis_before, "triage_analyst", keep=chosen_move) # Just the chosen move
+        )
     
     if not triage_verdict_json:
         print("[COACH AGENT] Triage Analyst Tool failed. Aborting.")
@@ -30,13 +49,14 @@ def get_coaching_packet(last_move_data, dangers_before_json, options_before_json
     # --- STEP 2: Call the "Conversationalist" tool (The "Mouth") ---
     # This tool translates the cold verdict into a human-like response.
     print(f"[COACH AGENT] Calling Conversationalist Tool...")
-    instruction_packet = llm_api.call_conversational_coach_tool(
+    instruction_packet = await llm_api.call_conversational_coach_tool_async(
         json.dumps(triage_verdict_json), 
         json.dumps(last_move_data),  # <-- Pass the move data
         dangers_before_json,        # <-- Pass the dangers context
-        options_before_json,        # <-- Pass the options context
+        prompt_payloads.options_payload(analysis_before, "conversational_coach", keep=chosen_move), # <-- Pass the options context
         user_skill_level, 
-        player_color
+        player_color,
+        on_text=on_text
     )
     
     if not instruction_packet:
@@ -49,37 +69,38 @@ def get_coaching_packet(last_move_data, dangers_before_json, options_before_json
     return instruction_packet
 
 # --- 2. Q&A CHAT AGENT ("Router" Pipeline) ---
-def get_qa_response(user_query, game_context_json):
+async def get_qa_response_async(user_query, game_context_json, on_text=None):
     """
     This is the main orchestrator for the Q&A chat.
     It uses a "Router -> Specialist" pipeline to understand the
-    user's *intent* and provide a smart answer.
+    user's *intent* and provide a smart answer. `on_text` receives
+    the specialist's commentary as it streams in.
     """
     print("[COACH Q&A AGENT] New user query received.")
     
     try:
         # --- STEP 1: Call the Q&A Router Tool ---
         print("[COACH Q&A AGENT] Calling Q&A Router...")
-        router_decision = llm_api.call_qa_router_tool(user_query, game_context_json)
+        router_decision = await llm_api.call_qa_router_tool_async(user_query, game_context_json)
         tool_choice = router_decision.get("tool_choice", "general_chit_chat")
         print(f"[COACH Q&A AGENT] Router chose tool: '{tool_choice}'")
 
         # --- STEP 2: Call the chosen Specialist Tool ---
         if tool_choice == "explain_last_move":
             print("[COACH Q&A AGENT] Calling 'Explain Last Move' specialist...")
-            response_packet = llm_api.call_qa_explain_last_move_tool(user_query, game_context_json)
+            response_packet = await llm_api.call_qa_explain_last_move_tool_async(user_query, game_context_json, on_text)
         
         elif tool_choice == "analyze_board":
             print("[COACH Q&A AGENT] Calling 'Analyze Board' specialist...")
-            response_packet = llm_api.call_qa_analyze_board_tool(user_query, game_context_json)
+            response_packet = await llm_api.call_qa_analyze_board_tool_async(user_query, game_context_json, on_text)
         
         elif tool_choice == "explain_concept":
             print("[COACH Q&A AGENT] Calling 'Explain Concept' specialist...")
-            response_packet = llm_api.call_qa_explain_concept_tool(user_query, game_context_json)
+            response_packet = await llm_api.call_qa_explain_concept_tool_async(user_query, game_context_json, on_text)
         
         else: # "general_chit_chat"
             print("[COACH Q&A AGENT] Calling 'Chit-Chat' specialist...")
-            response_packet = llm_api.call_qa_chit_chat_tool(user_query, game_context_json)
+            response_packet = await llm_api.call_qa_chit_chat_tool_async(user_query, game_context_json, on_text)
         
         return response_packet
 
@@ -90,18 +111,32 @@ def get_qa_response(user_query, game_context_json):
 
 # --- 3. POST-GAME SUMMARY ---
 
-def get_post_game_summary(game_data_json, player_color):
+async def get_post_game_summary_async(game_data_json, player_color, on_text=None):
     """
     Orchestrator for calling the post-game summary tool.
-    (This function is unchanged)
+    `on_text` receives the summary as it streams in.
     """
     print("[COACH AGENT] Game over detected. Calling Post-Game Analyst Tool...")
     
-    summary_packet = llm_api.call_post_game_analyst_tool(game_data_json, player_color)
+    summary_packet = await llm_api.call_post_game_analyst_tool_async(game_data_json, player_color, on_text)
     
     if not summary_packet:
         print("[COACH AGENT] Post-Game Analyst Tool failed.")
         return {"message": "Good game! I wasn't able to generate a summary this time."}
 
     print("[COACH AGENT] Post-Game summary packet received.")
-    return summary_packet
\ No newline at end of file
+    return summary_packet
+
+
+# --- Blocking Wrappers ---
+# Run the async pipelines above on llm_runtime's shared event loop.
+
+def get_coaching_packet(last_move_data, analysis_before, user_skill_level, player_color, dangers_after=None):
+    return llm_runtime.run(get_coaching_packet_async(
+        last_move_data, analysis_before, user_skill_level, player_color, dangers_after))
+
+def get_qa_response(user_query, game_context_json):
+    return llm_runtime.run(get_qa_response_async(user_query, game_context_json))
+
+def get_post_game_summary(game_data_json, player_color):
+    return llm_runtime.run(get_post_game_summary_async(game_data_json, player_color))
@@ -0,0 +1,124 @@
+"""
+Parsing of the JSON replies of the LLM tools.
+
+The tools answer with a small JSON object such as
+{"response_type": "praise", "message": "..."}.
+
+- `extract_json` parses a complete reply, tolerating code fences, prose
+  around the object and trailing commas (the fallback when structured
+  output is off or not honoured).
+- JsonFieldExtractor pulls one string field out of a *streamed* reply:
+  feed it each chunk and it returns the newly decoded characters of that
+  field, so the user-facing text (`message` / `commentary`) can be shown
+  while it is still being generated. Code fences, other keys and the
+  field's position in the object do not matter.
+"""
+import json
+import re
+
+SIMPLE_ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+TRAILING_COMMA_PATTERN = re.compile(r",\s*([}\]])")
+
+def _balanced_object(text, start):
+    """The text of the {...} object starting at `start` (braces inside strings ignored), or None."""
+    depth, in_string, escaped = 0, False, False
+    for pos in range(start, len(text)):
+        char = text[pos]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == '{':
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth == 0:
+                return text[start:pos + 1]
+    return None
+
+def extract_json(text):
+    """
+    Parses the JSON object in a tool reply. Tries the whole reply first
+    (the structured-output case), then each balanced {...} in it, also
+    with trailing commas removed. Raises ValueError when nothing parses.
+    """
+    text = text.strip()
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+    start = text.find('{')
+    while start != -1:
+        candidate = _balanced_object(text, start)
+        if candidate is None:
+            break
+        for attempt in (candidate, TRAILING_COMMA_PATTERN.sub(r"\1", candidate)):
+            try:
+                return json.loads(attempt)
+            except ValueError:
+                pass
+        start = text.find('{', start + 1)
+    raise ValueError(f"No JSON object found in reply: {text[:80]!r}")
+
+class JsonFieldExtractor:
+    """Decodes the value of the string field `field` as chunks arrive."""
+    def __init__(self, field):
+        self._start_pattern = re.compile(r'"' + re.escape(field) + r'"\s*:\s*"')
+        self._buffer = ""
+        self._pos = None # Index in the buffer of the next undecoded value character
+        self.done = False # The closing quote has been seen
+        self.text = "" # Everything decoded so far
+
+    def feed(self, chunk):
+        """Adds a chunk of the raw reply; returns the newly decoded text ('' if none)."""
+        self._buffer += chunk
+        if self.done:
+            return ""
+        if self._pos is None:
+            match = self._start_pattern.search(self._buffer)
+            if not match:
+                return ""
+            self._pos = match.end()
+
+        decoded = []
+        buffer, pos = self._buffer, self._pos
+        while pos < len(buffer):
+            char = buffer[pos]
+            if char == '"':
+                self.done = True
+                pos += 1
+                break
+            if char != '\\':
+                decoded.append(char)
+                pos += 1
+                continue
+            # Escape sequence: wait for the rest of it if the chunk split it
+            if pos + 1 >= len(buffer):
+                break
+            escape = buffer[pos + 1]
+            if escape == 'u':
+                if pos + 6 > len(buffer):
+                    break
+                code = int(buffer[pos + 2:pos + 6], 16)
+                if 0xD800 <= code < 0xDC00: # High surrogate: needs its low half
+                    if pos + 12 > len(buffer):
+                        break
+                    if buffer[pos + 6:pos + 8] == '\\u':
+                        low = int(buffer[pos + 8:pos + 12], 16)
+                        decoded.append(chr(0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)))
+                        pos += 12
+                        continue
+                decoded.append(chr(code))
+                pos += 6
+            else:
+                decoded.append(SIMPLE_ESCAPES.get(escape, escape))
+                pos += 2
+        self._pos = pos
+        new_text = "".join(decoded)
+        self.text += new_text
+        return new_text
@@ -0,0 +1,133 @@
+"""
+Response cache shared by every tool in chess_llm_functions.
+
+The same opening positions, skill levels and common replies come up again
+and again, and every tool's answer depends only on its prompt inputs. A
+response is stored under its tool name, model, prompt-template version and
+a canonical hash of those inputs, in an in-memory LRU (size- and
+TTL-bounded) with an optional SQLite tier that survives restarts.
+
+Configured from the environment:
+    LLM_CACHE=0             disable caching
+    LLM_CACHE_SIZE=1024     in-memory entries
+    LLM_CACHE_TTL=21600     seconds an entry stays valid
+    LLM_CACHE_DB=path.db    enable the SQLite tier
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_TTL_SECONDS = 6 * 60 * 60
+# Input fields that differ between games without changing the answer
+VOLATILE_KEYS = frozenset({"game_id"})
+
+def _canonical(value):
+    """Parses JSON strings and drops volatile keys, so equal inputs hash equally."""
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            return value
+    if isinstance(value, dict):
+        return {k: _canonical(v) for k, v in value.items() if k not in VOLATILE_KEYS}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    return value
+
+def make_key(tool, model_name, prompt_version, inputs):
+    """Builds the cache key for one tool call."""
+    payload = json.dumps(_canonical(inputs), sort_keys=True, separators=(",", ":"), default=str)
+    digest = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    return f"{tool}:{model_name}:v{prompt_version}:{digest}"
+
+class ResponseCache:
+    """
+    LRU + TTL cache of parsed tool responses (JSON-serializable dicts),
+    with an optional SQLite tier. Thread-safe; every `get` returns a fresh
+    copy so callers may modify it.
+    """
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl_seconds=DEFAULT_TTL_SECONDS, db_path=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict() # key -> (expires_at, value JSON)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value TEXT, expires_at REAL)")
+            self._db.commit()
+
+    def get(self, key):
+        """Returns the cached response for `key`, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return json.loads(entry[1])
+                del self._entries[key] # Expired
+            if self._db is not None:
+                row = self._db.execute("SELECT value, expires_at FROM responses WHERE key = ?", (key,)).fetchone()
+                if row is not None and row[1] > now:
+                    self._remember(key, row[1], row[0])
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return json.loads(row[0])
+            self.misses += 1
+            return None
+
+    def set(self, key, value):
+        """Stores a response (a JSON-serializable dict)."""
+        expires_at = time.time() + self.ttl_seconds
+        value_json = json.dumps(value)
+        with self._lock:
+            self._remember(key, expires_at, value_json)
+            if self._db is not None:
+                self._db.execute("INSERT OR REPLACE INTO responses (key, value, expires_at) VALUES (?, ?, ?)",
+                                 (key, value_json, expires_at))
+                self._db.commit()
+
+    def _remember(self, key, expires_at, value_json):
+        self._entries[key] = (expires_at, value_json)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        """Empties both tiers and resets the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.disk_hits = self.misses = 0
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+    def stats(self):
+        """Hit/miss counters for logging and the UI."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+# --- Shared Instance ---
+CACHE_ENABLED = os.environ.get("LLM_CACHE", "1") != "0"
+response_cache = ResponseCache(
+    max_entries=int(os.environ.get("LLM_CACHE_SIZE", DEFAULT_MAX_ENTRIES)),
+    ttl_seconds=float(os.environ.get("LLM_CACHE_TTL", DEFAULT_TTL_SECONDS)),
+    db_path=os.environ.get("LLM_CACHE_DB") or None,
+)
@@ -0,0 +1,92 @@
+"""
+One long-lived asyncio event loop per process for the LLM agents.
+
+Every tool in chess_llm_functions is a coroutine (`call_*_async`) built on
+`generate_content_async`, and the agents have async orchestrators, so the
+Coach, Opponent and Q&A pipelines can overlap their calls on one loop
+instead of each move spinning up its own threads. The loop runs on a
+daemon thread; synchronous code (the Streamlit script, the ponderer)
+hands it coroutines with `run`/`gather`, or `TextStream` to read a
+coach reply while it is streamed. CPU-bound work (the search
+engine) goes to a shared thread pool via `run_blocking` so it never stalls
+the loop.
+"""
+import asyncio
+import functools
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+BLOCKING_WORKERS = 4 # Threads for CPU-bound work called from coroutines
+
+_loop = None
+_loop_thread = None
+_loop_lock = threading.Lock()
+_blocking_pool = ThreadPoolExecutor(max_workers=BLOCKING_WORKERS, thread_name_prefix="llm-blocking")
+
+def get_loop():
+    """Returns the shared event loop, starting its thread on first use."""
+    global _loop, _loop_thread
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            _loop.set_default_executor(_blocking_pool)
+            _loop_thread = threading.Thread(target=_loop.run_forever, name="llm-event-loop", daemon=True)
+            _loop_thread.start()
+            print("[LLM RUNTIME] Started the shared event loop.")
+        return _loop
+
+def submit(coroutine):
+    """Schedules a coroutine on the shared loop; returns a concurrent.futures.Future."""
+    return asyncio.run_coroutine_threadsafe(coroutine, get_loop())
+
+def run(coroutine):
+    """Runs a coroutine on the shared loop and blocks until it returns."""
+    if threading.current_thread() is _loop_thread:
+        coroutine.close()
+        raise RuntimeError("llm_runtime.run() called from the event loop; await the coroutine instead.")
+    return submit(coroutine).result()
+
+async def gather_async(*coroutines):
+    """Awaits several coroutines concurrently; returns their results in order."""
+    return await asyncio.gather(*coroutines)
+
+def gather(*coroutines):
+    """Runs several coroutines concurrently on the shared loop; returns their results in order."""
+    return run(gather_async(*coroutines))
+
+async def run_blocking(function, *args, **kwargs):
+    """Awaits a blocking call (e.g. the engine search) on the shared thread pool."""
+    return await asyncio.get_running_loop().run_in_executor(
+        _blocking_pool, functools.partial(function, *args, **kwargs))
+
+class TextStream:
+    """
+    Runs `make_coroutine(on_text)` on the shared loop and iterates over the
+    text pieces it passes to `on_text`, as they arrive, from the calling
+    thread (e.g. into `st.write_stream`). After iteration, `result` holds
+    the coroutine's return value.
+    """
+    _DONE = object()
+
+    def __init__(self, make_coroutine):
+        self._pieces = queue.Queue()
+        self._finished = False
+        self.result = None
+        self._future = submit(make_coroutine(self._pieces.put))
+        self._future.add_done_callback(lambda _: self._pieces.put(self._DONE))
+
+    def __iter__(self):
+        while not self._finished:
+            piece = self._pieces.get()
+            if piece is self._DONE:
+                self._finished = True
+                self.result = self._future.result()
+                break
+            yield piece
+
+    def wait(self):
+        """Drains any remaining text and returns the coroutine's result."""
+        for _ in self:
+            pass
+        return self.result
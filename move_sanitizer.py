@@ -0,0 +1,89 @@
+"""
+Local repair of malformed move strings from the LLM tools.
+
+The opponent tools must answer with our "e2-e4" notation, but they often
+answer in SAN ("Nf3", "Qxd5+"), run the squares together ("g1f3"), add
+punctuation or prefix the piece ("Qd4-c5"). Those are matched here against
+the legal moves' consequence packets; the LLM sanitizer is only needed when
+no single legal move fits.
+"""
+import re
+
+SQUARE_PATTERN = re.compile(r"[a-h][1-8]")
+# Move numbers ("12." or "12...") and annotation/decoration characters
+MOVE_NUMBER_PATTERN = re.compile(r"^\d+\.+\s*")
+STRIP_CHARACTERS = "\"'`.,;:!?+#()[]{}* \t\n"
+CASTLING_PATTERN = re.compile(r"^[o0](-?[o0]){1,2}$")
+
+PIECE_LETTERS = {'n': 'knight', 'b': 'bishop', 'r': 'rook', 'q': 'queen', 'k': 'king'}
+
+def _piece_kind(piece_name):
+    """Maps a packet piece name ('K_knight', 'e_pawn', 'Queen') to its kind."""
+    name = piece_name.lower()
+    for kind in ('pawn', 'knight', 'bishop', 'rook', 'queen', 'king'):
+        if kind in name:
+            return kind
+    return None
+
+def _clean(raw_move):
+    move = str(raw_move).strip().strip(STRIP_CHARACTERS)
+    move = MOVE_NUMBER_PATTERN.sub("", move)
+    move = re.sub(r"(?<=[1-8])=?[QRBNqrbn]$", "", move) # Promotion suffix
+    move = re.sub(r"e\.?p\.?$", "", move) # En passant suffix
+    return move.strip(STRIP_CHARACTERS).replace(" ", "")
+
+def _match_castling(move, enhanced_moves):
+    """O-O / 0-0-0 style castling: a King moving two files."""
+    queenside = sum(char in "o0" for char in move.lower()) == 3
+    for packet in enhanced_moves:
+        if _piece_kind(packet["moving_piece"]["name"]) != 'king':
+            continue
+        start, end = packet["move"].split("-")
+        file_delta = ord(end[0]) - ord(start[0])
+        if abs(file_delta) == 2 and (file_delta < 0) == queenside:
+            return packet["move"]
+    return None
+
+def sanitize_move(raw_move, enhanced_moves):
+    """
+    Returns the one legal move ("e2-e4") that `raw_move` describes, or
+    None when it matches no legal move or more than one.
+    `enhanced_moves` is the PositionAnalysis Options List.
+    """
+    if not raw_move:
+        return None
+    legal = {packet["move"]: packet for packet in enhanced_moves}
+    move = _clean(raw_move)
+    if not move:
+        return None
+
+    if CASTLING_PATTERN.match(move.lower()):
+        return _match_castling(move, enhanced_moves)
+
+    squares = SQUARE_PATTERN.findall(move.lower())
+
+    # Long algebraic: "g1-f3", "g1f3", "Ng1-f3", "Qd4xc5"
+    if len(squares) >= 2:
+        candidate = f"{squares[-2]}-{squares[-1]}"
+        return candidate if candidate in legal else None
+    if len(squares) != 1:
+        return None
+
+    # Standard algebraic: piece letter, optional disambiguation, destination
+    destination = squares[0]
+    prefix = move[:move.lower().rindex(destination)].replace("x", "").replace("X", "").replace("-", "").replace(":", "")
+    kind = 'pawn'
+    if prefix and (prefix[0] in "KQRBN" or prefix[0] in "kqrn"):
+        kind = PIECE_LETTERS[prefix[0].lower()]
+        prefix = prefix[1:]
+    disambiguation = prefix.lower()
+
+    candidates = []
+    for notation, packet in legal.items():
+        start, end = notation.split("-")
+        if end != destination or _piece_kind(packet["moving_piece"]["name"]) != kind:
+            continue
+        if any(char not in start for char in disambiguation):
+            continue # "exd5" (pawn from the e-file), "Nbd7", "R1e2"
+        candidates.append(notation)
+    return candidates[0] if len(candidates) == 1 else None
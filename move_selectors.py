@@ -0,0 +1,160 @@
+"""
+Local "human" and "blunder" opponent personalities.
+
+Both LLM specialists choose a move from the consequence packets using
+written heuristics (Good Tempo, avoid Hanging Pieces, ignore a crisis...).
+Here the same heuristics score every packet directly, using the SEE field
+for material, and a move is sampled from the scores. `strength` (0..1)
+sets how reliably the top-scored move is played: at 1.0 it almost always
+is, lower values spread the choice over the other candidates.
+"""
+import math
+import random
+
+KING_VALUE = 1000 # Matches King.value in chess_logic
+SELECTOR_SEED = None # Set an int for reproducible move choices
+DEFAULT_STRENGTH = {"human": 0.85, "blunder": 0.8}
+MIN_TEMPERATURE, MAX_TEMPERATURE = 0.05, 1.0 # Softmax temperature at strength 1.0 and 0.0
+
+_selector_rng = random.Random(SELECTOR_SEED)
+
+def seed_selectors(seed):
+    """Re-seeds the local selectors (None = unpredictable)."""
+    _selector_rng.seed(seed)
+
+def _urgent_threats(tactical_threats):
+    """Dangers worth reacting to: checks, pieces a cheaper piece attacks, pins onto bigger pieces."""
+    urgent = []
+    for threat in tactical_threats:
+        threatened = threat["threatened_piece"]
+        lowest_attacker = min(a["value"] for a in threat["attacking_pieces"])
+        pinned_to = threat.get("pinned_to_piece")
+        if (threatened["value"] >= KING_VALUE or lowest_attacker < threatened["value"]
+                or (threat.get("is_pin") and pinned_to and pinned_to["value"] > threatened["value"] > 1)):
+            urgent.append(threat)
+    return urgent
+
+def _display_name(piece_name):
+    """'K_knight' -> 'Knight', 'e_pawn' -> 'Pawn', for the reasoning text."""
+    return piece_name.split("_")[-1].capitalize()
+
+def _move_facts(packet):
+    start, end = packet["move"].split("-")
+    piece = packet["moving_piece"]
+    return {
+        "start": start,
+        "end": end,
+        "piece": piece,
+        "see": packet.get("see", 0),
+        "is_castle": piece["value"] >= KING_VALUE and abs(ord(end[0]) - ord(start[0])) == 2,
+        "is_quiet": packet["consequences"] == ["Positional move"],
+        "gives_check": "Delivers check!" in packet["consequences"],
+    }
+
+def _addresses_threat(facts, threat):
+    """Moves the threatened (or pinned-to) piece, or captures an attacker."""
+    if facts["start"] == threat["threatened_piece"]["position"]:
+        return True
+    if any(facts["end"] == a["position"] for a in threat["attacking_pieces"]):
+        return True
+    pinned_to = threat.get("pinned_to_piece")
+    return bool(pinned_to and facts["start"] == pinned_to["position"])
+
+def score_human_move(packet, urgent_threats):
+    """Scores a move as a solid club player would see it. Returns (score, reasoning)."""
+    facts = _move_facts(packet)
+    piece, see = facts["piece"], facts["see"]
+    score = see # Material after all trades on the landing square
+    reasoning = f"Moving my {_display_name(piece['name'])} to {facts['end']} looks solid and safe."
+
+    if see < 0:
+        score -= 2 # Never leave a piece hanging on purpose
+        reasoning = f"I moved my {_display_name(piece['name'])} to {facts['end']}, hoping it holds."
+    elif packet["captured_piece"]:
+        reasoning = f"Capturing the {_display_name(packet['captured_piece']['name'])} on {facts['end']} is a safe trade."
+    elif packet["is_fork"]:
+        score += 1.0
+        reasoning = f"My {_display_name(piece['name'])} on {facts['end']} attacks two pieces at once!"
+    elif packet["creates_pin"]:
+        score += 0.5
+        reasoning = f"This pins the {_display_name(packet['creates_pin']['pinned_piece']['name'])}."
+    elif facts["is_castle"]:
+        score += 0.8
+        reasoning = "Castling to get my King to safety and bring my Rook into the game."
+    elif piece["previous_move_count"] == 0 and 3 <= piece["value"] <= 5:
+        score += 0.5
+        reasoning = f"Developing my {_display_name(piece['name'])} to {facts['end']}, a solid 'Good Tempo' move."
+    elif facts["is_quiet"] and piece["previous_move_count"] > 0:
+        score -= 0.3 # Bad Tempo
+    if piece["value"] >= KING_VALUE and not facts["is_castle"] and not urgent_threats:
+        score -= 0.5 # Keep the King home when nothing is wrong
+    if facts["gives_check"] and see >= 0:
+        score += 0.3
+
+    for threat in urgent_threats:
+        if see >= 0 and _addresses_threat(facts, threat):
+            threatened = threat["threatened_piece"]
+            score += min(threatened["value"], 10)
+            reasoning = (f"My {_display_name(threatened['name'])} on {threatened['position']} was in trouble, "
+                         f"so I played {packet['move']} to deal with it.")
+            break
+    return score, reasoning
+
+def score_blunder_move(packet, urgent_threats):
+    """Scores how instructive a mistake the move is for a beginner. Returns (score, reasoning)."""
+    facts = _move_facts(packet)
+    piece, see = facts["piece"], facts["see"]
+    score = 0.0
+    reasoning = f"Moving my {_display_name(piece['name'])} to {facts['end']} seems fine to me."
+
+    if urgent_threats:
+        # Priority 1: ignore the crisis with a harmless-looking move
+        threat = max(urgent_threats, key=lambda t: t["threatened_piece"]["value"])
+        threatened = threat["threatened_piece"]
+        if threatened["value"] < KING_VALUE and not any(_addresses_threat(facts, t) for t in urgent_threats):
+            score += 2.0 + (0.5 if facts["is_quiet"] else 0)
+            reasoning = (f"Just playing {packet['move']}. (I didn't notice my {_display_name(threatened['name'])} "
+                         f"on {threatened['position']} was under attack!)")
+    elif see < 0:
+        # Priority 2: a Hanging Piece or Bad Trade, preferably not the Queen
+        score += 1.5 + 0.2 * min(-see, 5)
+        reasoning = (f"My {_display_name(piece['name'])} looks active on {facts['end']}! "
+                     f"(I didn't see it can be captured there...)")
+    elif facts["is_quiet"] and piece["previous_move_count"] > 0:
+        # Priority 3: Bad Tempo
+        score += 1.0
+        reasoning = f"I'll just shuffle my {_display_name(piece['name'])} to {facts['end']}. (Not developing anything new...)"
+
+    if see > 0:
+        score -= 1.5 # Winning material is not a teaching blunder
+    if facts["gives_check"]:
+        score -= 0.5
+    return score, reasoning
+
+SCORERS = {"human": score_human_move, "blunder": score_blunder_move}
+
+def rank_moves(analysis, personality="human"):
+    """Returns [(score, reasoning, packet)] for every legal move, highest score first."""
+    scorer = SCORERS[personality]
+    urgent = _urgent_threats(analysis.tactical_threats)
+    ranked = [scorer(packet, urgent) + (packet,) for packet in analysis.enhanced_moves]
+    ranked.sort(key=lambda item: item[0], reverse=True)
+    return ranked
+
+def select_move(analysis, personality, strength=None):
+    """
+    Picks a move for the "human" or "blunder" personality from the
+    PositionAnalysis Options List. Returns {"move", "reasoning", "score"}
+    or None when there are no legal moves.
+    """
+    if not analysis.enhanced_moves:
+        return None
+    if strength is None:
+        strength = DEFAULT_STRENGTH.get(personality, 0.8)
+    strength = min(max(strength, 0.0), 1.0)
+    ranked = rank_moves(analysis, personality)
+    temperature = MIN_TEMPERATURE + (MAX_TEMPERATURE - MIN_TEMPERATURE) * (1 - strength)
+    best_score = ranked[0][0]
+    weights = [math.exp((score - best_score) / temperature) for score, _, _ in ranked]
+    score, reasoning, packet = _selector_rng.choices(ranked, weights=weights)[0]
+    return {"move": packet["move"], "reasoning": reasoning, "score": round(score, 2)}
@@ -0,0 +1,119 @@
+"""
+Pondering: precompute the opponent's replies while the human is thinking.
+
+While the app waits in the `playing` phase, a background worker predicts
+the human's most likely moves (ranked by the "human" selector over their
+consequence map), plays each on a game rebuilt from the FEN and runs the
+Opponent Agent on the result. Replies are keyed by the Zobrist hash of the
+position after the human's move, so when the human plays a predicted move
+the app can take the reply instead of starting the agent from nothing.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import ai_opponent_agent
+import move_selectors
+from chess_logic import ChessGame
+
+PONDER_MOVES = 3 # How many predicted human moves to precompute replies for
+PONDER_WORKERS = 1 # Background threads; the engine is CPU-bound, so keep this small
+
+class Ponderer:
+    """
+    One per session. Call `start` whenever it is the human's turn (it is a
+    no-op if that position is already being pondered) and `take` with the
+    position hash after the human's move to collect a precomputed reply.
+    """
+    def __init__(self, max_moves=PONDER_MOVES, max_workers=PONDER_WORKERS):
+        self.max_moves = max_moves
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ponder")
+        self._lock = threading.Lock()
+        self._root = None # (position hash, skill level) being pondered
+        self._replies = {} # Position hash after the human's move -> Future of the AI packet
+
+    def start(self, game, human_color, user_skill_level):
+        """Starts pondering the human's turn in `game` (a snapshot is taken now)."""
+        root = (game.position_hash, user_skill_level)
+        with self._lock:
+            if self._root == root or game.game_over or game.turn != human_color:
+                return
+            self._cancel_pending()
+            self._root = root
+
+        ranked = move_selectors.rank_moves(game.get_position_analysis(human_color), "human")
+        predictions = [packet["move"] for _, _, packet in ranked[:self.max_moves]]
+        print(f"[PONDER] Predicting human replies {predictions}, precomputing opponent answers...")
+        # The app keeps mutating the live game, so each reply gets its own
+        # game rebuilt from the FEN (a deepcopy of a long game costs ~50x more)
+        fen = game.get_fen()
+        for move in predictions:
+            snapshot = ChessGame(fen)
+            snapshot.position_history = dict(game.position_history) # Repetitions count for the engine
+            start_pos = snapshot._notation_to_pos_tuple(move.split('-')[0])
+            end_pos = snapshot._notation_to_pos_tuple(move.split('-')[1])
+            snapshot.make_move(start_pos, end_pos)
+            if snapshot.promotion_pending:
+                snapshot.promote_pawn("Queen")
+            if snapshot.game_over:
+                continue
+            future = self._executor.submit(self._ponder_reply, snapshot, move, user_skill_level)
+            with self._lock:
+                if self._root != root:
+                    future.cancel() # A newer position arrived meanwhile
+                    return
+                self._replies[snapshot.position_hash] = future
+
+    def _ponder_reply(self, snapshot, human_move, user_skill_level):
+        print(f"[PONDER] Precomputing reply to {human_move}...")
+        analysis = snapshot.get_position_analysis(snapshot.turn)
+        return ai_opponent_agent.get_ai_move(analysis, user_skill_level, game=snapshot)
+
+    def take(self, position_hash, user_skill_level):
+        """
+        Returns the precomputed AI packet for the position after the
+        human's move, waiting for it if it is already being computed.
+        Returns None for a position that was not predicted (or whose
+        work had not started yet), so the caller computes it normally.
+        """
+        with self._lock:
+            if self._root is None or self._root[1] != user_skill_level:
+                return None
+            future = self._replies.pop(position_hash, None)
+            self._cancel_pending()
+            self._root = None
+        if future is None:
+            print("[PONDER] Miss: the human's move was not predicted.")
+            return None
+        if future.cancel() or future.cancelled():
+            print("[PONDER] Miss: the predicted reply had not started yet.")
+            return None
+        try:
+            packet = future.result()
+        except Exception as e:
+            print(f"!!! CRITICAL: Pondering error: {e}")
+            return None
+        print(f"[PONDER] Hit: using the precomputed reply {packet.get('move') if packet else None}.")
+        return packet
+
+    def has_reply(self, position_hash, user_skill_level):
+        """True if a reply for this position is ready or already being computed."""
+        with self._lock:
+            future = self._replies.get(position_hash)
+            return (future is not None and (future.running() or future.done())
+                    and self._root is not None and self._root[1] == user_skill_level)
+
+    def reset(self):
+        """Forgets the current position's work (new game, take-back...)."""
+        with self._lock:
+            self._cancel_pending()
+            self._root = None
+
+    def shutdown(self):
+        self.reset()
+        self._executor.shutdown(wait=False)
+
+    def _cancel_pending(self):
+        """Drops every stored reply; queued work is cancelled, running work is discarded."""
+        for future in self._replies.values():
+            future.cancel()
+        self._replies.clear()
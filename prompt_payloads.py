@@ -0,0 +1,213 @@
+"""
+Compact, relevance-pruned prompt payloads and prompt token accounting.
+
+`json.dumps` of the full "Options List" is 30-50 verbose packets (10+ KB)
+per prompt. The builders here write the same facts in a compact wire
+schema: short keys, no indentation, empty/false fields left out, and
+pieces written in move notation ("Nf3" = the Knight on f3) instead of
+{"name", "value", "position"} objects. Moves are ranked by tactical
+relevance and only the top-K that fit the tool's token budget are sent,
+plus a few quiet moves for the tools that choose between ordinary moves.
+Prompts that embed these payloads include WIRE_LEGEND so the model can
+map the short keys back to the names used in CORE_CHESS_DEFINITIONS.
+"""
+import json
+import threading
+
+KING_VALUE = 1000 # Matches King.value in chess_logic
+CHARS_PER_TOKEN = 4 # Rough estimate used for budgets and accounting
+COMPACT_PAYLOADS = True # False sends the full verbose JSON (for comparison/debugging)
+
+# Most moves sent per tool, best-ranked first (None = every legal move)
+TOP_K = {
+    "triage_analyst": 1, # Only needs the chosen move's packet
+    "best_move": 20,
+    "human_move": 16,
+    "teaching_blunder": 16,
+    "conversational_coach": 8,
+    "qa_analyze_board": 12,
+}
+DEFAULT_TOP_K = 16
+# Token budget for each tool's Options List payload; lower-ranked moves
+# are dropped until it fits
+TOKEN_BUDGETS = {
+    "triage_analyst": 300,
+    "best_move": 1200,
+    "human_move": 900,
+    "teaching_blunder": 900,
+    "conversational_coach": 500,
+    "qa_analyze_board": 700,
+}
+DEFAULT_TOKEN_BUDGET = 800
+# Quiet moves always sent to these tools, whatever their relevance: the
+# human tool needs ordinary alternatives and the blunder tool's "Bad Tempo"
+# fallback needs moves of already-developed pieces, which rank last
+QUIET_MOVES = {
+    "human_move": 3,
+    "teaching_blunder": 4,
+}
+
+WIRE_LEGEND = (
+    "Compact keys: mv=move, pc=moving piece, k=its previous_move_count, x=captured_piece, "
+    "c=consequences, r=retaliation (enemy pieces that can capture on the landing square), "
+    "d=defenders, pin=creates_pin (pinned piece>piece behind it), fork=is_fork, see=see. "
+    "In the DANGERS list: t=threatened_piece, by=attacking_pieces, pin=pinned_to_piece. "
+    "Pieces are letter+square (K,Q,R,B,N,P; 'Nf3' = Knight on f3); values are the standard "
+    "Piece Values. Missing keys are empty, null, false or 0."
+)
+
+PIECE_LETTERS = {"pawn": "P", "knight": "N", "bishop": "B", "rook": "R", "queen": "Q", "king": "K"}
+
+def _letter(piece_name):
+    """'K_knight' -> 'N', 'e_pawn' -> 'P', 'Queen' -> 'Q'."""
+    name = piece_name.lower()
+    for kind, letter in PIECE_LETTERS.items():
+        if kind in name:
+            return letter
+    return "?"
+
+def _piece(piece):
+    """{"name": "K_knight", "position": "f3", ...} -> "Nf3" (just "N" when there is no position)."""
+    return _letter(piece["name"]) + piece.get("position", "")
+
+# --- Compact Wire Schema ---
+
+def compact_move(packet):
+    """One consequence packet in the compact wire schema."""
+    start, end = packet["move"].split("-")
+    wire = {"mv": packet["move"], "pc": _letter(packet["moving_piece"]["name"]) + start}
+    if packet["moving_piece"]["previous_move_count"]:
+        wire["k"] = packet["moving_piece"]["previous_move_count"]
+    if packet["captured_piece"]:
+        wire["x"] = _letter(packet["captured_piece"]["name"]) + end
+    consequences = [c for c in packet["consequences"] if c != "Positional move"]
+    if consequences:
+        wire["c"] = consequences
+    if packet["retaliation"]:
+        wire["r"] = [_piece(p) for p in packet["retaliation"]]
+    if packet["defenders"]:
+        wire["d"] = [_piece(p) for p in packet["defenders"]]
+    pin = packet["creates_pin"]
+    if pin:
+        wire["pin"] = f"{_piece(pin['pinned_piece'])}>{_piece(pin['pinned_to_piece'])}"
+    if packet["is_fork"]:
+        wire["fork"] = 1
+    if packet.get("see"):
+        wire["see"] = packet["see"]
+    return wire
+
+def compact_threat(threat):
+    """One Dangers List entry in the compact wire schema."""
+    wire = {"t": _piece(threat["threatened_piece"]), "by": [_piece(a) for a in threat["attacking_pieces"]]}
+    if threat.get("is_pin") and threat.get("pinned_to_piece"):
+        wire["pin"] = _piece(threat["pinned_to_piece"])
+    return wire
+
+def _dumps(value):
+    return json.dumps(value, separators=(",", ":"))
+
+# --- Relevance Pruning ---
+
+def relevance(packet, tactical_threats):
+    """How tactically interesting a move is; higher-scoring moves are kept first."""
+    start, end = packet["move"].split("-")
+    piece = packet["moving_piece"]
+    see = packet.get("see", 0)
+    score = 0.0
+    if "Delivers check!" in packet["consequences"]:
+        score += 5
+    if packet["captured_piece"]:
+        score += 4 + min(packet["captured_piece"]["value"], 10) / 10
+    if packet["is_fork"]:
+        score += 4
+    pin = packet["creates_pin"]
+    if pin:
+        score += 3 if pin["pinned_piece"]["value"] > 1 else 0.5 # Pawn pins barely matter
+    if see > 0:
+        score += 3 + min(see, 9) / 10 # Wins material
+    elif see < 0:
+        score += 1.5 # Hangs material: worth showing (the blunder tool looks for these)
+    for threat in tactical_threats:
+        if start == threat["threatened_piece"]["position"] or any(end == a["position"] for a in threat["attacking_pieces"]):
+            score += 4 # Deals with a danger
+            break
+    if piece["value"] >= KING_VALUE and abs(ord(end[0]) - ord(start[0])) == 2:
+        score += 3 # Castling
+    elif piece["previous_move_count"] == 0 and 3 <= piece["value"] <= 5:
+        score += 1 # Development
+    if packet["retaliation"]:
+        score += 0.5
+    score += 0.25 * sum(c.startswith("Attacks") for c in packet["consequences"])
+    return score
+
+def _quiet_moves(packets, count):
+    """Up to `count` quiet, non-King moves, moves of already-developed pieces first."""
+    quiet = [p for p in packets if p["consequences"] == ["Positional move"]
+             and p["moving_piece"]["value"] < KING_VALUE and p.get("see", 0) >= 0]
+    quiet.sort(key=lambda p: p["moving_piece"]["previous_move_count"] == 0) # Stable: board order otherwise
+    return quiet[:count]
+
+def _fit(items, budget_tokens):
+    """Drops items from the end until their compact JSON fits the token budget (keeps at least one)."""
+    while len(items) > 1 and estimate_tokens(_dumps(items)) > budget_tokens:
+        items = items[:-1]
+    return items
+
+def options_payload(analysis, tool, keep=()):
+    """
+    The Options List for `tool`'s prompt: compact packets of the top-K most
+    relevant moves that fit TOKEN_BUDGETS[tool]. Moves in `keep` are always
+    sent first and QUIET_MOVES[tool] quiet moves last. Returns a JSON string.
+    """
+    if not COMPACT_PAYLOADS:
+        return analysis.enhanced_moves_json
+    threats = analysis.tactical_threats
+    kept = [p for p in analysis.enhanced_moves if p["move"] in keep]
+    others = [p for p in analysis.enhanced_moves if p["move"] not in keep]
+    quiet = _quiet_moves(others, QUIET_MOVES.get(tool, 0))
+    others = [p for p in others if p not in quiet]
+    others.sort(key=lambda p: relevance(p, threats), reverse=True) # Stable: ties keep board order
+    top_k = TOP_K.get(tool, DEFAULT_TOP_K)
+    ranked = kept + (others if top_k is None else others[:max(top_k - len(kept) - len(quiet), 0)])
+    quiet_moves = [compact_move(p) for p in quiet]
+    budget = TOKEN_BUDGETS.get(tool, DEFAULT_TOKEN_BUDGET) - estimate_tokens(_dumps(quiet_moves))
+    moves = _fit([compact_move(p) for p in ranked], budget) + quiet_moves
+    if len(moves) < len(analysis.enhanced_moves):
+        print(f"[PAYLOAD] {tool}: sending {len(moves)} of {len(analysis.enhanced_moves)} moves.")
+    return _dumps(moves)
+
+def move_payload(analysis, move):
+    """A single move's packet (e.g. the move being triaged or explained), or "null"."""
+    packet = next((p for p in analysis.enhanced_moves if p["move"] == move), None)
+    if packet is None:
+        return "null"
+    return _dumps(compact_move(packet)) if COMPACT_PAYLOADS else json.dumps(packet)
+
+def dangers_payload(analysis):
+    """The Dangers List as a JSON string."""
+    if not COMPACT_PAYLOADS:
+        return analysis.tactical_threats_json
+    return _dumps([compact_threat(t) for t in analysis.tactical_threats])
+
+# --- Token Accounting ---
+
+def estimate_tokens(text):
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+_token_lock = threading.Lock()
+_token_totals = {} # tool -> {"calls", "prompt_tokens"}
+
+def record_prompt(tool, prompt):
+    """Counts one tool call's prompt tokens; returns the estimate."""
+    tokens = estimate_tokens(prompt)
+    with _token_lock:
+        totals = _token_totals.setdefault(tool, {"calls": 0, "prompt_tokens": 0})
+        totals["calls"] += 1
+        totals["prompt_tokens"] += tokens
+    print(f"[PAYLOAD] {tool}: ~{tokens} prompt tokens.")
+    return tokens
+
+def token_stats():
+    """Per-tool call counts and estimated prompt tokens so far."""
+    with _token_lock:
+        return {tool: dict(totals) for tool, totals in _token_totals.items()}
@@ -0,0 +1,74 @@
+"""
+Response schemas for the LLM tools (structured output).
+
+Each tool's reply shape is declared once here. chess_llm_functions sends
+the schema with the request (`response_mime_type="application/json"` plus
+`response_schema`), so Gemini is constrained to valid JSON of that shape,
+and `validate` checks every reply (including cached ones and replies
+recovered by the tolerant extractor) before it reaches an agent.
+Schemas use the Gemini/OpenAPI subset: OBJECT/STRING types, `enum`,
+`required`.
+"""
+
+def _object(required=None, **properties):
+    return {
+        "type": "OBJECT",
+        "properties": properties,
+        "required": list(properties) if required is None else required,
+    }
+
+def _string(*enum):
+    return {"type": "STRING", "enum": list(enum)} if enum else {"type": "STRING"}
+
+_MOVE_WITH_REASONING = _object(move=_string(), reasoning=_string())
+_COMMENTARY = _object(commentary=_string())
+
+RESPONSE_SCHEMAS = {
+    "move_sanitizer": _object(move=_string()),
+    "triage_analyst": _object(
+        required=["verdict", "justification"],
+        verdict=_string("brilliant", "good", "acknowledgment", "teaching", "blunder"),
+        focus=_string(),
+        justification=_string(),
+    ),
+    "conversational_coach": _object(
+        response_type=_string("praise", "intervention", "encouragement"),
+        message=_string(),
+    ),
+    "qa_router": _object(
+        tool_choice=_string("explain_last_move", "analyze_board", "explain_concept", "general_chit_chat"),
+    ),
+    "qa_explain_last_move": _COMMENTARY,
+    "qa_analyze_board": _COMMENTARY,
+    "qa_explain_concept": _COMMENTARY,
+    "qa_chit_chat": _COMMENTARY,
+    "post_game_analyst": _object(message=_string()),
+    "opponent_router": _object(tool_choice=_string("best", "human", "blunder"), reasoning=_string()),
+    "best_move": _MOVE_WITH_REASONING,
+    "best_move_reasoning": _object(reasoning=_string()),
+    "personality_reasoning": _object(reasoning=_string()),
+    "human_move": _MOVE_WITH_REASONING,
+    "teaching_blunder": _MOVE_WITH_REASONING,
+}
+
+class SchemaError(ValueError):
+    """A tool reply that does not match its schema."""
+
+def validate(reply, schema, path="reply"):
+    """Returns `reply` if it matches `schema`; raises SchemaError otherwise."""
+    expected = schema["type"]
+    if expected == "OBJECT":
+        if not isinstance(reply, dict):
+            raise SchemaError(f"{path} should be an object, got {type(reply).__name__}")
+        for key in schema.get("required", ()):
+            if key not in reply:
+                raise SchemaError(f"{path} is missing '{key}'")
+        for key, subschema in schema.get("properties", {}).items():
+            if key in reply:
+                validate(reply[key], subschema, f"{path}.{key}")
+    elif expected == "STRING":
+        if not isinstance(reply, str):
+            raise SchemaError(f"{path} should be a string, got {type(reply).__name__}")
+        if "enum" in schema and reply not in schema["enum"]:
+            raise SchemaError(f"{path} should be one of {schema['enum']}, got '{reply}'")
+    return reply
@@ -0,0 +1,29 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from chess_logic import ChessGame
+import triage_engine
+
+def _play(game, *moves):
+    for move in moves:
+        start, end = move.split("-")
+        game.make_move(game._notation_to_pos_tuple(start), game._notation_to_pos_tuple(end))
+
+def _triage(game, move):
+    analysis_before = game.get_position_analysis(game.turn)
+    _play(game, move)
+    return triage_engine.triage_move(game.game_data[-1], analysis_before)
+
+def test_developing_a_knight_is_good_tempo():
+    game = ChessGame()
+    _play(game, "e2-e4", "e7-e5")
+    assert _triage(game, "g1-f3")["focus"] == "good_tempo"
+
+def test_early_king_walk_is_not_good_tempo():
+    game = ChessGame()
+    _play(game, "e2-e4", "e7-e5")
+    verdict = _triage(game, "e1-e2")
+    assert verdict["focus"] != "good_tempo"
+    assert verdict["verdict"] != "brilliant"
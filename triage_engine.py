@@ -0,0 +1,144 @@
+"""
+The Coach's "Offense-First" triage as plain rules.
+
+The Triage Analyst prompt is a fixed decision procedure over fields the
+rules engine already computes (checkmate, is_fork, creates_pin,
+captured_piece, retaliation, see). Running it in Python gives the same
+{"verdict", "focus", "justification"} packet without a Pro round-trip;
+the Conversationalist still turns it into Coach Joey's words.
+"""
+
+KING_VALUE = 1000 # Matches King.value in chess_logic
+OPENING_PLIES = 20 # Moves up to here (both colors counted) are "Early Game"
+
+def _verdict(verdict, focus, justification):
+    return {"verdict": verdict, "focus": focus, "justification": justification}
+
+def _is_urgent(threat):
+    """
+    An "Urgent Crisis" from the Dangers List: a check, a piece that a
+    lower-value attacker can win, or a pin onto a more valuable piece.
+    (The Dangers List has no defenders, so an equal-value attack on an
+    undefended piece is not detected here.)
+    """
+    threatened = threat["threatened_piece"]
+    if threatened["value"] >= KING_VALUE:
+        return True
+    lowest_attacker = min(a["value"] for a in threat["attacking_pieces"])
+    if lowest_attacker < threatened["value"]:
+        return True
+    pinned_to = threat.get("pinned_to_piece")
+    return bool(threat.get("is_pin") and pinned_to and threatened["value"] > 1
+                and pinned_to["value"] > threatened["value"])
+
+def _describe_threat(threat):
+    threatened = threat["threatened_piece"]
+    if threatened["value"] >= KING_VALUE:
+        return f"the King on {threatened['position']} was in check"
+    attackers = ", ".join(f"{a['name']} on {a['position']}" for a in threat["attacking_pieces"])
+    if threat.get("is_pin") and threat.get("pinned_to_piece"):
+        pinned_to = threat["pinned_to_piece"]
+        return (f"the {threatened['name']} on {threatened['position']} was pinned to the "
+                f"{pinned_to['name']} on {pinned_to['position']} by the {attackers}")
+    return f"the {threatened['name']} on {threatened['position']} was attacked by the {attackers}"
+
+def _solves_threat(threat, chosen, dangers_after):
+    """
+    Did the move deal with the threat? With the Dangers List of the
+    position after the move this is exact; without it, only moving the
+    piece away, capturing an attacker or moving the pinned-to piece count.
+    """
+    name = threat["threatened_piece"]["name"]
+    if dangers_after is not None:
+        return not any(t["threatened_piece"]["name"] == name and _is_urgent(t) for t in dangers_after)
+    if chosen.get("see", 0) < 0:
+        return False
+    start, end = chosen["move"].split("-")
+    if start == threat["threatened_piece"]["position"]:
+        return True
+    if any(end == a["position"] for a in threat["attacking_pieces"]):
+        return True
+    pinned_to = threat.get("pinned_to_piece")
+    return bool(pinned_to and start == pinned_to["position"])
+
+def triage_move(last_move_data, analysis_before, dangers_after=None):
+    """
+    Runs the "Offense-First" logic on the move just played.
+
+    `last_move_data` is the game_data record of the move, `analysis_before`
+    the PositionAnalysis of the position it was played from, and
+    `dangers_after` (optional) the mover's Dangers List after the move.
+    Returns {"verdict": brilliant|good|acknowledgment|teaching|blunder,
+    "focus": ..., "justification": ...}.
+    """
+    move_notation = last_move_data.get("move_notation")
+    chosen = next((m for m in analysis_before.enhanced_moves if m["move"] == move_notation), None)
+    if chosen is None:
+        return _verdict("acknowledgment", "unknown_move",
+                        f"The move {move_notation} was not in the OPTIONS_LIST, so it could not be analyzed.")
+
+    piece = chosen["moving_piece"]
+    captured = chosen["captured_piece"]
+    see = chosen.get("see", 0)
+
+    # --- Step 1: Offensive forcing moves and captures ---
+    if last_move_data.get("checkmate"):
+        return _verdict("brilliant", "checkmate", f"{move_notation} delivered checkmate.")
+    if chosen["is_fork"] and see >= 0:
+        targets = [c for c in chosen["consequences"] if c.startswith("Attacks") or c == "Delivers check!"]
+        return _verdict("brilliant", "fork",
+                        f"{move_notation} was a safe fork by the {piece['name']}: {'; '.join(targets)}.")
+    pin = chosen["creates_pin"]
+    if (pin and see >= 0 and pin["pinned_piece"]["value"] > 1 # Pawns are not counted as pinned
+            and pin["pinned_to_piece"]["value"] > pin["pinned_piece"]["value"]):
+        return _verdict("brilliant", "pin",
+                        f"{move_notation} safely pinned the {pin['pinned_piece']['name']} on "
+                        f"{pin['pinned_piece']['position']} to the {pin['pinned_to_piece']['name']} on "
+                        f"{pin['pinned_to_piece']['position']}.")
+
+    if captured:
+        if not chosen["retaliation"]:
+            return _verdict("brilliant", "free_piece",
+                            f"{move_notation} captured the {captured['name']} for free; the retaliation list was empty.")
+        if see > 0:
+            return _verdict("brilliant", "good_trade",
+                            f"{move_notation} was a 'Good Trade': after all recaptures the {piece['name']} "
+                            f"wins {see} point(s) of material.")
+        if see < 0:
+            return _verdict("blunder", "bad_trade",
+                            f"{move_notation} was a 'Bad Trade': the {piece['name']} took the {captured['name']}, "
+                            f"but after the recaptures it loses {-see} point(s) of material.")
+        return _verdict("acknowledgment", "equal_trade",
+                        f"{move_notation} was an 'Equal Trade' ({piece['name']} for {captured['name']}), "
+                        f"a safe and valid positional choice.")
+
+    # --- Step 2: Defensive crisis ---
+    urgent = [t for t in analysis_before.tactical_threats if _is_urgent(t)]
+    if urgent:
+        ignored = [t for t in urgent if not _solves_threat(t, chosen, dangers_after)]
+        if ignored:
+            worst = max(ignored, key=lambda t: t["threatened_piece"]["value"])
+            return _verdict("blunder", "ignored_threat",
+                            f"The DANGERS_LIST showed an urgent threat ({_describe_threat(worst)}) "
+                            f"that {move_notation} ignored.")
+        return _verdict("good", "solved_threat",
+                        f"The DANGERS_LIST showed an urgent threat ({_describe_threat(urgent[0])}) "
+                        f"and {move_notation} solved it.")
+
+    # --- Step 3: Principles ---
+    if see < 0:
+        lowest = min(chosen["retaliation"], key=lambda r: r["value"])
+        return _verdict("blunder", "hanging_piece",
+                        f"{move_notation} was a 'Hanging Piece' blunder: the {piece['name']} can be won by the "
+                        f"{lowest['name']} on {lowest['position']}, losing {-see} point(s) of material.")
+    in_opening = last_move_data.get("turn", 0) <= OPENING_PLIES
+    if piece["previous_move_count"] == 0 and 3 <= piece["value"] <= 9: # Minor and major pieces, not the King
+        return _verdict("acknowledgment", "good_tempo",
+                        f"No dangers and no forcing moves. {move_notation} followed 'Good Tempo' by developing "
+                        f"the {piece['name']}.")
+    if in_opening and piece["previous_move_count"] > 0 and chosen["consequences"] == ["Positional move"]:
+        return _verdict("teaching", "bad_tempo",
+                        f"No dangers and no forcing moves. {move_notation} moved the already-developed "
+                        f"{piece['name']} again in the opening without gaining anything ('Bad Tempo').")
+    return _verdict("acknowledgment", "safe_move",
+                    f"No dangers, no forcing moves, and {move_notation} was a simple, safe positional move.")